@@ -0,0 +1,489 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from datetime import datetime
+
+from formato_bozze import DraftFormatError, decode_draft, dumps_draft, encode_draft, loads_draft
+from jsonbin_client import JsonBinConflict, JsonBinError
+
+# Archivi delle bozze: stessa interfaccia (save, load, list, delete) per
+# JSONBin.io e per un database SQLite locale, così la sidebar non sa dove
+# finiscono le bozze. Una bozza è il dict salvato da save_draft; sull'archivio
+# viene scritta nel formato compatto di formato_bozze.py (compress=False per
+# non comprimerla) e riletta in qualunque versione del formato.
+
+
+class DraftStorageError(Exception):
+    pass
+
+
+class DraftStorage(ABC):
+    # Un archivio che non implementa tutti i metodi non si può nemmeno creare
+    label = ""
+
+    @abstractmethod
+    def save(self, name, draft, draft_id=None):
+        # Restituisce l'id della bozza salvata. Con draft_id aggiorna quella bozza,
+        # senza id ne crea sempre una nuova: il nome non identifica la bozza.
+        ...
+
+    @abstractmethod
+    def restore(self, draft_id, name, draft):
+        # Reinserisce una bozza di un backup. Restituisce l'id con cui è stata
+        # salvata; DraftStorageError se l'id è già di un'altra bozza.
+        ...
+
+    @abstractmethod
+    def load(self, draft_id):
+        ...
+
+    @abstractmethod
+    def list(self):
+        # [(id, nome), ...]
+        ...
+
+    @abstractmethod
+    def delete(self, draft_id):
+        ...
+
+
+# Lista bozze su JSONBin: le modifiche di tutte le sessioni del processo vengono
+# raccolte per INDEX_COALESCE_WINDOW secondi e applicate insieme.
+INDEX_COALESCE_WINDOW = 0.1  # secondi
+INDEX_MAX_ATTEMPTS = 5  # letture/scritture ripetute in caso di conflitto
+INDEX_WAIT_TIMEOUT = 30  # secondi di attesa massima per chi salva o elimina
+
+
+def merge_index(current, ops):
+    # Applica le operazioni ("add", id, nome) / ("rename", id, nome) / ("remove", id, None) alla lista
+    result = [b for b in current if isinstance(b, dict)]
+    for op, draft_id, name in ops:
+        if op == "add":
+            if not any(b.get("id") == draft_id for b in result):
+                result.append({"id": draft_id, "name": name})
+        elif op == "rename":
+            # Solo se la bozza è ancora nella lista (non la ricrea se è stata eliminata)
+            result = [{**b, "name": name} if b.get("id") == draft_id else b for b in result]
+        else:
+            result = [b for b in result if b.get("id") != draft_id]
+    return result
+
+
+class DraftIndexUpdater:
+    # Un solo thread per processo applica le modifiche alla lista, a blocchi:
+    # una lettura e una scrittura per blocco invece che per ogni bozza.
+    # Concorrenza ottimistica: la scrittura porta l'ETag letto (If-Match); se
+    # un'altra istanza ha scritto nel frattempo (412) si rilegge, si riapplicano
+    # le modifiche e si riprova. Se il server non gestisce gli ETag, dopo la
+    # scrittura si rilegge la lista e si riprova se le modifiche sono andate perse.
+    def __init__(self, client, bin_id, window=INDEX_COALESCE_WINDOW, max_attempts=INDEX_MAX_ATTEMPTS):
+        self.client = client
+        self.bin_id = bin_id
+        self.window = window
+        self.max_attempts = max_attempts
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # (lista, ETag) dopo l'ultima scrittura: con un ETag si evita la lettura
+        self._known = None
+
+    def add(self, draft_id, name):
+        return self._submit(("add", draft_id, name))
+
+    def rename(self, draft_id, name):
+        return self._submit(("rename", draft_id, name))
+
+    def remove(self, draft_id):
+        return self._submit(("remove", draft_id, None))
+
+    def _submit(self, op):
+        future = Future()
+        self._queue.put((op, future))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="draft-index", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            time.sleep(self.window)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply([op for op, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+    def _apply(self, ops):
+        self.batches += 1
+        for attempt in range(self.max_attempts):
+            if attempt == 0 and self._known is not None:
+                current, version = self._known
+            else:
+                current, version = self.client.read_bin_versioned(self.bin_id)
+                current = current if isinstance(current, list) else []
+            new_list = merge_index(current, ops)
+            if new_list == current:
+                self._known = (new_list, version)
+                return
+            try:
+                new_version = self.client.update_bin(self.bin_id, new_list, if_match=version)
+            except JsonBinConflict:
+                self._known = None
+                continue
+            if new_version is None:
+                self._known = None
+                check, _ = self.client.read_bin_versioned(self.bin_id)
+                check = check if isinstance(check, list) else []
+                if merge_index(check, ops) != check:
+                    continue
+            else:
+                self._known = (new_list, new_version)
+            return
+        raise DraftStorageError("La lista bozze è stata modificata da troppe scritture concorrenti, riprova.")
+
+
+class JsonBinStorage(DraftStorage):
+    # Ogni bozza è un bin; un bin a parte contiene la lista [{"id", "name"}, ...]
+    label = "JSONBin"
+
+    def __init__(self, client, list_bin_id, compress=True):
+        self.client = client
+        self.list_bin_id = list_bin_id
+        self.compress = compress
+        self.index = DraftIndexUpdater(client, list_bin_id)
+        # id -> nome nella lista, per le bozze salvate da questo processo
+        self._names = {}
+
+    def save(self, name, draft, draft_id=None):
+        record = encode_draft(draft, compress=self.compress)
+        try:
+            if draft_id:
+                # Bozza già nella lista: basta riscriverne il bin
+                self.client.update_bin(draft_id, record)
+            else:
+                draft_id = self.client.create_bin(record, name=name)
+                self._wait(self.index.add(draft_id, name), "Bozza salvata ma non aggiunta alla lista")
+                self._names[draft_id] = name
+                return draft_id
+        except JsonBinError as e:
+            raise DraftStorageError(str(e)) from e
+        if self._names.get(draft_id) != name:
+            # Nome cambiato (o non ancora noto): la lista va aggiornata
+            self._wait(self.index.rename(draft_id, name), "Bozza salvata ma non rinominata nella lista")
+            self._names[draft_id] = name
+        return draft_id
+
+    def restore(self, draft_id, name, draft):
+        # Gli id dei bin li assegna JSONBin: la bozza diventa un bin nuovo
+        return self.save(name, draft)
+
+    def load(self, draft_id):
+        try:
+            return decode_draft(self.client.read_bin(draft_id))
+        except (JsonBinError, DraftFormatError) as e:
+            raise DraftStorageError(str(e)) from e
+
+    def list(self):
+        try:
+            drafts = self.client.read_bin(self.list_bin_id)
+        except JsonBinError as e:
+            raise DraftStorageError(str(e)) from e
+        if not isinstance(drafts, list):
+            raise DraftStorageError("Il bin delle bozze non è una lista. Correggi il contenuto su JSONBin.io.")
+        return [(b["id"], b["name"]) for b in drafts if isinstance(b, dict) and "id" in b and "name" in b]
+
+    def delete(self, draft_id):
+        # La bozza esce comunque dalla lista, anche se il bin era già stato eliminato
+        error = None
+        try:
+            self.client.delete_bin(draft_id)
+        except JsonBinError as e:
+            error = e
+        self._wait(self.index.remove(draft_id), "Bozza non rimossa dalla lista")
+        if error is not None:
+            raise DraftStorageError(str(error)) from error
+
+    def _wait(self, future, message):
+        try:
+            future.result(timeout=INDEX_WAIT_TIMEOUT)
+        except FutureTimeoutError as e:
+            raise DraftStorageError(f"{message}: tempo scaduto") from e
+        except (JsonBinError, DraftStorageError) as e:
+            raise DraftStorageError(f"{message}: {e}") from e
+
+
+class SqliteStorage(DraftStorage):
+    # Bozze in un file SQLite locale, indicizzate per nome e per data di salvataggio.
+    # Come su JSONBin il nome non è unico: più bozze possono chiamarsi uguale.
+    label = "locale"
+
+    def __init__(self, path, compress=True):
+        self.compress = compress
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Una connessione per processo, condivisa dai thread delle sessioni
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                " id TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " saved_at TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_saved_at ON drafts (saved_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_name ON drafts (name, saved_at)")
+
+    def save(self, name, draft, draft_id=None):
+        data = dumps_draft(draft, compress=self.compress)
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            if draft_id:
+                self._conn.execute(
+                    "INSERT INTO drafts (id, name, saved_at, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, saved_at = excluded.saved_at, data = excluded.data",
+                    (draft_id, name, saved_at, data),
+                )
+                return draft_id
+            draft_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO drafts (id, name, saved_at, data) VALUES (?, ?, ?, ?)",
+                (draft_id, name, saved_at, data),
+            )
+            return draft_id
+
+    def restore(self, draft_id, name, draft):
+        data = dumps_draft(draft, compress=self.compress)
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO drafts (id, name, saved_at, data) VALUES (?, ?, ?, ?)",
+                    (draft_id, name, saved_at, data),
+                )
+        except sqlite3.IntegrityError as e:
+            raise DraftStorageError(f"Esiste già una bozza con id {draft_id}") from e
+        return draft_id
+
+    def load(self, draft_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+        if row is None:
+            raise DraftStorageError(f"Bozza {draft_id} non trovata")
+        try:
+            return loads_draft(row[0])
+        except (ValueError, DraftFormatError) as e:
+            raise DraftStorageError(f"Bozza {draft_id} non leggibile: {e}") from e
+
+    def list(self):
+        # Le più recenti per prime
+        with self._lock:
+            return self._conn.execute("SELECT id, name FROM drafts ORDER BY saved_at DESC, name").fetchall()
+
+    def delete(self, draft_id):
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM drafts WHERE id = ?", (draft_id,)).rowcount
+        if not deleted:
+            raise DraftStorageError(f"Bozza {draft_id} non trovata")
+
+    def close(self):
+        self._conn.close()
+
+
+# Salvataggio automatico in background. Ogni bozza da salvare viene prima
+# aggiunta a un journal locale (file JSONL, solo in append), poi scritta
+# sull'archivio da un thread separato, dopo AUTOSAVE_DELAY secondi senza
+# modifiche. Le scritture non riuscite restano nel journal e vengono
+# riprovate, anche al riavvio successivo.
+AUTOSAVE_DELAY = 3  # secondi senza modifiche prima di scrivere
+AUTOSAVE_RETRY = 30  # secondi prima di riprovare una scrittura fallita
+JOURNAL_COMPACT_BYTES = 1024 * 1024  # oltre questa dimensione il journal viene compattato
+
+
+def draft_digest(draft):
+    return hashlib.sha256(json.dumps(draft, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class DraftAutosaver:
+    # key identifica la bozza in lavorazione (una per sessione dell'editor).
+    # timer(nome, dettaglio) misura le scritture sull'archivio (come in JsonBinClient).
+    def __init__(self, storage, journal_path, delay=AUTOSAVE_DELAY, retry_delay=AUTOSAVE_RETRY, on_saved=None,
+                 timer=None):
+        self.storage = storage
+        self.journal_path = journal_path
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.on_saved = on_saved
+        self.timer = timer or (lambda name, detail="": nullcontext())
+        self._cond = threading.Condition()
+        self._pending = {}  # key -> voce del journal ancora da scrivere
+        self._due = {}  # key -> istante (monotonic) della prossima scrittura
+        self._status = {}  # key -> {"draft_id", "digest", "saved_at", "error"}
+        self._seq = 0
+        if os.path.dirname(journal_path):
+            os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name="draft-autosave", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, name, draft, delay=None):
+        # Ritorna subito: la bozza è nel journal, la scrittura avviene dopo.
+        # False se la bozza è identica all'ultima salvata o in attesa.
+        digest = draft_digest(draft)
+        with self._cond:
+            status = self._status.setdefault(key, {"draft_id": None, "digest": None, "saved_at": None, "error": None})
+            pending = self._pending.get(key)
+            if (pending["digest"] if pending else status["digest"]) == digest:
+                if delay == 0 and pending:
+                    self._due[key] = time.monotonic()
+                    self._cond.notify()
+                return False
+            self._seq += 1
+            entry = {"op": "save", "seq": self._seq, "key": key, "name": name,
+                     "draft_id": status["draft_id"], "digest": digest, "draft": encode_draft(draft)}
+            self._append(entry)
+            self._pending[key] = entry
+            self._due[key] = time.monotonic() + (self.delay if delay is None else delay)
+            self._cond.notify()
+            return True
+
+    def bind(self, key, draft_id, draft=None):
+        # La sessione lavora su una bozza esistente (appena caricata)
+        with self._cond:
+            self._status[key] = {
+                "draft_id": draft_id,
+                "digest": draft_digest(draft) if draft is not None else None,
+                "saved_at": None,
+                "error": None,
+            }
+
+    def status(self, key):
+        with self._cond:
+            status = dict(self._status.get(key) or {"draft_id": None, "saved_at": None, "error": None})
+            status["pending"] = key in self._pending
+        return status
+
+    def flush(self, timeout=None):
+        # Scrive subito tutto quello che è in attesa (e aspetta, al massimo timeout secondi)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            now = time.monotonic()
+            for key in self._due:
+                self._due[key] = now
+            self._cond.notify()
+            while self._pending and any(not self._status[k]["error"] for k in self._pending):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return not self._pending
+
+    def _append(self, record):
+        # Una riga per voce, scritta e sincronizzata su disco prima di proseguire
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self):
+        # Rilegge il journal: le bozze senza conferma di scrittura tornano in coda
+        if not os.path.exists(self.journal_path):
+            return
+        saves = {}
+        done = {}
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Riga troncata da un crash durante la scrittura
+                    continue
+                self._seq = max(self._seq, record.get("seq", 0))
+                if record.get("op") == "save":
+                    saves[record["key"]] = record
+                elif record.get("op") == "done":
+                    done[record["key"]] = record
+        now = time.monotonic()
+        for key, entry in saves.items():
+            flushed = done.get(key)
+            draft_id = flushed["draft_id"] if flushed else entry.get("draft_id")
+            self._status[key] = {"draft_id": draft_id, "digest": flushed and flushed.get("digest"),
+                                 "saved_at": None, "error": None}
+            if flushed is None or flushed["seq"] < entry["seq"]:
+                entry["draft_id"] = draft_id
+                self._pending[key] = entry
+                self._due[key] = now
+        self._compact()
+
+    def _compact(self):
+        # Riscrive il journal con le sole voci ancora da scrivere (sostituzione atomica)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._pending.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    ready = [key for key, due in self._due.items() if due <= now]
+                    if ready:
+                        break
+                    if (not self._pending and os.path.exists(self.journal_path)
+                            and os.path.getsize(self.journal_path) > JOURNAL_COMPACT_BYTES):
+                        self._compact()
+                    self._cond.wait(min(self._due.values()) - now if self._due else None)
+                key = ready[0]
+                entry = self._pending[key]
+                del self._due[key]
+                draft_id = self._status[key]["draft_id"] or entry["draft_id"]
+            try:
+                with self.timer("bozze salvataggio su " + (self.storage.label or "archivio"), entry["name"]):
+                    draft_id = self.storage.save(entry["name"], decode_draft(entry["draft"]), draft_id=draft_id)
+            except Exception as e:
+                with self._cond:
+                    self._status[key]["error"] = f"{type(e).__name__}: {e}"
+                    # Se nel frattempo è arrivata una versione più nuova, ha già la sua scadenza
+                    self._due.setdefault(key, time.monotonic() + self.retry_delay)
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                self._append({"op": "done", "seq": entry["seq"], "key": key,
+                              "draft_id": draft_id, "digest": entry["digest"]})
+                self._status[key].update({
+                    "draft_id": draft_id,
+                    "digest": entry["digest"],
+                    "saved_at": datetime.now().isoformat(timespec="seconds"),
+                    "error": None,
+                })
+                if self._pending.get(key) is entry:
+                    del self._pending[key]
+                self._cond.notify_all()
+            if self.on_saved:
+                self.on_saved(key, draft_id)
@@ -1,18 +1,316 @@
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit.errors import StreamlitAPIException
 import os, re, uuid
+import hashlib
+import threading
+import time
 from datetime import datetime
+from contextlib import contextmanager
+from functools import cached_property, lru_cache, wraps
+from html import escape as html_escape
 from string import capwords
 import textwrap
 import json
-import requests
 import string
+from cachetools import LRUCache, TTLCache
+import jinja2
+import toml
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from jsonbin_client import JsonBinClient
+from archivio_bozze import DraftAutosaver, DraftStorageError, JsonBinStorage, SqliteStorage
+from blocchi import Block, as_blocks, block_to_html
+from importa_html import import_blocks_from_html
+
+# Stato condiviso dal processo. Streamlit riesegue questo file a ogni rerun,
+# quindi cache, lock e contatori globali devono vivere qui per sopravvivere
+# ai rerun ed essere condivisi tra le sessioni.
+@st.cache_resource(show_spinner=False)
+def _process_state():
+    return {}
+
+def shared(name, factory):
+    state = _process_state()
+    if name not in state:
+        state.setdefault(name, factory())
+    return state[name]
 
 # Helper function
 def contains_keyword(text, keyword):
     return keyword.lower() in text.lower()
 
+# Profilazione opzionale: tempi cumulati, numero di chiamate e input più lenti
+# per regole, generazione HTML e chiamate a JSONBin. Si attiva con la variabile
+# d'ambiente TI_AIUTO_PROFILING=1 o dal pannello debug (?debug=1 nell'URL).
+# Lo stato è per processo, quindi condiviso da tutte le sessioni.
+PROFILING = shared("profiling", lambda: {"enabled": os.environ.get("TI_AIUTO_PROFILING") == "1"})
+PROFILE_SLOWEST = 5  # input più lenti conservati per ogni voce
+_profile_stats = shared("profile_stats", dict)
+_profile_lock = shared("profile_lock", threading.Lock)
+
+def record_timing(name, seconds, detail=""):
+    with _profile_lock:
+        entry = _profile_stats.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0, "slowest": []})
+        entry["calls"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        slowest = entry["slowest"]
+        if len(slowest) < PROFILE_SLOWEST or seconds > slowest[-1][0]:
+            slowest.append((seconds, detail))
+            slowest.sort(key=lambda item: item[0], reverse=True)
+            del slowest[PROFILE_SLOWEST:]
+
+@contextmanager
+def profiled(name, detail=""):
+    # detail può essere una funzione: viene chiamata solo a profilazione attiva
+    if not PROFILING["enabled"]:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_timing(name, elapsed, detail() if callable(detail) else detail)
+
+def profiled_function(name, describe=None):
+    # Decoratore: misura ogni chiamata; describe(*args, **kwargs) descrive l'input
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILING["enabled"]:
+                return func(*args, **kwargs)
+            detail = (lambda: describe(*args, **kwargs)) if describe else ""
+            with profiled(name, detail):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def profile_report():
+    with _profile_lock:
+        entries = {
+            name: {
+                "calls": e["calls"],
+                "total_ms": e["total"] * 1000,
+                "mean_ms": e["total"] * 1000 / e["calls"],
+                "max_ms": e["max"] * 1000,
+                "slowest": [{"ms": sec * 1000, "input": detail} for sec, detail in e["slowest"]],
+            }
+            for name, e in _profile_stats.items()
+        }
+    return {
+        "enabled": PROFILING["enabled"],
+        "timings": dict(sorted(entries.items(), key=lambda item: item[1]["total_ms"], reverse=True)),
+        "rules_cache": rules_cache_stats(),
+    }
+
+def reset_profile():
+    with _profile_lock:
+        _profile_stats.clear()
+
+def describe_article_input(title="", meta_desc="", url_slug="", content="", keyword="", **kwargs):
+    return f"titolo {len(title)} car., contenuto {len(content)} car., keyword {keyword!r}"
+
+# Analisi dell'articolo: ogni dato viene estratto dal contenuto UNA sola volta
+# (al primo accesso) e poi condiviso da tutte le regole e dai valori mostrati.
+class ArticleAnalysis:
+    def __init__(self, title="", meta_desc="", url_slug="", content="", keyword=""):
+        self.title = title
+        self.meta_desc = meta_desc
+        self.url_slug = url_slug
+        self.content = content
+        self.keyword = keyword
+        self.keyword_lower = keyword.lower()
+
+    @cached_property
+    def content_lower(self):
+        return self.content.lower()
+
+    @cached_property
+    def text(self):
+        # Testo semplice senza tag HTML
+        return re.sub(r'<[^>]+>', '', self.content)
+
+    @cached_property
+    def words(self):
+        return re.findall(r'\w+', self.text)
+
+    @cached_property
+    def words_lower(self):
+        # Le parole \w+ non contengono spazi: join/split in blocco è molto più veloce
+        return " ".join(self.words).lower().split(" ") if self.words else []
+
+    @cached_property
+    def headings(self):
+        # Intestazioni H2/H3 (sia ## markdown che <h2>/<h3>)
+        return re.findall(r'(?:##+\s*|<h[23][^>]*>)([^\n<]*)', self.content, re.IGNORECASE)
+
+    @cached_property
+    def img_alts(self):
+        # Markdown: ![alt text](url)  HTML: <img ... alt="...">
+        md_alts = re.findall(r'!\[([^\]]*)\]\([^\)]*\)', self.content)
+        html_alts = re.findall(r'<img [^>]*alt=["\']([^"\']+)["\']', self.content)
+        return md_alts + html_alts
+
+    @cached_property
+    def links(self):
+        # Tutti i tag <a ...> con href e rel (rel=None se assente)
+        links = []
+        for tag in re.findall(r'<a\s+[^>]*>', self.content, re.IGNORECASE):
+            href_match = re.search(r'href=["\']([^"\']+)["\']', tag)
+            rel_match = re.search(r'rel\s*=\s*["\']([^"\']+)["\']', tag, re.IGNORECASE)
+            href = href_match.group(1) if href_match else ""
+            links.append({
+                "href": href,
+                "rel": rel_match.group(1).lower() if rel_match else None,
+                "external": bool(re.match(r'https?://', href)),
+            })
+        return links
+
+    @cached_property
+    def md_links(self):
+        # Link markdown [testo](url): lista di (url, esterno?)
+        return [
+            (url, bool(re.match(r'https?://', url)))
+            for _, url in re.findall(r'\[([^\]]+)\]\(([^\)]+)\)', self.content)
+        ]
+
+    @cached_property
+    def paragraph_words(self):
+        # Numero di parole (senza HTML) di ogni paragrafo <p>
+        paragraphs = re.findall(r'<p[^>]*>(.*?)</p>', self.content, re.DOTALL | re.IGNORECASE)
+        return [len(re.findall(r'\w+', re.sub(r'<[^>]+>', '', p))) for p in paragraphs]
+
+    @cached_property
+    def has_media(self):
+        has_img = bool(re.search(r'!\[.*\]\(.*\)|<img ', self.content))
+        has_video = bool(re.search(r'<video |<iframe |\[video\]', self.content, re.IGNORECASE))
+        return has_img or has_video
+
+    @cached_property
+    def keyword_in_content(self):
+        return self.keyword_lower in self.content_lower
+
+    @cached_property
+    def keyword_count(self):
+        # Occorrenze della keyword come parola intera nel testo senza HTML
+        if not self.keyword:
+            # Senza keyword \b\b conterebbe ogni confine di parola
+            return 0
+        keyword_pattern = r'\b' + re.escape(self.keyword) + r'\b'
+        return len(re.findall(keyword_pattern, self.text, re.IGNORECASE))
+
+    @classmethod
+    def from_parts(cls, title, meta_desc, url_slug, parts, keyword, content=None):
+        # Analisi di un contenuto composto da frammenti (content == "\n".join(parts)):
+        # i dati di ogni frammento arrivano dalla cache per-blocco e vengono solo
+        # sommati/concatenati, così modificare un blocco rianalizza solo quel blocco.
+        if content is None:
+            content = "\n".join(parts)
+        a = cls(title, meta_desc, url_slug, content, keyword)
+        stats = [block_stats(part, keyword) for part in parts]
+        a.words = [w for s in stats for w in s["words"]]
+        a.headings = [h for s in stats for h in s["headings"]]
+        a.img_alts = [alt for s in stats for alt in s["img_alts"]]
+        a.links = [link for s in stats for link in s["links"]]
+        a.md_links = [link for s in stats for link in s["md_links"]]
+        a.paragraph_words = [n for s in stats for n in s["paragraph_words"]]
+        a.has_media = any(s["has_media"] for s in stats)
+        a.keyword_count = sum(s["keyword_count"] for s in stats)
+        a.keyword_in_content = any(s["keyword_in_content"] for s in stats)
+        return a
+
+# Statistiche dei singoli blocchi, in cache con chiave (html del blocco, keyword)
+BLOCK_STATS_MAXSIZE = 4096
+_block_stats_cache = shared("block_stats_cache", lambda: LRUCache(maxsize=BLOCK_STATS_MAXSIZE))
+_block_stats_lock = shared("block_stats_lock", threading.Lock)
+
+def block_stats(html, keyword=""):
+    key = (html, keyword)
+    with _block_stats_lock:
+        stats = _block_stats_cache.get(key)
+    if stats is None:
+        a = ArticleAnalysis(content=html, keyword=keyword)
+        stats = {
+            "words": a.words,
+            "word_count": len(a.words),
+            "keyword_count": a.keyword_count,
+            "keyword_in_content": a.keyword_in_content,
+            "paragraph_words": a.paragraph_words,
+            "headings": a.headings,
+            "img_alts": a.img_alts,
+            "links": a.links,
+            "md_links": a.md_links,
+            "has_media": a.has_media,
+        }
+        with _block_stats_lock:
+            _block_stats_cache[key] = stats
+    return stats
+
+# Keyword principale + secondarie (come Rank Math, massimo 5 in totale)
+MAX_KEYWORDS = 5
+
+def parse_keywords(focus_keyword, secondary=""):
+    # "a, b, c" -> [focus, a, b, c] senza duplicati (case-insensitive) né vuoti
+    keywords = []
+    for kw in [focus_keyword] + secondary.split(","):
+        kw = kw.strip()
+        if kw and kw.lower() not in (k.lower() for k in keywords):
+            keywords.append(kw)
+    return keywords[:MAX_KEYWORDS]
+
+# Matcher multi-keyword: trie sui token (parole \w+ minuscole) stile Aho-Corasick.
+# Una sola scansione trova tutte le occorrenze di tutte le keyword, anche
+# sovrapposte (es. "windows" dentro "installare windows").
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.lengths = []
+        self._root = {}
+        for idx, kw in enumerate(self.keywords):
+            tokens = re.findall(r'\w+', kw.lower())
+            self.lengths.append(len(tokens))
+            node = self._root
+            for tok in tokens:
+                node = node.setdefault(tok, {})
+            if tokens:
+                # La chiave "" non è mai un token \w+: segna la fine di una keyword
+                node.setdefault("", []).append(idx)
+
+    def find_all(self, tokens):
+        # Per ogni keyword, la lista degli indici di token dove inizia un'occorrenza
+        hits = [[] for _ in self.keywords]
+        root = self._root
+        n = len(tokens)
+        for i, tok in enumerate(tokens):
+            node = root.get(tok)
+            j = i + 1
+            while node is not None:
+                for k in node.get("", ()):
+                    hits[k].append(i)
+                if j >= n:
+                    break
+                node = node.get(tokens[j])
+                j += 1
+        return hits
+
+_keyword_matchers = shared("keyword_matchers", lambda: LRUCache(maxsize=64))
+_keyword_matchers_lock = shared("keyword_matchers_lock", threading.Lock)
+
+def keyword_matcher(keywords):
+    # Matcher compilato una volta per insieme di keyword e riusato da tutte le sessioni
+    keywords = tuple(keywords)
+    with _keyword_matchers_lock:
+        matcher = _keyword_matchers.get(keywords)
+    if matcher is None:
+        matcher = KeywordMatcher(keywords)
+        with _keyword_matchers_lock:
+            _keyword_matchers[keywords] = matcher
+    return matcher
+
 # Generate HTML content
+@profiled_function("generate_html", lambda title, meta_desc, slug, content: f"contenuto {len(content)} car.")
 def generate_html(title, meta_desc, slug, content):
     # Usa il blocco WordPress anche nell'anteprima HTML
     wp_block = generate_wp_article_block(title, meta_desc, content)
@@ -32,9 +330,11 @@ def generate_html(title, meta_desc, slug, content):
 </html>
 """
 
-def generate_wp_article_block(title, meta_desc, content):
+def indent_content(content):
     # Indenta ogni riga del contenuto con 4 spazi
-    content_indented = "\n".join("    " + line if line.strip() else "" for line in content.splitlines())
+    return "\n".join("    " + line if line.strip() else "" for line in content.splitlines())
+
+def wp_article_head(title, meta_desc):
     return f"""
 <header class="entry-header">
     <h1 class="entry-title">{title}</h1>
@@ -49,10 +349,19 @@ def generate_wp_article_block(title, meta_desc, content):
     [ez-toc]
 </div>
 
-<div class="entry-content">
-{content_indented}
-</div>
-"""
+<div class="entry-content">"""
+
+def generate_wp_article_block(title, meta_desc, content):
+    return f"{wp_article_head(title, meta_desc)}\n{indent_content(content)}\n</div>\n"
+
+def wp_article_parts(title, meta_desc, blocks):
+    # Il blocco WordPress spezzato in frammenti, uno per blocco di contenuto:
+    # "\n".join(parti) == generate_wp_article_block(title, meta_desc, assemble_blocks(blocks))
+    body = [indent_content(block_to_html(b)) for b in blocks] or [""]
+    if len(body) > 1 and body[-1] == "":
+        # splitlines() sul contenuto intero perde l'ultima riga vuota
+        body.pop()
+    return [wp_article_head(title, meta_desc), *body, "</div>\n"]
 
 # Save HTML file
 def create_html_file(title, meta_desc, slug, content):
@@ -64,18 +373,114 @@ def create_html_file(title, meta_desc, slug, content):
         f.write(generate_html(title, meta_desc, slug, content))
     return filename
 
+# Pacchetto regole: soglie e vocabolari (power words, stopword del Title Case)
+# letti da regole.toml, o dal file TOML/JSON indicato da TI_AIUTO_REGOLE.
+# Il file viene compilato una volta (frozenset, regex, testi delle regole) e
+# condiviso da tutte le sessioni; watch_rule_pack lo ricarica quando cambia.
+RULE_PACK_PATH = os.environ.get(
+    "TI_AIUTO_REGOLE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "regole.toml")
+)
+_rule_pack_state = shared("rule_pack", dict)
+_rule_pack_lock = shared("rule_pack_lock", threading.Lock)
+
+def read_rule_pack(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    raw = json.loads(text) if path.lower().endswith(".json") else toml.loads(text)
+    return raw, hashlib.sha256(data).hexdigest()
+
+def compile_rule_pack(raw, digest=""):
+    soglie = raw["soglie"]
+    power_words = [pw.strip().lower() for pw in raw["power_words"]["parole"] if pw.strip()]
+    pack = {
+        "digest": digest,
+        "min_words": int(soglie["parole_minime"]),
+        "density_min": soglie["densita_minima"] / 100,
+        "density_max": soglie["densita_massima"] / 100,
+        "url_max_length": int(soglie["url_max_caratteri"]),
+        "paragraph_max_words": int(soglie["parole_max_paragrafo"]),
+        "content_start": soglie["inizio_contenuto"] / 100,
+        "title_start_positions": int(soglie["posizioni_titolo"]),
+        "power_words": tuple(power_words),
+        # Una sola regex per tutte le power words (basta che il titolo ne contenga una)
+        "power_words_re": re.compile("|".join(re.escape(pw) for pw in sorted(power_words, key=len, reverse=True)) or r"(?!)"),
+        "stopwords": frozenset(w.lower() for w in raw["title_case"]["stopwords"]),
+    }
+    # Valori usati nei testi delle regole e nei tooltip
+    pack["labels"] = {
+        "min_words": pack["min_words"],
+        "density_min": soglie["densita_minima"],
+        "density_max": soglie["densita_massima"],
+        "url_max_length": pack["url_max_length"],
+        "paragraph_max_words": pack["paragraph_max_words"],
+        "content_start": soglie["inizio_contenuto"],
+    }
+    pack["rule_texts"] = tuple(rule["text"].format(**pack["labels"]) for rule in RULES)
+    return pack
+
+def load_rule_pack(path=None):
+    # Carica e compila il pacchetto; se il file non è valido resta quello precedente
+    path = path or RULE_PACK_PATH
+    with _rule_pack_lock:
+        try:
+            raw, digest = read_rule_pack(path)
+            if _rule_pack_state.get("pack") is None or _rule_pack_state["pack"]["digest"] != digest:
+                _rule_pack_state["pack"] = compile_rule_pack(raw, digest)
+                _rule_pack_state["version"] = _rule_pack_state.get("version", 0) + 1
+                _rule_pack_state["loaded_at"] = datetime.now().isoformat(timespec="seconds")
+            _rule_pack_state["path"] = path
+            _rule_pack_state["error"] = None
+        except Exception as e:
+            if _rule_pack_state.get("pack") is None:
+                raise
+            _rule_pack_state["error"] = f"{type(e).__name__}: {e}"
+        return _rule_pack_state["pack"]
+
+def rule_pack():
+    pack = _rule_pack_state.get("pack")
+    return pack if pack is not None else load_rule_pack()
+
+def rule_pack_status():
+    with _rule_pack_lock:
+        return {key: value for key, value in _rule_pack_state.items() if key != "pack"}
+
+class _RulePackHandler(FileSystemEventHandler):
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def on_any_event(self, event):
+        # Gli editor spesso salvano scrivendo un file temporaneo e rinominandolo
+        paths = (event.src_path, getattr(event, "dest_path", ""))
+        if self.path in (os.path.abspath(p) for p in paths if p):
+            load_rule_pack(self.path)
+
+def watch_rule_pack(path=None):
+    # Un solo osservatore per processo, avviato dall'app (la CLI carica il file una volta)
+    path = path or RULE_PACK_PATH
+
+    def start():
+        observer = Observer()
+        observer.daemon = True
+        observer.schedule(_RulePackHandler(path), os.path.dirname(os.path.abspath(path)) or ".")
+        observer.start()
+        return observer
+
+    return shared("rule_pack_observer", start)
+
 # Static list of rules
 RANK_MATH_RULES = [
     "La parola chiave di riferimento deve essere nel titolo SEO.",
     "La parola chiave di riferimento deve essere nella metadescrizione SEO.",
     "La parola chiave di riferimento deve essere nell'URL.",
-    "La parola chiave di riferimento deve comparire nelle prime 10% parole del contenuto.",
+    "La parola chiave di riferimento deve comparire nelle prime {content_start:g}% parole del contenuto.",
     "La parola chiave di riferimento deve trovarsi nel contenuto.",
-    "Il contenuto deve essere più lungo di 600 parole.",
+    "Il contenuto deve essere più lungo di {min_words} parole.",
     "La parola chiave deve trovarsi in almeno un sottotitolo (H2, H3...).",
     "La parola chiave principale deve trovarsi nell'alt text delle immagini.",
-    "La densità della parola chiave deve essere tra 1% e 1.5%.",
-    "L'URL deve contenere massimo 75 caratteri e usare '-' per gli spazi.",
+    "La densità della parola chiave deve essere tra {density_min:g}% e {density_max:g}%.",
+    "L'URL deve contenere massimo {url_max_length} caratteri e usare '-' per gli spazi.",
     "Devono essere presenti link a risorse esterne.",
     "Deve essere presente almeno un link DoFollow.",
     "Devono essere presenti link interni.",
@@ -91,50 +496,7 @@ CUSTOM_RULES = [
     "Il titolo deve essere in Title Case (solo le parole importanti con iniziale maiuscola, le altre minuscole)."
 ]
 def rule_title_titlecase(title, **kwargs):
-    stopwords = set([
-        # Articoli articolati
-        "al", "allo", "alla", "ai", "agli", "alle",
-        "dal", "dallo", "dalla", "dai", "dagli", "dalle",
-        "nel", "nello", "nella", "nei", "negli", "nelle",
-        "sul", "sullo", "sulla", "sui", "sugli", "sulle",
-        # Preposizioni semplici
-        "a", "ad", "con", "da", "di", "in", "su", "per", "tra", "fra",
-        "oltre", "verso", "presso", "durante", "fino", "senza", "sopra",
-        "sotto", "oltreché", "attorno", "secondo", "tramite", "compreso",
-        "eccetto", "salvo", "tranne",
-        # Congiunzioni
-        "e", "ed", "ma", "anche", "o", "oppure", "però", "né", "né…né",
-        "se", "invece", "anziché", "mentre", "poiché", "perché", "che",
-        "affinché", "benchè", "quando", "dove", "come",
-        # Avverbi e locuzioni avverbiali
-        "non", "mai", "già", "ancora", "appena", "subito", "poi", "quindi",
-        "dunque", "perciò", "quasi", "quasi", "proprio", "soltanto", "solo",
-        "addirittura", "addirittura", "apparentemente", "addirittura", "addirittura",
-        "esattamente", "effettivamente", "generalmente", "normalmente",
-        "solitamente", "principalmente", "specificamente", "praticamente",
-        "precisamente", "relativamente", "veramente", "ovviamente",
-        # Pronomi
-        "io", "tu", "lui", "lei", "noi", "voi", "loro",
-        "mi", "ti", "si", "ci", "vi", "ne", "lo", "la", "li", "le", "gli",
-        # Aggettivi e pronomi dimostrativi/interrogativi
-        "questo", "questa", "questi", "queste", "quello", "quella", "quelli", "quelle",
-        "un", "uno", "una", "alcun", "alcuno", "alcuna", "alcuni", "alcune",
-        "qualcosa", "qualcuno", "qualche", "quale", "quali", "quanto", "quanta",
-        "quanti", "quante",
-        # Particelle e variazioni
-        "ciò", "cui", "chi", "chiunque", "dunque", "ebbene", "insomma", "peraltro",
-        "rallegramente", "ribadire", "tuttavia", "ugualmente",
-        # Interiezioni/minor words
-        "oh", "ah", "beh", "eh", "mah", "ok",
-        # Numeri scritti in lettere (se li usi come parole non servono mai in maiuscolo)
-        "uno", "due", "tre", "quattro", "cinque", "sei", "sette", "otto", "nove", "dieci",
-        "undici", "dodici", "tredici", "quattordici", "quindici", "sedici",
-        "diciassette", "diciotto", "diciannove", "venti", "ventuno", "ventidue",
-        # Altri comuni stopwords
-        "anche", "ancora", "ancora", "come", "dopo", "durante", "ed", "fra",
-        "ido", "laddove", "nulla", "sia", "tale", "tali", "talvolta", "tanto",
-        "troppo", "via", "volta", "volte"
-    ])
+    stopwords = rule_pack()["stopwords"]
 
     if not title.strip():
         return False
@@ -174,92 +536,77 @@ def rule_keyword_in_url(url_slug, keyword, **kwargs):
     # Considera i trattini come spazi quando confronti keyword e slug
     normalized_slug = url_slug.replace('-', ' ')
     return contains_keyword(normalized_slug, keyword)
-def rule_keyword_at_start_content(content, keyword, **kwargs):
-    # Rimuovi i tag HTML
-    content_no_html = re.sub(r'<[^>]+>', '', content)
-    # Trova tutte le parole
-    words = re.findall(r'\w+', content_no_html)
+def rule_keyword_at_start_content(content, keyword, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content, keyword=keyword)
+    # Parole del contenuto senza HTML (già calcolate dall'analisi)
+    words = a.words
     if not words:
         return False
-    # Calcola il primo 10% delle parole (almeno 1)
-    n = max(1, int(len(words) * 0.1))
+    # Calcola il primo 10% delle parole (almeno 1; la quota è nel pacchetto regole)
+    n = max(1, int(len(words) * rule_pack()["content_start"]))
     first_words = words[:n]
     # Cerca la keyword (case-insensitive) tra le prime parole
-    keyword_words = re.findall(r'\w+', keyword.lower())
+    keyword_words = re.findall(r'\w+', a.keyword_lower)
     first_words_str = ' '.join(first_words).lower()
     return ' '.join(keyword_words) in first_words_str
-def rule_keyword_in_content(content, keyword, **kwargs):
-    return contains_keyword(content, keyword)
-def rule_content_min_words(content, **kwargs):
-    # Rimuovi tutti i tag HTML (anche quelli multilinea)
-    content_no_html = re.sub(r'<[^>]+>', '', content)
-    # Rimuovi anche spazi multipli creati dalla rimozione dei tag
-    content_no_html = re.sub(r'\s+', ' ', content_no_html).strip()
-    return len(re.findall(r"\w+", content_no_html)) >= 600
-def rule_keyword_in_subheading(content, keyword, **kwargs):
+def rule_keyword_in_content(content, keyword, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content, keyword=keyword)
+    return a.keyword_in_content
+def rule_content_min_words(content, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content)
+    return len(a.words) >= rule_pack()["min_words"]
+def rule_keyword_in_subheading(content, keyword, analysis=None, **kwargs):
     # Cerca la keyword in intestazioni H2/H3 (markdown o HTML)
-    # Cerca sia ## che <h2> o <h3>
-    pattern = r'(?:##+\s*|<h[23][^>]*>)([^\n<]*)'
-    matches = re.findall(pattern, content, re.IGNORECASE)
-    return any(contains_keyword(m, keyword) for m in matches)
+    a = analysis or ArticleAnalysis(content=content, keyword=keyword)
+    return any(contains_keyword(h, keyword) for h in a.headings)
 
-def rule_keyword_in_img_alt(content, keyword, **kwargs):
+def rule_keyword_in_img_alt(content, keyword, analysis=None, **kwargs):
     # Cerca la keyword nell'alt delle immagini (markdown o HTML)
-    # Markdown: ![alt text](url)
-    md_alts = re.findall(r'!\[([^\]]*)\]\([^\)]*\)', content)
-    html_alts = re.findall(r'<img [^>]*alt=["\']([^"\']+)["\']', content)
-    all_alts = md_alts + html_alts
-    return any(contains_keyword(a, keyword) for a in all_alts)
-
-def rule_keyword_density(content, keyword, **kwargs):
-    # Rimuovi i tag HTML
-    content_no_html = re.sub(r'<[^>]+>', '', content)
-    # Trova tutte le parole
-    words = re.findall(r"\w+", content_no_html)
-    if not words:
+    a = analysis or ArticleAnalysis(content=content, keyword=keyword)
+    return any(contains_keyword(alt, keyword) for alt in a.img_alts)
+
+def rule_keyword_density(content, keyword, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content, keyword=keyword)
+    if not a.words:
         return False
     # Conta solo le occorrenze della keyword come parola intera (case-insensitive)
-    keyword_pattern = r'\b' + re.escape(keyword) + r'\b'
-    count = len(re.findall(keyword_pattern, content_no_html, re.IGNORECASE))
-    density = count / len(words)
-    return 0.01 <= density <= 0.015  # tra 1% e 1.5%
+    density = a.keyword_count / len(a.words)
+    pack = rule_pack()
+    return pack["density_min"] <= density <= pack["density_max"]  # di default tra 1% e 1.5%
 
 def rule_url_length_and_dash(url_slug, **kwargs):
     return (
-        1 <= len(url_slug) <= 75
+        1 <= len(url_slug) <= rule_pack()["url_max_length"]
         and url_slug == url_slug.lower()
         and (' ' not in url_slug)
         and ('_' not in url_slug)
     )
 
-def rule_external_links(content, **kwargs):
+def rule_external_links(content, analysis=None, **kwargs):
     # Cerca link esterni (markdown o HTML)
-    # Markdown: [text](http...)  HTML: <a href="http...">
-    md_links = re.findall(r'\[([^\]]+)\]\((https?://[^\)]+)\)', content)
-    html_links = re.findall(r'<a [^>]*href=["\']https?://[^"\']+["\']', content)
-    return bool(md_links or html_links)
-
-def rule_dofollow_link(content, **kwargs):
-    # Trova tutti i link <a ...>
-    links = re.findall(r'<a\s+[^>]*>', content, re.IGNORECASE)
-    for link in links:
-        # Cerca l'attributo rel
-        rel_match = re.search(r'rel\s*=\s*["\']([^"\']+)["\']', link, re.IGNORECASE)
-        if rel_match:
-            rel_value = rel_match.group(1).lower()
-            # Se NON contiene nofollow, ugc o sponsored, è dofollow
-            if not any(x in rel_value for x in ["nofollow", "ugc", "sponsored"]):
-                return True
-        else:
-            # Se non c'è rel, è dofollow di default
+    a = analysis or ArticleAnalysis(content=content)
+    return any(is_external for _, is_external in a.md_links) or any(
+        link["external"] for link in a.links
+    )
+
+def rule_dofollow_link(content, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content)
+    for link in a.links:
+        rel_value = link["rel"]
+        # Se non c'è rel, è dofollow di default
+        if rel_value is None:
+            return True
+        # Se NON contiene nofollow, ugc o sponsored, è dofollow
+        if not any(x in rel_value for x in ["nofollow", "ugc", "sponsored"]):
             return True
     return False
 
-def rule_internal_links(content, **kwargs):
+def rule_internal_links(content, analysis=None, **kwargs):
     # Cerca link interni (markdown o HTML, senza http/https)
-    md_links = re.findall(r'\[([^\]]+)\]\((?!https?://)[^\)]+\)', content)
-    html_links = re.findall(r'<a [^>]*href=["\'](?!https?://)[^"\']+["\']', content)
-    return bool(md_links or html_links)
+    a = analysis or ArticleAnalysis(content=content)
+    return any(not is_external for _, is_external in a.md_links) or any(
+        link["href"] and not link["external"] for link in a.links
+    )
 
 def rule_keyword_at_start_title(title, keyword, **kwargs):
     # Divide il titolo in parole (ignorando la punteggiatura)
@@ -267,239 +614,469 @@ def rule_keyword_at_start_title(title, keyword, **kwargs):
     keyword_words = [w.strip(string.punctuation) for w in keyword.split()]
     n = len(keyword_words)
     # Controlla se la keyword è tra le prime 3 posizioni (0, 1, 2)
-    for i in range(3):
+    for i in range(rule_pack()["title_start_positions"]):
         if words[i:i+n]:
             if ' '.join(words[i:i+n]).lower() == ' '.join(keyword_words).lower():
                 return True
     return False
 
 def rule_power_word_in_title(title, **kwargs):
-    # Nuova lista di power words fornita dall'utente
-    power_words = [
-        "incredibile", "sorprendente", "scioccante", "irresistibile", "ufficiale", "garantito", "gratuito", "leader", "veloce", "straordinario", "meraviglioso", "sensazionale", "nuovo", "innovativo", "popolare", "qualità", "efficace", "potente", "esclusivo", "motivante", "sicuro", "unico"
-    ]
-    # Confronto case-insensitive
-    return any(pw.lower() in title.lower() for pw in power_words)
+    # Power words dal pacchetto regole, confronto case-insensitive
+    return bool(rule_pack()["power_words_re"].search(title.lower()))
 
 def rule_number_in_title(title, **kwargs):
     return bool(re.search(r'\d', title))
 
-def rule_short_paragraphs(content, **kwargs):
-    paragraphs = re.findall(r'<p[^>]*>(.*?)</p>', content, re.DOTALL | re.IGNORECASE)
-    for p in paragraphs:
-        p_clean = re.sub(r'<[^>]+>', '', p)
-        words = re.findall(r'\w+', p_clean)
-        if len(words) > 120:
-            return False
-    return True
+def rule_short_paragraphs(content, analysis=None, **kwargs):
+    a = analysis or ArticleAnalysis(content=content)
+    max_words = rule_pack()["paragraph_max_words"]
+    return all(n <= max_words for n in a.paragraph_words)
 
-def rule_has_media(content, **kwargs):
+def rule_has_media(content, analysis=None, **kwargs):
     # Cerca immagini o video (markdown o HTML)
-    has_img = bool(re.search(r'!\[.*\]\(.*\)|<img ', content))
-    has_video = bool(re.search(r'<video |<iframe |\[video\]', content, re.IGNORECASE))
-    return has_img or has_video
+    a = analysis or ArticleAnalysis(content=content)
+    return a.has_media
 
+# Ogni regola dichiara quali input legge ("inputs"): se nessuno di questi
+# cambia, il risultato precedente viene riutilizzato senza rieseguirla.
 RULES = [
-    {"text": RANK_MATH_RULES[0], "func": rule_keyword_in_title},
-    {"text": RANK_MATH_RULES[1], "func": rule_keyword_in_meta},
-    {"text": RANK_MATH_RULES[2], "func": rule_keyword_in_url},
-    {"text": RANK_MATH_RULES[3], "func": rule_keyword_at_start_content},
-    {"text": RANK_MATH_RULES[4], "func": rule_keyword_in_content},
-    {"text": RANK_MATH_RULES[5], "func": rule_content_min_words},
-    {"text": RANK_MATH_RULES[6], "func": rule_keyword_in_subheading},
-    {"text": RANK_MATH_RULES[7], "func": rule_keyword_in_img_alt},
-    {"text": RANK_MATH_RULES[8], "func": rule_keyword_density},
-    {"text": RANK_MATH_RULES[9], "func": rule_url_length_and_dash},
-    {"text": RANK_MATH_RULES[10], "func": rule_external_links},
-    {"text": RANK_MATH_RULES[11], "func": rule_dofollow_link},
-    {"text": RANK_MATH_RULES[12], "func": rule_internal_links},
-    {"text": RANK_MATH_RULES[13], "func": rule_keyword_at_start_title},
-    {"text": RANK_MATH_RULES[14], "func": rule_power_word_in_title},
-    {"text": RANK_MATH_RULES[15], "func": rule_number_in_title},
-    {"text": RANK_MATH_RULES[16], "func": rule_short_paragraphs},
-    {"text": RANK_MATH_RULES[17], "func": rule_has_media},
+    {"text": RANK_MATH_RULES[0], "func": rule_keyword_in_title, "inputs": ("title", "keyword")},
+    {"text": RANK_MATH_RULES[1], "func": rule_keyword_in_meta, "inputs": ("meta_desc", "keyword")},
+    {"text": RANK_MATH_RULES[2], "func": rule_keyword_in_url, "inputs": ("url_slug", "keyword")},
+    {"text": RANK_MATH_RULES[3], "func": rule_keyword_at_start_content, "inputs": ("content", "keyword")},
+    {"text": RANK_MATH_RULES[4], "func": rule_keyword_in_content, "inputs": ("content", "keyword")},
+    {"text": RANK_MATH_RULES[5], "func": rule_content_min_words, "inputs": ("content",)},
+    {"text": RANK_MATH_RULES[6], "func": rule_keyword_in_subheading, "inputs": ("content", "keyword")},
+    {"text": RANK_MATH_RULES[7], "func": rule_keyword_in_img_alt, "inputs": ("content", "keyword")},
+    {"text": RANK_MATH_RULES[8], "func": rule_keyword_density, "inputs": ("content", "keyword")},
+    {"text": RANK_MATH_RULES[9], "func": rule_url_length_and_dash, "inputs": ("url_slug",)},
+    {"text": RANK_MATH_RULES[10], "func": rule_external_links, "inputs": ("content",)},
+    {"text": RANK_MATH_RULES[11], "func": rule_dofollow_link, "inputs": ("content",)},
+    {"text": RANK_MATH_RULES[12], "func": rule_internal_links, "inputs": ("content",)},
+    {"text": RANK_MATH_RULES[13], "func": rule_keyword_at_start_title, "inputs": ("title", "keyword")},
+    {"text": RANK_MATH_RULES[14], "func": rule_power_word_in_title, "inputs": ("title",)},
+    {"text": RANK_MATH_RULES[15], "func": rule_number_in_title, "inputs": ("title",)},
+    {"text": RANK_MATH_RULES[16], "func": rule_short_paragraphs, "inputs": ("content",)},
+    {"text": RANK_MATH_RULES[17], "func": rule_has_media, "inputs": ("content",)},
     # Regola custom
-    {"text": CUSTOM_RULES[0], "func": rule_title_titlecase, "custom": True},
+    {"text": CUSTOM_RULES[0], "func": rule_title_titlecase, "inputs": ("title",), "custom": True},
 ]
 
+# Input disponibili per le regole (nell'ordine usato per le chiavi di cache)
+RULE_INPUTS = ("title", "meta_desc", "url_slug", "content", "keyword")
+
 # Funzione che verifica tutte le regole e restituisce lista di tuple (testo, stato)
-def check_all_rules(title, meta_desc, url_slug, content, keyword):
+def check_all_rules(title, meta_desc, url_slug, content, keyword, analysis=None, parts=None):
+    if analysis is None:
+        # Senza analisi già pronta passa dalla cache dei risultati
+        return evaluate_article(title, meta_desc, url_slug, content, keyword, parts=parts)["results"]
     results = []
-    for rule in RULES:
+    texts = rule_pack()["rule_texts"]
+    for idx, rule in enumerate(RULES):
         # Passa i parametri richiesti dalla funzione
-        status = rule["func"](
+        status = run_rule(
+            rule,
             title=title,
             meta_desc=meta_desc,
             url_slug=url_slug,
             content=content,
-            keyword=keyword
+            keyword=keyword,
+            analysis=analysis
         )
-        results.append({"text": rule["text"], "ok": status})
+        results.append({"text": texts[idx], "ok": status})
     return results
 
-# Funzione per mostrare le regole colorate e ordinate
-def get_rules_html(title, meta_desc, url_slug, content, keyword):
-    # Definisci qui il CSS usato per il rendering delle regole (tooltip, colori, ecc.)
-    css = """
-    <style>
-    .modern-info-wrap {
-        position: absolute;
-        top: 12px;
-        bottom: 12px;
-        right: 12px;
-        z-index: 2;
-        display: flex;
-        align-items: center;
-        height: auto;
-    }
-    .modern-info-icon {
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        width: 24px;
-        height: 24px;
-        border-radius: 50%;
-        border: 1.5px solid #888;
-        color: #555;
-        background: #fff;
-        font-size: 18px;
-        font-weight: 700;
-        box-shadow: 0 1px 4px rgba(0,0,0,0.07);
-        cursor: pointer;
-        transition: border-color 0.2s, color 0.2s;
-    }
-    .modern-info-icon:hover {
-        border-color: #1976d2;
-        color: #1976d2;
+def run_rule(rule, **fields):
+    # Singola regola, misurata se la profilazione è attiva (altrimenti chiamata diretta)
+    if not PROFILING["enabled"]:
+        return rule["func"](**fields)
+    with profiled("regola " + rule["func"].__name__, lambda: describe_article_input(**fields)):
+        return rule["func"](**fields)
+
+# Valori misurati sull'articolo (mostrati accanto ad alcune regole)
+def article_metrics(analysis):
+    n_words = len(analysis.words)
+    return {
+        "word_count": n_words,
+        "keyword_count": analysis.keyword_count,
+        "density": (analysis.keyword_count / n_words) if n_words else 0,
+        "url_length": len(analysis.url_slug),
+        # Se non ci sono paragrafi resta 0
+        "max_paragraph_words": max(analysis.paragraph_words, default=0),
     }
-    .modern-info-wrap:hover .modern-tooltip, .modern-info-wrap:focus-within .modern-tooltip {
-        display: block;
-    }
-    .modern-tooltip {
-        display: none;
-        position: absolute;
-        right: 0;
-        top: -70px;
-        min-width: 220px;
-        max-width: 320px;
-        background: #fff;
-        color: #222;
-        border-radius: 10px;
-        box-shadow: 0 4px 16px rgba(0,0,0,0.13);
-        padding: 14px 18px;
-        font-size: 15px;
-        font-weight: 400;
-        z-index: 1000;
-        border: 1px solid #e0e0e0;
+
+# Cache dei risultati delle regole, condivisa tra rerun e sessioni Streamlit.
+# La chiave è un digest degli input: un articolo non modificato non viene rianalizzato.
+RULES_CACHE_MAXSIZE = 256
+RULES_CACHE_TTL = 60 * 60  # secondi
+_rules_cache = shared("rules_cache", lambda: TTLCache(maxsize=RULES_CACHE_MAXSIZE, ttl=RULES_CACHE_TTL))
+# Cache dei singoli risultati, con chiave = regola + digest dei soli input che legge
+_rule_results_cache = shared(
+    "rule_results_cache",
+    lambda: TTLCache(maxsize=RULES_CACHE_MAXSIZE * (len(RULES) + 1), ttl=RULES_CACHE_TTL)
+)
+_rules_cache_lock = shared("rules_cache_lock", threading.Lock)
+_rules_cache_stats = shared("rules_cache_stats", lambda: {"hits": 0, "misses": 0, "rule_hits": 0, "rule_misses": 0})
+
+def _field_digests(title, meta_desc, url_slug, content, keyword):
+    return {
+        name: hashlib.sha256(value.encode("utf-8")).hexdigest()
+        for name, value in zip(RULE_INPUTS, (title, meta_desc, url_slug, content, keyword))
     }
-    </style>
-    """
-
-    results = check_all_rules(title, meta_desc, url_slug, content, keyword)
-    # Calcola valori attuali per le regole dove ha senso
-    wc = count_words_no_html(content)
-    # Densità keyword (conteggio parole SENZA HTML)
-    content_no_html = re.sub(r'<[^>]+>', '', content)
-    words = re.findall(r"\w+", content_no_html)
-    count = len(re.findall(re.escape(keyword), content_no_html, re.IGNORECASE))
-    density = (count / len(words)) if words else 0
-    # Lunghezza URL
-    url_len = len(url_slug)
-    # Paragrafo più lungo (SENZA HTML)
-    paragraphs = re.findall(r'<p[^>]*>(.*?)</p>', content, re.DOTALL | re.IGNORECASE)
-    max_par_words = 0
-    for p in paragraphs:
-        p_clean = re.sub(r'<[^>]+>', '', p)
-        # Conta solo se c'è almeno una parola vera
-        n_words = len(re.findall(r'\w+', p_clean))
-        if n_words > max_par_words:
-            max_par_words = n_words
-    # Se non ci sono paragrafi, max_par_words resta 0
-    values = {
-        5: f"({wc-1} parole)",
-        8: f"({density*100:.2f}% - {count} occorrenze)",
-        9: f"({url_len} caratteri)",
-        16: f"(max {max_par_words} parole in un paragrafo)",
+
+def article_digest(title, meta_desc, url_slug, content, keyword, digests=None):
+    digests = digests or _field_digests(title, meta_desc, url_slug, content, keyword)
+    return hashlib.sha256("|".join(digests[name] for name in RULE_INPUTS).encode("ascii")).hexdigest()
+
+def _cached_rule_value(key, compute):
+    # Valore dalla cache per-regola, calcolato solo se manca
+    with _rules_cache_lock:
+        value = _rule_results_cache.get(key)
+        _rules_cache_stats["rule_hits" if value is not None else "rule_misses"] += 1
+    if value is None:
+        value = compute()
+        with _rules_cache_lock:
+            _rule_results_cache[key] = value
+    return value
+
+def _evaluate_incremental(fields, digests, parts=None):
+    # L'analisi è pigra: il contenuto viene scansionato solo se una regola
+    # che legge "content" deve davvero essere rieseguita.
+    if parts is not None:
+        analysis = ArticleAnalysis.from_parts(**fields, parts=parts)
+    else:
+        analysis = ArticleAnalysis(**fields)
+    pack = rule_pack()
+    results = []
+    for rule, text in zip(RULES, pack["rule_texts"]):
+        # Il digest del pacchetto regole è nella chiave: cambiando soglie si ricalcola
+        key = (rule["func"].__name__, pack["digest"]) + tuple(digests[name] for name in rule["inputs"])
+        status = _cached_rule_value(key, lambda: run_rule(rule, **fields, analysis=analysis))
+        results.append({"text": text, "ok": status})
+    metrics_key = ("article_metrics", digests["url_slug"], digests["content"], digests["keyword"])
+    metrics = _cached_rule_value(metrics_key, lambda: article_metrics(analysis))
+    return {"results": results, "metrics": metrics}
+
+def evaluate_article(title, meta_desc, url_slug, content, keyword, parts=None):
+    # Restituisce {"results": [...], "metrics": {...}}, dalla cache se possibile.
+    # parts (opzionale): il contenuto già diviso in blocchi, vedi wp_article_parts
+    fields = dict(zip(RULE_INPUTS, (title, meta_desc, url_slug, content, keyword)))
+    digests = _field_digests(**fields)
+    key = (article_digest(**fields, digests=digests), rule_pack()["digest"])
+    with _rules_cache_lock:
+        cached = _rules_cache.get(key)
+        _rules_cache_stats["hits" if cached is not None else "misses"] += 1
+    if cached is None:
+        # Rivaluta solo le regole i cui input sono cambiati
+        cached = _evaluate_incremental(fields, digests, parts)
+        with _rules_cache_lock:
+            _rules_cache[key] = cached
+    # Copie, così chi modifica i risultati non sporca la cache
+    return {
+        "results": [dict(r) for r in cached["results"]],
+        "metrics": dict(cached["metrics"]),
     }
 
-    not_ok = []
-    ok = []
-    # Tooltip HTML per la regola power word
-    power_words_list = [
-        "Incredibile", "Sorprendente", "Scioccante", "Irresistibile", "Ufficiale", "Garantito", "Gratuito", "Leader", "Veloce", "Straordinario", "Meraviglioso", "Sensazionale", "Nuovo", "Innovativo", "Popolare", "Qualità", "Efficace", "Potente", "Esclusivo", "Motivante", "Sicuro", "Unico"
+def keyword_report(analysis, keywords):
+    # Presenza, posizione e densità di ogni keyword in titolo, meta, URL,
+    # sottotitoli, alt delle immagini e contenuto, con UNA scansione dei token.
+    # I campi sono concatenati con un separatore (None) che nessuna keyword attraversa.
+    segments = [
+        ("title", [re.findall(r'\w+', analysis.title.lower())]),
+        ("meta", [re.findall(r'\w+', analysis.meta_desc.lower())]),
+        ("url", [re.findall(r'\w+', analysis.url_slug.lower())]),
+        ("subheading", [re.findall(r'\w+', h.lower()) for h in analysis.headings]),
+        ("img_alt", [re.findall(r'\w+', alt.lower()) for alt in analysis.img_alts]),
+        ("content", [analysis.words_lower]),
     ]
-    power_words_tip = f"""
-    <span class='modern-info-wrap'>
-      <span class='modern-info-icon' tabindex='0'>?</span>
-      <span class='modern-tooltip'><b>Power words consigliate:</b><br>{', '.join(power_words_list)}</span>
-    </span>
-    """
-
-    # Aggiungi qui il tooltip per paragrafi brevi
-    short_paragraphs_tip = """
-    <span class='modern-info-wrap'>
-      <span class='modern-info-icon' tabindex='0'>?</span>
-      <span class='modern-tooltip'>
-        <b>Perché usare paragrafi brevi?</b><br>
-        Ogni paragrafo (tag <code>&lt;p&gt;</code>) non deve superare 120 parole
-        per mantenere la lettura fluida e chiara, soprattutto su mobile.
-      </span>
-    </span>
-    """
-
-    for idx, r in enumerate(results):
-        val = values.get(idx, "")
-        is_power = RULES[idx]["func"].__name__ == "rule_power_word_in_title"
-        is_short = RULES[idx]["func"].__name__ == "rule_short_paragraphs"
-        is_keyword_start = RULES[idx]["func"].__name__ == "rule_keyword_at_start_title"
-        text = f"{r['text']} {val}" if val else r['text']
-        is_custom = idx >= len(RANK_MATH_RULES)
-
-        # Scegli il tooltip giusto
-        tip_html = ""
-        if is_power:
-            tip_html = power_words_tip
-        elif is_short:
-            tip_html = short_paragraphs_tip
-        elif is_keyword_start:
-            tip_html = """
-            <span class='modern-info-wrap'>
-              <span class='modern-info-icon' tabindex='0'>?</span>
-              <span class='modern-tooltip'>
-                <b>Come funziona?</b><br>
-                La regola è rispettata se la <b>keyword</b> INIZIA come prima, seconda o terza parola del titolo SEO (cioè può avere al massimo 2 parole davanti).<br>
-                <br>
-                <b>Esempi (keyword: <span style='color:#1976d2;'>Installare Windows 11</span>):</b><br>
-                <span style='color:green;'><b>✔</b> Installare Windows 11: Guida Completa</span><br>
-                <span style='color:green;'><b>✔</b> 5 Installare Windows 11 facilmente</span><br>
-                <span style='color:green;'><b>✔</b> Guida pratica Installare Windows 11 oggi</span><br>
-                <span style='color:red;'><b>✘</b> Scopri come installare Windows 11 facilmente</span>
-              </span>
-            </span>
-            """
+    stream = []
+    bounds = {}
+    for name, token_lists in segments:
+        start = len(stream)
+        for tokens in token_lists:
+            stream.extend(tokens)
+            stream.append(None)
+        bounds[name] = (start, len(stream))
+    matcher = keyword_matcher(keywords)
+    hits = matcher.find_all(stream)
+
+    n_words = len(analysis.words_lower)
+    pack = rule_pack()
+    first_words = max(1, int(n_words * pack["content_start"]))
+    content_start = bounds["content"][0]
+    report = []
+    for kw, length, starts in zip(matcher.keywords, matcher.lengths, hits):
+        found = {name: [i for i in starts if lo <= i < hi] for name, (lo, hi) in bounds.items()}
+        count = len(found["content"])
+        density = count / n_words if n_words else 0
+        report.append({
+            "keyword": kw,
+            "in_title": bool(found["title"]),
+            "at_start_title": any(i < pack["title_start_positions"] for i in found["title"]),
+            "in_meta": bool(found["meta"]),
+            "in_url": bool(found["url"]),
+            "in_subheading": bool(found["subheading"]),
+            "in_img_alt": bool(found["img_alt"]),
+            "in_content": bool(count),
+            # L'occorrenza deve stare tutta nel primo 10% delle parole
+            "at_start_content": any(i - content_start + length <= first_words for i in found["content"]),
+            "count": count,
+            "density": density,
+            "density_ok": pack["density_min"] <= density <= pack["density_max"],
+        })
+    return report
+
+def evaluate_keywords(title, meta_desc, url_slug, content, keywords, parts=None):
+    # Report per keyword (vedi keyword_report), in cache come i risultati delle regole
+    if not keywords:
+        return []
+    focus = keywords[0]
+    digests = _field_digests(title, meta_desc, url_slug, content, focus)
+    key = ("keyword_report", rule_pack()["digest"], article_digest(title, meta_desc, url_slug, content, focus, digests=digests), tuple(keywords))
 
-        if not r["ok"]:
-            label = "🟦" if is_custom else "❌"
-            not_ok.append({"text": f"{label} {text}", "tip": tip_html})
+    def compute():
+        if parts is not None:
+            analysis = ArticleAnalysis.from_parts(title, meta_desc, url_slug, parts, focus, content=content)
         else:
-            label = "🟦" if is_custom else "✅"
-            ok.append({"text": f"{label} {text}", "tip": tip_html})
-
-    html = css
-    for t in not_ok:
-        html += f"<div style='position:relative; border:1px solid #e63946; border-radius:10px; padding:12px 44px 12px 14px; margin-bottom:10px; background-color:#f8d7da; color:#721c24; min-height:28px; font-size:16px; font-weight:500; box-shadow:0 2px 8px rgba(230,57,70,0.07); transition:box-shadow 0.2s;'>{t['text']}{t['tip']}</div>"
-    for t in ok:
-        html += f"<div style='position:relative; border:1px solid #38b000; border-radius:10px; padding:12px 44px 12px 14px; margin-bottom:10px; background-color:#d4edda; color:#155724; min-height:28px; font-size:16px; font-weight:500; box-shadow:0 2px 8px rgba(56,176,0,0.07); transition:box-shadow 0.2s;'>{t['text']}{t['tip']}</div>"
-    return html
-
-def update():
-    # Recupera i dati correnti dagli input (se disponibili)
-    title = st.session_state.get('Titolo SEO', "")
-    meta_desc = st.session_state.get('Meta Description (max 160 caratteri)', "")
-    url_slug = st.session_state.get('URL Slug (senza dominio)', "")
-    content = st.session_state.get("Contenuto dell'articolo", "")
-    keyword = st.session_state.get('Keyword principale', "")
-    st.session_state['rules_html'] = get_rules_html(title, meta_desc, url_slug, content, keyword)
+            analysis = ArticleAnalysis(title, meta_desc, url_slug, content, focus)
+        return keyword_report(analysis, keywords)
+
+    return [dict(r) for r in _cached_rule_value(key, compute)]
+
+def rules_cache_stats():
+    with _rules_cache_lock:
+        return {
+            **_rules_cache_stats,
+            "size": len(_rules_cache),
+            "rule_size": len(_rule_results_cache),
+            "maxsize": _rules_cache.maxsize,
+            "ttl": _rules_cache.ttl,
+        }
+
+def clear_rules_cache():
+    with _rules_cache_lock:
+        _rules_cache.clear()
+        _rule_results_cache.clear()
+        for k in _rules_cache_stats:
+            _rules_cache_stats[k] = 0
+    with _block_stats_lock:
+        _block_stats_cache.clear()
+
+# Pannello regole. CSS, tooltip e righe vengono da template Jinja2 compilati una
+# volta per processo; lo stile delle righe è nel CSS (classi) invece che ripetuto
+# inline in ogni riga. Ogni riga renderizzata resta in cache finché non cambiano
+# il suo stato o il suo valore, quindi a ogni rerun si ricompongono solo le
+# righe cambiate (la cache non dipende dall'articolo, clear_rules_cache non la
+# svuota). Il CSS va in un elemento a parte (vedi rules_panel_css), sempre
+# uguale: Streamlit non lo ridisegna e non viaggia insieme alle righe.
+RULES_PANEL_CSS = """
+<style>
+.rule-row {
+    position: relative;
+    border: 1px solid;
+    border-radius: 10px;
+    padding: 12px 44px 12px 14px;
+    margin-bottom: 10px;
+    min-height: 28px;
+    font-size: 16px;
+    font-weight: 500;
+    transition: box-shadow 0.2s;
+}
+.rule-row.ko {
+    border-color: #e63946;
+    background-color: #f8d7da;
+    color: #721c24;
+    box-shadow: 0 2px 8px rgba(230,57,70,0.07);
+}
+.rule-row.ok {
+    border-color: #38b000;
+    background-color: #d4edda;
+    color: #155724;
+    box-shadow: 0 2px 8px rgba(56,176,0,0.07);
+}
+.modern-info-wrap {
+    position: absolute;
+    top: 12px;
+    bottom: 12px;
+    right: 12px;
+    z-index: 2;
+    display: flex;
+    align-items: center;
+    height: auto;
+}
+.modern-info-icon {
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    width: 24px;
+    height: 24px;
+    border-radius: 50%;
+    border: 1.5px solid #888;
+    color: #555;
+    background: #fff;
+    font-size: 18px;
+    font-weight: 700;
+    box-shadow: 0 1px 4px rgba(0,0,0,0.07);
+    cursor: pointer;
+    transition: border-color 0.2s, color 0.2s;
+}
+.modern-info-icon:hover {
+    border-color: #1976d2;
+    color: #1976d2;
+}
+.modern-info-wrap:hover .modern-tooltip, .modern-info-wrap:focus-within .modern-tooltip {
+    display: block;
+}
+.modern-tooltip {
+    display: none;
+    position: absolute;
+    right: 0;
+    top: -70px;
+    min-width: 220px;
+    max-width: 320px;
+    background: #fff;
+    color: #222;
+    border-radius: 10px;
+    box-shadow: 0 4px 16px rgba(0,0,0,0.13);
+    padding: 14px 18px;
+    font-size: 15px;
+    font-weight: 400;
+    z-index: 1000;
+    border: 1px solid #e0e0e0;
+}
+</style>
+"""
+
+RULE_TOOLTIP_TEMPLATE = (
+    "<span class='modern-info-wrap'><span class='modern-info-icon' tabindex='0'>?</span>"
+    "<span class='modern-tooltip'>{{ body }}</span></span>"
+)
+RULE_ROW_TEMPLATE = "<div class='rule-row {{ status }}'>{{ label }} {{ text }}{% if value %} {{ value }}{% endif %}{{ tip }}</div>"
+
+# Contenuto dei tooltip, per funzione della regola (valori dal pacchetto regole)
+RULE_TOOLTIPS = {
+    "rule_power_word_in_title": "<b>Power words consigliate:</b><br>{{ power_words|map('capitalize')|join(', ') }}",
+    "rule_short_paragraphs": (
+        "<b>Perché usare paragrafi brevi?</b><br>"
+        "Ogni paragrafo (tag <code>&lt;p&gt;</code>) non deve superare {{ paragraph_max_words }} parole "
+        "per mantenere la lettura fluida e chiara, soprattutto su mobile."
+    ),
+    "rule_keyword_at_start_title": (
+        "<b>Come funziona?</b><br>"
+        "La regola è rispettata se la <b>keyword</b> INIZIA come prima, seconda o terza parola del titolo SEO "
+        "(cioè può avere al massimo 2 parole davanti).<br><br>"
+        "<b>Esempi (keyword: <span style='color:#1976d2;'>Installare Windows 11</span>):</b><br>"
+        "<span style='color:green;'><b>✔</b> Installare Windows 11: Guida Completa</span><br>"
+        "<span style='color:green;'><b>✔</b> 5 Installare Windows 11 facilmente</span><br>"
+        "<span style='color:green;'><b>✔</b> Guida pratica Installare Windows 11 oggi</span><br>"
+        "<span style='color:red;'><b>✘</b> Scopri come installare Windows 11 facilmente</span>"
+    ),
+}
+
+def rules_templates():
+    def create():
+        # Il testo delle regole e i tooltip sono HTML scritto da noi: niente autoescape
+        env = jinja2.Environment(autoescape=False)
+        return {
+            "tooltip": env.from_string(RULE_TOOLTIP_TEMPLATE),
+            "row": env.from_string(RULE_ROW_TEMPLATE),
+            "tooltips": {name: env.from_string(body) for name, body in RULE_TOOLTIPS.items()},
+        }
+    return shared("rules_templates", create)
+
+_rule_rows_cache = shared("rule_rows_cache", lambda: LRUCache(maxsize=RULES_CACHE_MAXSIZE))
+_rule_rows_lock = shared("rule_rows_lock", threading.Lock)
+
+def rule_tooltips(pack):
+    # {nome funzione: HTML del tooltip}, renderizzati una volta per pacchetto regole
+    key = ("tooltips", pack["digest"])
+    with _rule_rows_lock:
+        tips = _rule_rows_cache.get(key)
+    if tips is None:
+        templates = rules_templates()
+        tips = {
+            name: templates["tooltip"].render(body=body.render(**pack))
+            for name, body in templates["tooltips"].items()
+        }
+        with _rule_rows_lock:
+            _rule_rows_cache[key] = tips
+    return tips
+
+def render_rule_row(idx, ok, value, pack):
+    # Una riga del pannello, dalla cache se stato e valore non sono cambiati
+    key = (pack["digest"], idx, ok, value)
+    with _rule_rows_lock:
+        row = _rule_rows_cache.get(key)
+    if row is None:
+        is_custom = idx >= len(RANK_MATH_RULES)
+        row = rules_templates()["row"].render(
+            status="ok" if ok else "ko",
+            label="🟦" if is_custom else ("✅" if ok else "❌"),
+            text=pack["rule_texts"][idx],
+            value=value,
+            tip=rule_tooltips(pack).get(RULES[idx]["func"].__name__, ""),
+        )
+        with _rule_rows_lock:
+            _rule_rows_cache[key] = row
+    return row
+
+def rules_panel_css():
+    return RULES_PANEL_CSS
+
+# Funzione per mostrare le regole colorate e ordinate (prima quelle non rispettate)
+def get_rules_html(title, meta_desc, url_slug, content, keyword, parts=None, include_css=True):
+    # Risultati e valori attuali arrivano dalla stessa valutazione (in cache)
+    evaluation = evaluate_article(title, meta_desc, url_slug, content, keyword, parts=parts)
+    results = evaluation["results"]
+    metrics = evaluation["metrics"]
+    values = {
+        5: f"({metrics['word_count']-1} parole)",
+        8: f"({metrics['density']*100:.2f}% - {metrics['keyword_count']} occorrenze)",
+        9: f"({metrics['url_length']} caratteri)",
+        16: f"(max {metrics['max_paragraph_words']} parole in un paragrafo)",
+    }
+    pack = rule_pack()
+    rows = [render_rule_row(idx, r["ok"], values.get(idx, ""), pack) for idx, r in enumerate(results)]
+    not_ok = [row for row, r in zip(rows, results) if not r["ok"]]
+    ok = [row for row, r in zip(rows, results) if r["ok"]]
+    html = "".join(not_ok + ok)
+    return RULES_PANEL_CSS + html if include_css else html
+
+# Tabella con una riga per keyword (principale + secondarie)
+KEYWORD_REPORT_COLUMNS = [
+    ("in_title", "Titolo"),
+    ("at_start_title", "Inizio titolo"),
+    ("in_meta", "Meta"),
+    ("in_url", "URL"),
+    ("in_subheading", "H2/H3"),
+    ("in_img_alt", "Alt img"),
+    ("at_start_content", "Primo {content_start:g}%"),
+    ("density_ok", "Densità {density_min:g}-{density_max:g}%"),
+]
+
+def get_keywords_html(title, meta_desc, url_slug, content, keywords, parts=None):
+    report = evaluate_keywords(title, meta_desc, url_slug, content, keywords, parts=parts)
+    cell = "padding:6px 8px; border-bottom:1px solid #e0e0e0; text-align:center;"
+    html = "<table style='width:100%; border-collapse:collapse; font-size:15px; margin-bottom:18px;'>"
+    html += f"<tr><th style='{cell} text-align:left;'>Keyword</th>"
+    labels = rule_pack()["labels"]
+    html += "".join(f"<th style='{cell}'>{label.format(**labels)}</th>" for _, label in KEYWORD_REPORT_COLUMNS)
+    html += "</tr>"
+    for idx, r in enumerate(report):
+        role = "principale" if idx == 0 else "secondaria"
+        html += (
+            f"<tr><td style='{cell} text-align:left;'><b>{r['keyword']}</b>"
+            f"<br><span style='font-size:12px; color:#666;'>{role} · {r['density']*100:.2f}% - {r['count']} occorrenze</span></td>"
+        )
+        html += "".join(f"<td style='{cell}'>{'✅' if r[key] else '❌'}</td>" for key, _ in KEYWORD_REPORT_COLUMNS)
+        html += "</tr>"
+    html += "</table>"
+    # Le regole qui sopra cercano la keyword anche dentro altre parole: la tabella no
+    return html + (
+        "<div style='font-size:12px; color:#666; margin:-12px 0 18px;'>"
+        "La tabella conta le keyword solo come parole intere (\"gatto\" non vale in \"gattone\"); "
+        "le regole Rank Math qui sopra accettano anche parti di parola.</div>"
+    )
 
 def auto_complete():
     # Al cambio di keyword, compila Titolo SEO, URL Slug e Contenuto
@@ -513,21 +1090,8 @@ def auto_complete():
     # Slug in minuscolo con trattini
     if not st.session_state.get('URL Slug (senza dominio)', '').strip():
         st.session_state['URL Slug (senza dominio)'] = kw.lower().replace(' ', '-')
-    # Ricalcola le regole
-    update()
-
-def block_to_html(block):
-    t = block["type"]
-    if t == "Paragrafo":
-        return f"<p>{block['content']}</p>"
-    if t == "Titolo H2":
-        return f"<h2>{block['content']}</h2>"
-    if t == "Immagine":
-        url = block.get("url", "")
-        alt = block.get("alt", "")
-        return f'<img src="{url}" loading="lazy" alt="{alt}" />'
-    return ""
 
+@profiled_function("assemble_blocks", lambda blocks: f"{len(blocks)} blocchi")
 def assemble_blocks(blocks):
     # Nessuna indentazione qui!
     return "\n".join(block_to_html(b) for b in blocks)
@@ -540,85 +1104,531 @@ def scroll_to_editor():
         </script>
     """, height=0)
 
-# Main UI
-def main():
-    st.set_page_config(page_title="SEO Article Generator", layout="wide")
+def render_debug_panel():
+    # Pannello nascosto: compare solo aprendo l'app con ?debug=1.
+    # Mostra le misure raccolte fino al rerun precedente.
+    if st.query_params.get("debug") != "1":
+        return
+    with st.sidebar.expander("🛠️ Debug prestazioni", expanded=False):
+        PROFILING["enabled"] = st.checkbox(
+            "Profilazione attiva (tutte le sessioni)",
+            value=PROFILING["enabled"],
+            key="debug_profiling"
+        )
+        report = profile_report()
+        cache = report["rules_cache"]
+        st.caption(
+            f"Cache regole: {cache['hits']} hit / {cache['misses']} miss · "
+            f"per regola: {cache['rule_hits']} hit / {cache['rule_misses']} miss"
+        )
+        pack = rule_pack_status()
+        st.caption(
+            f"Pacchetto regole: {os.path.basename(pack.get('path', ''))} "
+            f"v{pack.get('version', 0)} ({pack.get('loaded_at', '')})"
+        )
+        if pack.get("error"):
+            st.warning(f"Pacchetto regole non ricaricato: {pack['error']}")
+        breaker = jsonbin_client().breaker
+        st.caption(f"JSONBin: circuito {breaker.state} ({breaker.failures} errori consecutivi)")
+        rows = [
+            {
+                "voce": name,
+                "chiamate": e["calls"],
+                "totale ms": round(e["total_ms"], 2),
+                "media ms": round(e["mean_ms"], 3),
+                "max ms": round(e["max_ms"], 2),
+                "input più lento": e["slowest"][0]["input"] if e["slowest"] else "",
+            }
+            for name, e in report["timings"].items()
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.info("Nessuna misura: attiva la profilazione e usa l'app.")
+        st.download_button(
+            "Esporta JSON",
+            data=json.dumps(report, indent=2, ensure_ascii=False),
+            file_name="profilazione.json",
+            mime="application/json",
+            key="debug_export_profile"
+        )
+        if st.button("Azzera misure", key="debug_reset_profile"):
+            reset_profile()
+            st.rerun()
 
-    # --- INIZIO SIDEBAR: Salva/Carica bozza ---
-    st.sidebar.markdown("### 📄 Gestione Bozze")
+# CSS e script statici della pagina, costruiti una volta sola
+FIXED_LABELS_JS = """
+<script>
+// Funzione che assicura che le etichette .fixed-label restino sempre visibili
+function mantieni_etichette_visibili() {
+    const etichette = document.querySelectorAll('.fixed-label');
+    etichette.forEach(etichetta => {
+        etichetta.style.display = 'block';
+        etichetta.style.visibility = 'visible';
+        etichetta.style.opacity = '1';
+        etichetta.style.position = 'static';
+        etichetta.style.pointerEvents = 'auto';
+    });
+}
+
+// Esegui subito e poi ogni 200ms per catturare aggiornamenti dinamici
+document.addEventListener('DOMContentLoaded', function() {
+    mantieni_etichette_visibili();
+    setInterval(mantieni_etichette_visibili, 200);
+});
+</script>
+"""
 
-    draft_name = st.sidebar.text_input("Nome bozza", value="", placeholder="nome_bozza", key="draft_name")
+BUTTONS_CSS = """
+<style>
+/* Minimal modern button style */
+button.stButton > button, div.stButton > button {
+    background: #fff;
+    color: #1976d2;
+    border: 1.5px solid #1976d2;
+    border-radius: 8px;
+    padding: 0.6em 1.5em;
+    font-size: 1.08rem;
+    font-weight: 600;
+    box-shadow: 0 2px 8px rgba(25, 118, 210, 0.07);
+    transition: background 0.18s, box-shadow 0.18s, color 0.18s, border-color 0.18s;
+    outline: none;
+    cursor: pointer;
+}
+button.stButton > button:hover, div.stButton > button:hover {
+    background: #e3f0fc !important; /* hover: azzurrino chiaro */
+    color: #1251a3 !important;
+    border-color: #1251a3 !important;
+    box-shadow: 0 4px 16px rgba(25, 118, 210, 0.13) !important;
+}
+button.stButton > button:active, div.stButton > button:active {
+    background: #c7e0fa !important; /* active: azzurro più intenso */
+    color: #0d3c75 !important;
+    border-color: #1251a3 !important;
+    box-shadow: 0 2px 8px rgba(25, 118, 210, 0.18) !important;
+}
+button.stButton > button:focus, div.stButton > button:focus {
+    outline: none !important;
+    background: #fff !important;
+    color: #1251a3 !important;
+    border-color: #1251a3 !important;
+    box-shadow: 0 0 0 2px #e3f0fc !important; /* leggero glow azzurrino, NO doppio bordo */
+}
+/* UNIVERSAL OVERRIDE: forza testo e bordo blu in ogni stato e classe */
+button.stButton > button, div.stButton > button,
+button.stButton > button:active, div.stButton > button:active,
+button.stButton > button:focus, div.stButton > button:focus,
+button.stButton > button[style], div.stButton > button[style],
+button.stButton > button[class], div.stButton > button[class] {
+    color: #1251a3 !important;
+    border-color: #1251a3 !important;
+    box-shadow: 0 2px 8px rgba(25, 118, 210, 0.13) !important;
+    text-shadow: none !important;
+}
+/* Disabilita ogni bordo rosso interno/esterno */
+button.stButton > button:after, button.stButton > button:before,
+div.stButton > button:after, div.stButton > button:before {
+    border-color: #1251a3 !important;
+    box-shadow: none !important;
+}
+</style>
+"""
+
+SIDEBAR_LABELS_CSS = """
+<style>
+/* STILE ETICHETTE SIDEBAR SEMPRE COERENTE */
+.fixed-label {
+    display: block;
+    font-size: 14px;
+    font-weight: 600;
+    color: rgb(49, 51, 63);
+    margin: 0 0 0.25rem 0 !important; /* IMPORTANTE: margine fisso */
+    padding: 0 !important;
+    height: auto !important;
+    line-height: 1.4 !important;
+}
+
+/* Uniforma lo spazio tra etichetta e campo in OGNI STATO */
+div[data-testid="stSidebar"] div[data-testid="stTextInput"],
+div[data-testid="stSidebar"] div[data-testid="stTextArea"] {
+    margin-top: 0 !important;
+    padding-top: 0 !important;
+    position: relative !important; /* Importante per il posizionamento assoluto */
+}
+
+/* IMPORTANTE: rimuovi completamente qualsiasi label nativa di Streamlit nella sidebar */
+div[data-testid="stSidebar"] div[data-testid="stTextInput"] label,
+div[data-testid="stSidebar"] div[data-testid="stTextArea"] label {
+    display: none !important;
+    height: 0 !important;
+    max-height: 0 !important;
+    margin: 0 !important;
+    padding: 0 !important;
+    position: absolute !important;
+    opacity: 0 !important;
+    pointer-events: none !important;
+    visibility: hidden !important;
+}
+
+/* Garantisci che lo spazio tra elementi della sidebar sia sempre lo stesso */
+div[data-testid="stSidebar"] div[data-testid="stVerticalBlock"] > div {
+    margin-bottom: 1rem !important;
+}
+</style>
+"""
+
+ADD_BLOCK_CSS = """
+<style>
+.add-block-btn {
+    display: inline-flex;
+    align-items: center;
+    gap: 7px;
+    background: #f7f7fa;
+    color: #1976d2;
+    border: 1.5px solid #1976d2;
+    border-radius: 7px;
+    padding: 0.38em 1.1em;
+    font-size: 1.07rem;
+    font-weight: 600;
+    margin-right: 10px;
+    margin-bottom: 8px;
+    cursor: pointer;
+    transition: background 0.18s, color 0.18s, border-color 0.18s;
+    box-shadow: 0 1px 4px rgba(25,118,210,0.04);
+}
+.add-block-btn:hover {
+    background: #e3f0fc;
+    color: #1251a3;
+    border-color: #1251a3;
+}
+.add-block-btn svg {
+    width: 1.2em;
+    height: 1.2em;
+    vertical-align: middle;
+}
+</style>
+"""
+
+EDITOR_OVERRIDES_CSS = """
+<style>
+/* AGGIUNGI questa regola all'inizio dell'editor CSS per forzare le etichette della sidebar */
+div[data-testid="stSidebar"] .fixed-label {
+    display: block !important;
+    visibility: visible !important;
+    opacity: 1 !important;
+    padding-bottom: 0 !important;
+    padding-top: 2px;
+    border-radius: 6px;
+    background: #f7f7fa;
+    box-shadow: 0 1px 4px rgba(25,118,210,0.04);
+}
+/* togli gap tra label e widget successivo */
+.compact-block-row + div {
+    margin-top: 0 !important;
+    padding-top: 0 !important;
+}
+/* rimuovi eventuali margini delle etichette vuote */
+div[data-testid="stTextInput"] label,
+div[data-testid="stTextArea"] label {
+    display: none !important;
+    margin: 0 !important;
+    padding: 0 !important;
+}
+/* forza il widget senza margine superiore */
+div[data-testid="stTextInput"],
+div[data-testid="stTextArea"] {
+    margin-top: 0 !important;
+    padding-top: 0 !important;
+}
+
+div[data-testid="stExpanderContent"] button[kind="secondary"]:hover {
+    background: #eeeeee !important;
+    color: #555555 !important;
+    border-color: #aaaaaa !important;
+}
+</style>
+"""
 
-    # Recupera bozze remote (solo da JSONBin)
-    jsonbin_drafts = get_jsonbin_drafts()
-    if jsonbin_drafts:
-        draft_options = [f"{name} (JSONBin)" for _, name in jsonbin_drafts]
-        selected_draft_idx = st.sidebar.selectbox(
+EDITOR_BUTTONS_CSS = """
+<style>
+.editor-btn-row {
+    display: flex;
+    gap: 8px;
+    margin-bottom: 8px;
+}
+.editor-btn {
+    width: 38px;
+    height: 38px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 1.25em;
+    background: #f7f7fa;
+    color: #1976d2;
+    border: 1.5px solid #1976d2;
+    border-radius: 7px;
+    cursor: pointer;
+    transition: background 0.18s, color 0.18s, border-color 0.18s;
+    font-weight: bold;
+    padding: 0;
+}
+.editor-btn:hover, .editor-btn:active, .editor-btn:focus {
+    background: #e3f0fc !important;
+    color: #1251a3 !important;
+    border-color: #1251a3 !important;
+}
+</style>
+"""
+
+IMAGE_TOOLTIP_CSS = """
+<style>
+.img-info-wrap {
+    display: inline-flex;
+    align-items: center;
+    margin-left: 6px;
+    position: relative;
+}
+.img-info-icon {
+    display: inline-block;
+    width: 18px;
+    height: 18px;
+    line-height: 18px;
+    text-align: center;
+    border-radius: 50%;
+    background: #e0e0e0;
+    font-size: 0.95em;
+    cursor: help;
+    margin-left: 2px;
+    color: #1976d2;
+    font-weight: bold;
+}
+.img-info-wrap .img-tooltip {
+    visibility: hidden;
+    opacity: 0;
+    width: 220px;
+    background-color: #333;
+    color: #fff;
+    text-align: left;
+    padding: 8px;
+    border-radius: 4px;
+    position: absolute;
+    z-index: 1;
+    bottom: 125%;
+    left: 50%;
+    transform: translateX(-50%);
+    transition: opacity 0.2s;
+    font-size: 0.98em;
+}
+.img-info-wrap:hover .img-tooltip {
+    visibility: visible;
+    opacity: 1;
+}
+</style>
+"""
+
+LENGTH_BAR_COLORS = ['#e63946','#fb8c00','#ffeb3b','#cddc39','#38b000']
+
+@lru_cache(maxsize=1024)
+def length_bar(length, maximum):
+    # Barra a 5 segmenti per la lunghezza di titolo, slug e meta (tutta rossa oltre il massimo)
+    if length > maximum:
+        segments = "".join("<div style='flex:1; height:6px; background:#e63946; opacity:1;'></div>" for _ in LENGTH_BAR_COLORS)
+    else:
+        idx = min(length * 5 // (maximum + 1), 4)
+        segments = "".join(
+            f"<div style='flex:1; height:6px; background:{col}; opacity:{1 if i<=idx else 0.3};'></div>"
+            for i, col in enumerate(LENGTH_BAR_COLORS)
+        )
+    return f"<div style='display:flex; margin-top:4px;'>{segments}</div>"
+
+# Campi dei blocchi e chiave del widget dell'editor che li modifica (per id del blocco)
+BLOCK_WIDGET_KEYS = {
+    "Paragrafo": (("content", "txt_{id}"),),
+    "Titolo H2": (("content", "h2_{id}"),),
+    "Immagine": (("url", "img_url_{id}"), ("alt", "img_alt_{id}")),
+    "Titolo H3": (("content", "h3_{id}"),),
+    "Elenco": (("content", "list_{id}"),),
+    "Video": (("url", "video_url_{id}"),),
+}
+
+def sync_block_widgets(blocks):
+    # Copia nei blocchi il valore dei widget dell'editor, e prima ancora i testi
+    # in attesa dei pulsanti di formattazione (pending_<chiave>)
+    for blk in blocks:
+        for field, key in BLOCK_WIDGET_KEYS.get(blk.type, ()):
+            key = key.format(id=blk.id)
+            pending_key = f"pending_{key}"
+            if pending_key in st.session_state:
+                st.session_state[key] = st.session_state.pop(pending_key)
+            if key in st.session_state:
+                blk[field] = st.session_state[key]
+
+def editor_blocks():
+    # I blocchi della sessione come Block (da bozze e import arrivano come dict)
+    if "content_blocks" not in st.session_state:
+        st.session_state.content_blocks = []
+    return as_blocks(st.session_state.content_blocks)
+
+def rerun_fragment():
+    # st.rerun(scope="fragment") vale solo nei rerun del fragment: durante un rerun
+    # completo (o in AppTest) si riesegue tutta la pagina
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# Editor a pagine: con centinaia di blocchi solo EDITOR_PAGE_SIZE alla volta hanno
+# i widget (testo e pulsanti); gli altri restano nei dati della sessione e si
+# raggiungono con le frecce, "Vai al blocco" o l'indice. I widget dei blocchi
+# fuori pagina spariscono, ma il loro testo è già nei blocchi (sync_block_widgets).
+EDITOR_PAGE_SIZE = 20
+BLOCK_SUMMARY_CHARS = 70
+
+def show_editor_block(index):
+    # Apre la pagina dell'editor che contiene il blocco `index`
+    st.session_state["editor_page"] = max(index, 0) // EDITOR_PAGE_SIZE
+
+def editor_page_step(step):
+    st.session_state["editor_page"] = st.session_state.get("editor_page", 0) + step
+
+def jump_to_block():
+    show_editor_block(st.session_state["editor_jump"] - 1)
+
+def block_summary(blk):
+    # Una riga di testo per l'indice dei blocchi
+    if blk.get("type") in ("Immagine", "Video"):
+        text = blk.get("alt") or blk.get("url") or ""
+    else:
+        text = re.sub(r"<[^>]+>", "", blk.get("content", ""))
+    text = " ".join(text.split())
+    if len(text) > BLOCK_SUMMARY_CHARS:
+        text = text[:BLOCK_SUMMARY_CHARS - 1] + "…"
+    return text
+
+def render_editor_navigation(blocks):
+    # Restituisce (inizio, fine) dei blocchi da mostrare con i widget
+    n_blocks = len(blocks)
+    pages = max(1, -(-n_blocks // EDITOR_PAGE_SIZE))
+    page = min(max(st.session_state.get("editor_page", 0), 0), pages - 1)
+    st.session_state["editor_page"] = page
+    start = page * EDITOR_PAGE_SIZE
+    end = min(start + EDITOR_PAGE_SIZE, n_blocks)
+    if pages == 1:
+        return start, end
+
+    col_prev, col_info, col_next = st.columns([1, 3, 1], gap="small")
+    with col_prev:
+        st.button("◀", key="editor_prev", help="Pagina precedente", disabled=page == 0,
+                  on_click=editor_page_step, args=(-1,), use_container_width=True)
+    with col_info:
+        st.markdown(
+            f"<div style='text-align:center; padding-top:8px;'>Blocchi {start + 1}–{end} di {n_blocks} "
+            f"· pagina {page + 1}/{pages}</div>",
+            unsafe_allow_html=True
+        )
+    with col_next:
+        st.button("▶", key="editor_next", help="Pagina successiva", disabled=page == pages - 1,
+                  on_click=editor_page_step, args=(1,), use_container_width=True)
+    # Il valore va riportato nei limiti prima di creare il widget (i blocchi possono essere diminuiti)
+    if st.session_state.get("editor_jump", 1) > n_blocks:
+        st.session_state["editor_jump"] = n_blocks
+    st.number_input("Vai al blocco", min_value=1, max_value=n_blocks, step=1, key="editor_jump", on_change=jump_to_block)
+    with st.expander(f"Indice dei blocchi ({n_blocks})", expanded=False):
+        # Un solo elemento per tutto l'indice, non uno per blocco
+        rows = []
+        for i, blk in enumerate(blocks):
+            line = f"{i + 1}. {blk.get('type', '')} · {html_escape(block_summary(blk))}"
+            rows.append(f"<b>{line}</b>" if start <= i < end else line)
+        st.markdown(
+            "<div style='font-size:13px; line-height:1.5; max-height:320px; overflow-y:auto;'>"
+            + "<br>".join(rows) + "</div>",
+            unsafe_allow_html=True
+        )
+    return start, end
+
+# Gestione bozze nella sidebar. È un fragment: scegliere una bozza, salvarla o
+# eliminarla riesegue solo questo pannello, non tutta la pagina.
+# Va chiamato dentro `with st.sidebar:` (un fragment non può usare st.sidebar).
+@st.fragment
+def render_draft_panel():
+    st.markdown("### 📄 Gestione Bozze")
+
+    st.text_input("Nome bozza", value="", placeholder="nome_bozza", key="draft_name")
+
+    # Bozze salvate (dalla cache se ancora valida)
+    storage = draft_storage()
+    drafts = get_drafts()
+    if drafts:
+        draft_options = [f"{name} ({storage.label})" for _, name in drafts]
+        selected_draft_idx = st.selectbox(
             "Carica bozza",
             range(len(draft_options)),
             format_func=lambda i: draft_options[i],
             key="selected_draft",
             index=0
         )
-        selected_bin_id = jsonbin_drafts[selected_draft_idx][0]  # <-- AGGIUNGI QUESTA RIGA
+        selected_draft_id = drafts[selected_draft_idx][0]
     else:
-        st.sidebar.info("Nessuna bozza remota disponibile.")
-        selected_bin_id = None  # <-- AGGIUNGI QUESTA RIGA
+        st.info("Nessuna bozza salvata.")
+        selected_draft_id = None
+    # Il callback svuota la cache prima del rerun, quindi la lista viene riletta subito
+    st.button("🔄 Aggiorna elenco bozze", key="refresh_drafts_btn_sidebar", on_click=invalidate_draft_list)
 
-    col_save, col_load, col_delete = st.sidebar.columns(3)
+    col_save, col_load, col_delete = st.columns(3)
     with col_save:
         if st.button("💾 Salva bozza", key="save_draft_btn_sidebar"):
-            save_draft()  # Salva solo su JSONBin
+            save_draft()
+            rerun_fragment()
+        if st.button("📄 Salva come nuova", key="save_draft_as_new_btn_sidebar"):
+            save_draft(as_new=True)
+            rerun_fragment()
 
     with col_load:
-        if st.button("📂 Carica bozza", key="load_draft_btn_sidebar"):
-            if jsonbin_drafts and len(jsonbin_drafts) > 0:
-                bin_id = jsonbin_drafts[selected_draft_idx][0]
-                load_draft(bin_id)
+        if st.button("📂 Carica bozza", key="load_draft_btn_sidebar") and selected_draft_id:
+            # Il caricamento cambia i valori di tutti i widget: serve il rerun completo
+            st.session_state["load_draft_pending"] = selected_draft_id
+            st.rerun()
 
     with col_delete:
-        if st.button("🗑️ Elimina bozza", key="delete_draft_btn_sidebar") and selected_bin_id:
-            delete_jsonbin_draft(selected_bin_id)
-            remove_draft_from_list(selected_bin_id)
-            st.rerun()
-# --- FINE SIDEBAR: Salva/Carica bozza ---
+        if st.button("🗑️ Elimina bozza", key="delete_draft_btn_sidebar") and selected_draft_id:
+            delete_draft(selected_draft_id)
+            rerun_fragment()
+
+    st.checkbox("Salvataggio automatico", value=True, key="autosave_enabled")
+    render_autosave_status()
+
+    # Esito di salvataggio/caricamento/eliminazione, fatti nel rerun precedente
+    draft_message = st.session_state.pop("draft_message", None)
+    if draft_message:
+        kind, text = draft_message
+        getattr(st, kind)(text)
+
+# Main UI
+def main():
+    render_app()
+    # Salvataggio automatico della bozza (in background, solo se è cambiata),
+    # anche quando la pagina si ferma prima (es. keyword mancante)
+    autosave_draft()
+
+def render_app():
+    st.set_page_config(page_title="SEO Article Generator", layout="wide")
+    rule_pack()
+    watch_rule_pack()
+    render_debug_panel()
 
-    # Caricamento bozza PRIMA di creare i widget
+    # Caricamento bozza PRIMA di creare i widget (anche il nome bozza)
     pending_draft = st.session_state.get("load_draft_pending", False)
     if pending_draft:
-        try:
-            with open(pending_draft, "r", encoding="utf-8") as f:
-                draft = json.load(f)
-            for k, v in draft.items():
-                st.session_state[k] = v
-            st.success(f"Bozza caricata da {pending_draft}!")
-        except Exception as e:
-            st.error(f"Errore nel caricamento bozza: {e}")
         st.session_state["load_draft_pending"] = False
-        st.rerun()
+        load_draft(pending_draft)
 
-    # Aggiungi dopo st.set_page_config()
-    st.markdown("""
-    <script>
-    // Funzione che assicura che le etichette .fixed-label restino sempre visibili
-    function mantieni_etichette_visibili() {
-        const etichette = document.querySelectorAll('.fixed-label');
-        etichette.forEach(etichetta => {
-            etichetta.style.display = 'block';
-            etichetta.style.visibility = 'visible';
-            etichetta.style.opacity = '1';
-            etichetta.style.position = 'static';
-            etichetta.style.pointerEvents = 'auto';
-        });
-    }
+    # --- INIZIO SIDEBAR: Salva/Carica bozza ---
+    with st.sidebar:
+        render_draft_panel()
+    # --- FINE SIDEBAR: Salva/Carica bozza ---
 
-    // Esegui subito e poi ogni 200ms per catturare aggiornamenti dinamici
-    document.addEventListener('DOMContentLoaded', function() {
-        mantieni_etichette_visibili();
-        setInterval(mantieni_etichette_visibili, 200);
-    });
-    </script>
-    """, unsafe_allow_html=True)
+    # Aggiungi dopo st.set_page_config()
+    st.markdown(FIXED_LABELS_JS, unsafe_allow_html=True)
 
     # Inseriamo subito un'ancora invisibile in cima alla pagina.
     st.markdown('<div id="top_anchor"></div>', unsafe_allow_html=True)
@@ -645,108 +1655,14 @@ def main():
         )
         del st.session_state.scroll_to_top_pending
 
-    st.markdown('''
-    <style>
-    /* Minimal modern button style */
-    button.stButton > button, div.stButton > button {
-        background: #fff;
-        color: #1976d2;
-        border: 1.5px solid #1976d2;
-        border-radius: 8px;
-        padding: 0.6em 1.5em;
-        font-size: 1.08rem;
-        font-weight: 600;
-        box-shadow: 0 2px 8px rgba(25, 118, 210, 0.07);
-        transition: background 0.18s, box-shadow 0.18s, color 0.18s, border-color 0.18s;
-        outline: none;
-        cursor: pointer;
-    }
-    button.stButton > button:hover, div.stButton > button:hover {
-        background: #e3f0fc !important; /* hover: azzurrino chiaro */
-        color: #1251a3 !important;
-        border-color: #1251a3 !important;
-        box-shadow: 0 4px 16px rgba(25, 118, 210, 0.13) !important;
-    }
-    button.stButton > button:active, div.stButton > button:active {
-        background: #c7e0fa !important; /* active: azzurro più intenso */
-        color: #0d3c75 !important;
-        border-color: #1251a3 !important;
-        box-shadow: 0 2px 8px rgba(25, 118, 210, 0.18) !important;
-    }
-    button.stButton > button:focus, div.stButton > button:focus {
-        outline: none !important;
-        background: #fff !important;
-        color: #1251a3 !important;
-        border-color: #1251a3 !important;
-        box-shadow: 0 0 0 2px #e3f0fc !important; /* leggero glow azzurrino, NO doppio bordo */
-    }
-    /* UNIVERSAL OVERRIDE: forza testo e bordo blu in ogni stato e classe */
-    button.stButton > button, div.stButton > button,
-    button.stButton > button:active, div.stButton > button:active,
-    button.stButton > button:focus, div.stButton > button:focus,
-    button.stButton > button[style], div.stButton > button[style],
-    button.stButton > button[class], div.stButton > button[class] {
-        color: #1251a3 !important;
-        border-color: #1251a3 !important;
-        box-shadow: 0 2px 8px rgba(25, 118, 210, 0.13) !important;
-        text-shadow: none !important;
-    }
-    /* Disabilita ogni bordo rosso interno/esterno */
-    button.stButton > button:after, button.stButton > button:before,
-    div.stButton > button:after, div.stButton > button:before {
-        border-color: #1251a3 !important;
-        box-shadow: none !important;
-    }
-    </style>
-    ''', unsafe_allow_html=True)
+    st.markdown(BUTTONS_CSS, unsafe_allow_html=True)
     st.title("Creazione Articolo SEO 100/100 con Rank Math")
 
     # Sidebar inputs
     st.sidebar.header("Inserisci Parola Chiave Principale")
     
     # Aggiungiamo le etichette fisse che non scompariranno MAI
-    st.sidebar.markdown("""
-    <style>
-    /* STILE ETICHETTE SIDEBAR SEMPRE COERENTE */
-    .fixed-label {
-        display: block;
-        font-size: 14px;
-        font-weight: 600;
-        color: rgb(49, 51, 63);
-        margin: 0 0 0.25rem 0 !important; /* IMPORTANTE: margine fisso */
-        padding: 0 !important;
-        height: auto !important;
-        line-height: 1.4 !important;
-    }
-    
-    /* Uniforma lo spazio tra etichetta e campo in OGNI STATO */
-    div[data-testid="stSidebar"] div[data-testid="stTextInput"],
-    div[data-testid="stSidebar"] div[data-testid="stTextArea"] {
-        margin-top: 0 !important;
-        padding-top: 0 !important;
-        position: relative !important; /* Importante per il posizionamento assoluto */
-    }
-    
-    /* IMPORTANTE: rimuovi completamente qualsiasi label nativa di Streamlit nella sidebar */
-    div[data-testid="stSidebar"] div[data-testid="stTextInput"] label,
-    div[data-testid="stSidebar"] div[data-testid="stTextArea"] label {
-        display: none !important;
-        height: 0 !important;
-        max-height: 0 !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        position: absolute !important;
-        opacity: 0 !important;
-        pointer-events: none !important;
-        visibility: hidden !important;
-    }
-    
-    /* Garantisci che lo spazio tra elementi della sidebar sia sempre lo stesso */
-    div[data-testid="stSidebar"] div[data-testid="stVerticalBlock"] > div {
-        margin-bottom: 1rem !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.sidebar.markdown(SIDEBAR_LABELS_CSS, unsafe_allow_html=True)
     
     # PRIMA DELL'INPUT mostriamo l'etichetta fissa
     st.sidebar.markdown("<div class='fixed-label'>Keyword principale</div>", unsafe_allow_html=True)
@@ -765,27 +1681,12 @@ def main():
     st.sidebar.markdown("<div class='fixed-label'>Titolo SEO</div>", unsafe_allow_html=True)
     title = st.sidebar.text_input(
         "",  # Etichetta vuota
-        key='Titolo SEO',
-        on_change=update
+        key='Titolo SEO'
     )
     title_len = len(st.session_state.get('Titolo SEO',''))
     max_title = 60
-    segments = ['#e63946','#fb8c00','#ffeb3b','#cddc39','#38b000']
-
-    # Se supera il massimo, tutte rosse
-    if title_len > max_title:
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for _ in segments:
-            bar += "<div style='flex:1; height:6px; background:#e63946; opacity:1;'></div>"
-        bar += "</div>"
-    else:
-        idx = min(title_len * 5 // (max_title + 1), 4)
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for i, col in enumerate(segments):
-            bar += f"<div style='flex:1; height:6px; background:{col}; opacity:{1 if i<=idx else 0.3};'></div>"
-        bar += "</div>"
 
-    st.sidebar.markdown(bar, unsafe_allow_html=True)
+    st.sidebar.markdown(length_bar(title_len, max_title), unsafe_allow_html=True)
     st.sidebar.markdown(f"<span style='font-size:12px; color:#666;'>{title_len}/{max_title}</span>", unsafe_allow_html=True)
 
     # URL Slug + indicatori
@@ -801,7 +1702,6 @@ def main():
     slug = st.sidebar.text_input(
         "",  # Etichetta vuota
         key='URL Slug (senza dominio)',
-        on_change=update,
         placeholder="come-installare-windows-11"
     )
 
@@ -817,21 +1717,9 @@ def main():
 
     # Calcola la lunghezza totale
     slug_len = base_len + len(slug) + end_len
-    max_slug = 75
-    segments = ['#e63946','#fb8c00','#ffeb3b','#cddc39','#38b000']
-
-    if slug_len > max_slug:
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for _ in segments:
-            bar += "<div style='flex:1; height:6px; background:#e63946; opacity:1;'></div>"
-        bar += "</div>"
-    else:
-        idx = min(slug_len * 5 // (max_slug + 1), 4)
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for i, col in enumerate(segments):
-            bar += f"<div style='flex:1; height:6px; background:{col}; opacity:{1 if i<=idx else 0.3};'></div>"
-        bar += "</div>"
-    st.sidebar.markdown(bar, unsafe_allow_html=True)
+    max_slug = rule_pack()["url_max_length"]
+
+    st.sidebar.markdown(length_bar(slug_len, max_slug), unsafe_allow_html=True)
     st.sidebar.markdown(f"<span style='font-size:12px; color:#666;'>{slug_len}/{max_slug}</span>", unsafe_allow_html=True)
 
     # Meta Description + indicatori
@@ -839,44 +1727,76 @@ def main():
     meta_desc = st.sidebar.text_area(
         "",  # Etichetta vuota
         key='Meta Description (max 160 caratteri)',
-        height=100,
-        on_change=update
+        height=100
     )
     meta_len = len(st.session_state.get('Meta Description (max 160 caratteri)',''))
     max_meta = 160
-    if meta_len > max_meta:
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for _ in segments:
-            bar += "<div style='flex:1; height:6px; background:#e63946; opacity:1;'></div>"
-        bar += "</div>"
-    else:
-        idx = min(meta_len * 5 // (max_meta + 1), 4)
-        bar = "<div style='display:flex; margin-top:4px;'>"
-        for i, col in enumerate(segments):
-            bar += f"<div style='flex:1; height:6px; background:{col}; opacity:{1 if i<=idx else 0.3};'></div>"
-        bar += "</div>"
-    st.sidebar.markdown(bar, unsafe_allow_html=True) # <-- CORREZIONE
+    st.sidebar.markdown(length_bar(meta_len, max_meta), unsafe_allow_html=True)
     st.sidebar.markdown(f"<span style='font-size:12px; color:#666;'>{meta_len}/{max_meta}</span>", unsafe_allow_html=True) # <-- CORREZIONE
 
-    # Il contenuto ora è gestito solo dall'editor, quindi lo recuperiamo dallo stato
-    content = assemble_blocks(st.session_state.get("content_blocks", []))
+    # Keyword secondarie (oltre alla principale, massimo 5 in totale)
+    st.sidebar.markdown("<div class='fixed-label'>Keyword secondarie</div>", unsafe_allow_html=True)
+    secondary_keywords = st.sidebar.text_input(
+        "",  # Etichetta vuota
+        key='Keyword secondarie',
+        placeholder=f"separate da virgola (max {MAX_KEYWORDS - 1})"
+    )
+    keywords = parse_keywords(keyword, secondary_keywords)
 
-    # Layout
+    # Il contenuto ora è gestito solo dall'editor, quindi lo recuperiamo dallo stato
+    blocks = editor_blocks()
+    sync_block_widgets(blocks)
+    content = assemble_blocks(blocks)
+    # Genera il codice HTML finale WordPress, un frammento per blocco
+    final_html = "\n".join(wp_article_parts(title, meta_desc, blocks))
+
+    # Layout. Anteprima e codice si aggiornano a ogni rerun completo (campi della
+    # sidebar, "Salva e Chiudi"), non mentre si scrive nei blocchi dell'editor
     col1, col2 = st.columns([2, 1])
 
     with col1:
         st.markdown("### Anteprima Articolo")
         st.markdown(generate_html(title, meta_desc, slug, content), unsafe_allow_html=True)
         st.markdown("---")
-        
-        # Scegli il contenuto giusto per le regole:
-    content_for_rules = assemble_blocks(st.session_state.get("content_blocks", []))
-    # Genera il codice HTML finale WordPress
-    final_html = generate_wp_article_block(title, meta_desc, content_for_rules)
+
+    with col2:
+        st.markdown("### Codice HTML da incollare su WordPress")
+        st.code(final_html, language='html')
+
+    # Bottone per aprire/chiudere l’Editor Contenuto
+    if not st.session_state.get("show_content_editor", False):
+        if st.sidebar.button("Apri Editor Contenuto"):
+            st.session_state.show_content_editor = True
+            st.session_state.scroll_to_editor_pending = True
+            st.rerun()
+    else:
+        if st.sidebar.button("Chiudi Editor Contenuto"):
+            # Salva il contenuto corrente come fa "Salva e Chiudi"
+            st.session_state["pending_content"] = st.session_state.raw_content_html
+            if "show_content_editor" in st.session_state:
+                del st.session_state.show_content_editor
+            st.session_state.scroll_to_top_pending = True
+            st.rerun()
+
+    # Regole, salvataggio ed editor si aggiornano insieme (vedi render_workspace)
+    render_workspace(title, meta_desc, slug, keyword, keywords)
+
+# Regole, salvataggio dell'articolo ed editor dei blocchi. È un fragment: scrivere
+# in un blocco o spostarlo riesegue solo questa parte (l'editor e il pannello
+# regole), non la sidebar, la lista bozze e l'anteprima in alto.
+# I campi della sidebar arrivano come argomenti dall'ultimo rerun completo.
+@st.fragment
+def render_workspace(title, meta_desc, slug, keyword, keywords):
+    # Prima delle regole: i blocchi prendono il testo appena scritto nei widget
+    blocks = editor_blocks()
+    sync_block_widgets(blocks)
+    # Genera il codice HTML finale WordPress, un frammento per blocco:
+    # le regole riusano le statistiche dei blocchi non modificati
+    article_parts = wp_article_parts(title, meta_desc, blocks)
+    final_html = "\n".join(article_parts)
 
     # Passa sempre final_html alle regole:
-    rules_results = check_all_rules(title, meta_desc, slug, final_html, keyword)
-    rules_html = get_rules_html(title, meta_desc, slug, final_html, keyword)
+    rules_results = check_all_rules(title, meta_desc, slug, final_html, keyword, parts=article_parts)
 
     total_rules = len(rules_results)
     respected = sum(1 for r in rules_results if r["ok"])
@@ -903,13 +1823,15 @@ def main():
 
     st.markdown("<div style='height:10px;'></div>", unsafe_allow_html=True)
 
-    # Passa final_html a get_rules_html!
-    rules_html = get_rules_html(title, meta_desc, slug, final_html, keyword)
+    # Passa final_html a get_rules_html! Il CSS è un elemento a parte, sempre uguale
+    st.markdown(rules_panel_css(), unsafe_allow_html=True)
+    rules_html = get_rules_html(title, meta_desc, slug, final_html, keyword, parts=article_parts, include_css=False)
     st.markdown(rules_html, unsafe_allow_html=True)
 
-    with col2:
-        st.markdown("### Codice HTML da incollare su WordPress")
-        st.code(final_html, language='html')
+    # Con keyword secondarie: presenza, posizione e densità di ciascuna
+    if len(keywords) > 1:
+        st.markdown("#### Keyword principale e secondarie")
+        st.markdown(get_keywords_html(title, meta_desc, slug, final_html, keywords, parts=article_parts), unsafe_allow_html=True)
 
     # --- MODAL LOGIC START ---
     def check_article_params():
@@ -931,7 +1853,7 @@ def main():
         base_len = len(base_url)
         end_len = len(end_slash)
         slug_len = base_len + len(url_slug) + end_len  # <-- CORREZIONE QUI
-        max_slug = 75
+        max_slug = rule_pack()["url_max_length"]
         if not url_slug:
             missing.append("URL Slug (mancante)")
         else:
@@ -955,7 +1877,7 @@ def main():
         return missing
 
     def check_all_rules_status():
-        results = check_all_rules(title, meta_desc, slug, final_html, keyword)
+        results = check_all_rules(title, meta_desc, slug, final_html, keyword, parts=article_parts)
         return [r for r in results if not r["ok"]]
 
     if "show_save_modal" not in st.session_state:
@@ -970,7 +1892,7 @@ def main():
     if st.session_state.get("show_save_modal", False) and 'show_save_modal_id' not in st.session_state:
         st.session_state['show_save_modal_id'] = str(uuid.uuid4())
 
-    if st.button("Crea articolo HTML", on_click=update):
+    if st.button("Crea articolo HTML"):
         st.session_state.save_error = ""
         st.session_state.last_save_path = ""
         st.session_state.force_save = False
@@ -1018,7 +1940,7 @@ def main():
                 st.session_state.last_save_path = ""
                 if "force_save_checkbox" in st.session_state:
                     del st.session_state["force_save_checkbox"]
-                st.rerun()
+                rerun_fragment()
         # Pulsante Annulla per chiudere la modale
         elif not st.session_state.last_save_path:
             if st.button("Annulla", key="cancel_save_modal"):
@@ -1027,24 +1949,9 @@ def main():
                 st.session_state.last_save_path = ""
                 if "force_save_checkbox" in st.session_state:
                     del st.session_state["force_save_checkbox"]
-                st.rerun()
+                rerun_fragment()
     # --- MODAL LOGIC END ---
 
-    # Bottone per aprire/chiudere l’Editor Contenuto
-    if not st.session_state.get("show_content_editor", False):
-        if st.sidebar.button("Apri Editor Contenuto"):
-            st.session_state.show_content_editor = True
-            st.session_state.scroll_to_editor_pending = True
-            st.rerun()
-    else:
-        if st.sidebar.button("Chiudi Editor Contenuto"):
-            # Salva il contenuto corrente come fa "Salva e Chiudi"
-            st.session_state["pending_content"] = st.session_state.raw_content_html
-            if "show_content_editor" in st.session_state:
-                del st.session_state.show_content_editor
-            st.session_state.scroll_to_top_pending = True
-            st.rerun()
-
     # Se devo mostrare l’editor…
     if st.session_state.get("show_content_editor", False):
         # 1) metto un anchor HTML
@@ -1079,158 +1986,75 @@ def main():
             with cols[0]:
                 st.subheader("Blocchi contenuto")
                 # NON aggiungere più un paragrafo di default quando si apre l'editor
-                if "content_blocks" not in st.session_state:
-                    st.session_state.content_blocks = []
                 if "raw_content_html" not in st.session_state:
                     st.session_state.raw_content_html = ""
 
-                blocks = st.session_state.content_blocks
+                blocks = editor_blocks()
 
                 # Pulsante per eliminare tutti i blocchi (sopra i pulsanti aggiungi blocco)
                 if st.button("🗑️ Elimina tutti i blocchi", key="delete_all_blocks", use_container_width=True):
                     st.session_state.content_blocks = []
-                    st.rerun()
+                    rerun_fragment()
 
                 # Pulsanti aggiungi blocco
-                st.markdown("""
-                <style>
-                .add-block-btn {
-                    display: inline-flex;
-                    align-items: center;
-                    gap: 7px;
-                    background: #f7f7fa;
-                    color: #1976d2;
-                    border: 1.5px solid #1976d2;
-                    border-radius: 7px;
-                    padding: 0.38em 1.1em;
-                    font-size: 1.07rem;
-                    font-weight: 600;
-                    margin-right: 10px;
-                    margin-bottom: 8px;
-                    cursor: pointer;
-                    transition: background 0.18s, color 0.18s, border-color 0.18s;
-                    box-shadow: 0 1px 4px rgba(25,118,210,0.04);
-                }
-                .add-block-btn:hover {
-                    background: #e3f0fc;
-                    color: #1251a3;
-                    border-color: #1251a3;
-                }
-                .add-block-btn svg {
-                    width: 1.2em;
-                    height: 1.2em;
-                    vertical-align: middle;
-                }
-                </style>
-                """, unsafe_allow_html=True)
+                st.markdown(ADD_BLOCK_CSS, unsafe_allow_html=True)
 
                 col_btn1, col_btn2, col_btn3 = st.columns([1,1,1], gap="small")
                 with col_btn1:
                     if st.button("📝 Paragrafo", key="add_paragraph", help="Aggiungi un paragrafo", use_container_width=True):
-                        blocks.append({"type": "Paragrafo", "content": ""})
+                        blocks.append(Block("Paragrafo"))
                         st.session_state.content_blocks = blocks
-                        st.rerun()
+                        show_editor_block(len(blocks) - 1)
+                        rerun_fragment()
                 with col_btn2:
                     if st.button("🔠 Titolo H2", key="add_h2", help="Aggiungi un titolo H2", use_container_width=True):
-                        blocks.append({"type": "Titolo H2", "content": ""})
+                        blocks.append(Block("Titolo H2"))
                         st.session_state.content_blocks = blocks
-                        st.rerun()
+                        show_editor_block(len(blocks) - 1)
+                        rerun_fragment()
                 with col_btn3:
                     if st.button("🖼️ Immagine", key="add_image", help="Aggiungi un'immagine", use_container_width=True):
-                        blocks.append({"type": "Immagine", "url": "", "alt": ""})
+                        blocks.append(Block("Immagine"))
                         st.session_state.content_blocks = blocks
-                        st.rerun()
-
-                st.markdown("""
-                <style>
-                /* AGGIUNGI questa regola all'inizio dell'editor CSS per forzare le etichette della sidebar */
-                div[data-testid="stSidebar"] .fixed-label {
-                    display: block !important;
-                    visibility: visible !important;
-                    opacity: 1 !important;
-                    padding-bottom: 0 !important;
-                    padding-top: 2px;
-                    border-radius: 6px;
-                    background: #f7f7fa;
-                    box-shadow: 0 1px 4px rgba(25,118,210,0.04);
-                }
-                /* togli gap tra label e widget successivo */
-                .compact-block-row + div {
-                    margin-top: 0 !important;
-                    padding-top: 0 !important;
-                }
-                /* rimuovi eventuali margini delle etichette vuote */
-                div[data-testid="stTextInput"] label,
-                div[data-testid="stTextArea"] label {
-                    display: none !important;
-                    margin: 0 !important;
-                    padding: 0 !important;
-                }
-                /* forza il widget senza margine superiore */
-                div[data-testid="stTextInput"],
-                div[data-testid="stTextArea"] {
-                    margin-top: 0 !important;
-                    padding-top: 0 !important;
-                }
-
-                div[data-testid="stExpanderContent"] button[kind="secondary"]:hover {
-                    background: #eeeeee !important;
-                    color: #555555 !important;
-                    border-color: #aaaaaa !important;
-                }
-                </style>
-                """, unsafe_allow_html=True)
+                        show_editor_block(len(blocks) - 1)
+                        rerun_fragment()
+
+                st.markdown(EDITOR_OVERRIDES_CSS, unsafe_allow_html=True)
+                # Stili dei pulsanti e dei tooltip dei blocchi: una volta sola, non per blocco
+                st.markdown(EDITOR_BUTTONS_CSS, unsafe_allow_html=True)
+                st.markdown(IMAGE_TOOLTIP_CSS, unsafe_allow_html=True)
+
+                # Con molti blocchi solo una pagina ha i widget, il resto si raggiunge
+                # con le frecce, "Vai al blocco" o l'indice
+                start, end = render_editor_navigation(blocks)
 
                 # Blocchi compatti con frecce a sinistra
-                for i, blk in enumerate(blocks):
+                for i in range(start, end):
+                    blk = blocks[i]
                     col_arrow, col_content = st.columns([0.18, 0.82])
                     with col_arrow:
-                        st.markdown("""
-                        <style>
-                        .editor-btn {
-                            width: 38px;
-                            height: 38px;
-                            display: flex;
-                            align-items: center;
-                            justify-content: center;
-                            font-size: 1.25em;
-                            background: #f7f7fa;
-                            color: #1976d2;
-                            border: 1.5px solid #1976d2;
-                            border-radius: 7px;
-                            cursor: pointer;
-                            transition: background 0.18s, color 0.18s, border-color 0.18s;
-                            font-weight: bold;
-                            padding: 0;
-                            margin-bottom: 6px;
-                        }
-                        .editor-btn:hover, .editor-btn:active, .editor-btn:focus {
-                            background: #e3f0fc !important;
-                            color: #1251a3 !important;
-                            border-color: #1251a3 !important;
-                        }
-                        </style>
-                        """, unsafe_allow_html=True)
                         btns = st.columns(1, gap="small")
                         with btns[0]:
-                            arrow_up = st.button("↑", key=f"up_{i}", help="Sposta su", use_container_width=True)
-                            arrow_down = st.button("↓", key=f"down_{i}", help="Sposta giù", use_container_width=True)
-                            delete = st.button("✖", key=f"del_{i}", help="Elimina blocco", use_container_width=True)
+                            arrow_up = st.button("↑", key=f"up_{blk.id}", help="Sposta su", use_container_width=True)
+                            arrow_down = st.button("↓", key=f"down_{blk.id}", help="Sposta giù", use_container_width=True)
+                            delete = st.button("✖", key=f"del_{blk.id}", help="Elimina blocco", use_container_width=True)
 
-                        # Gestione spostamento
+                        # Gestione spostamento: i widget seguono l'id del blocco, non la posizione
                         if arrow_up and i > 0:
                             blocks[i-1], blocks[i] = blocks[i], blocks[i-1]
                             st.session_state.content_blocks = blocks
-                            st.rerun()
+                            show_editor_block(i - 1)
+                            rerun_fragment()
                         if arrow_down and i < len(blocks)-1:
                             blocks[i], blocks[i+1] = blocks[i+1], blocks[i]
                             st.session_state.content_blocks = blocks
-                            st.rerun()
+                            show_editor_block(i + 1)
+                            rerun_fragment()
                         # Gestione eliminazione
                         if delete:
                             blocks.pop(i)
                             st.session_state.content_blocks = blocks
-                            st.rerun()
+                            rerun_fragment()
 
                     with col_content:
                         # Elemento compatto: titolo + box input tutto attaccato
@@ -1240,164 +2064,50 @@ def main():
                             unsafe_allow_html=True
                         )
                         if blk["type"] == "Paragrafo":
-                            pending_key = f"pending_txt_{i}"
-                            if pending_key in st.session_state:
-                                st.session_state[f"txt_{i}"] = st.session_state[pending_key]
-                                blk["content"] = st.session_state[pending_key]
-                                del st.session_state[pending_key]
-                            else:
-                                blk["content"] = st.session_state.get(f"txt_{i}", blk["content"])
-
-                            # Ora crea il widget UNA SOLA VOLTA
-                            blk["content"] = st.text_area("", blk["content"], key=f"txt_{i}", height=40)
+                            # Valore già allineato da sync_block_widgets
+                            blk["content"] = st.text_area("", blk["content"], key=f"txt_{blk.id}", height=40)
                             # Pulsanti in linea, tutti uguali
-                            st.markdown("""
-                            <style>
-                            .editor-btn-row {
-                                display: flex;
-                                gap: 8px;
-                                margin-bottom: 8px;
-                            }
-                            .editor-btn {
-                                width: 38px;
-                                height: 38px;
-                                display: flex;
-                                align-items: center;
-                                justify-content: center;
-                                font-size: 1.25em;
-                                background: #f7f7fa;
-                                color: #1976d2;
-                                border: 1.5px solid #1976d2;
-                                border-radius: 7px;
-                                cursor: pointer;
-                                transition: background 0.18s, color 0.18s, border-color 0.18s;
-                                font-weight: bold;
-                                padding: 0;
-                            }
-                            .editor-btn:hover, .editor-btn:active, .editor-btn:focus {
-                                background: #e3f0fc !important;
-                                color: #1251a3 !important;
-                                border-color: #1251a3 !important;
-                            }
-                            </style>
-                            """, unsafe_allow_html=True)
                             btn_cols = st.columns(6, gap="small")
                             with btn_cols[0]:
-                                st.button("💻", key=f"code_{i}", help="Inserisci <code>", on_click=insert_tag_in_text, args=("<code>", "</code>", f"txt_{i}"), use_container_width=True)
+                                st.button("💻", key=f"code_{blk.id}", help="Inserisci <code>", on_click=insert_tag_in_text, args=("<code>", "</code>", f"txt_{blk.id}"), use_container_width=True)
                             with btn_cols[1]:
-                                st.button("𝐁", key=f"strong_{i}", help="Inserisci <strong>", on_click=insert_tag_in_text, args=("<strong>", "</strong>", f"txt_{i}"), use_container_width=True)
+                                st.button("𝐁", key=f"strong_{blk.id}", help="Inserisci <strong>", on_click=insert_tag_in_text, args=("<strong>", "</strong>", f"txt_{blk.id}"), use_container_width=True)
                             with btn_cols[2]:
-                                st.button("🗒️", key=f"ul_{i}", help="Inserisci elenco puntato", on_click=insert_tag_in_text, args=("<ul><li>", "</li></ul>", f"txt_{i}"), use_container_width=True)
+                                st.button("🗒️", key=f"ul_{blk.id}", help="Inserisci elenco puntato", on_click=insert_tag_in_text, args=("<ul><li>", "</li></ul>", f"txt_{blk.id}"), use_container_width=True)
                             with btn_cols[3]:
-                                st.button("🔗", key=f"dofollow_{i}", help="Inserisci link DoFollow", on_click=insert_dofollow_link, args=(f"txt_{i}",), use_container_width=True)
+                                st.button("🔗", key=f"dofollow_{blk.id}", help="Inserisci link DoFollow", on_click=insert_dofollow_link, args=(f"txt_{blk.id}",), use_container_width=True)
                             with btn_cols[4]:
-                                st.button("🚫", key=f"nofollow_{i}", help="Inserisci link NoFollow", on_click=insert_nofollow_link, args=(f"txt_{i}",), use_container_width=True)
+                                st.button("🚫", key=f"nofollow_{blk.id}", help="Inserisci link NoFollow", on_click=insert_nofollow_link, args=(f"txt_{blk.id}",), use_container_width=True)
                             with btn_cols[5]:
-                                st.button("🏠", key=f"internal_{i}", help="Inserisci link interno", on_click=insert_internal_link, args=(f"txt_{i}",), use_container_width=True)
+                                st.button("🏠", key=f"internal_{blk.id}", help="Inserisci link interno", on_click=insert_internal_link, args=(f"txt_{blk.id}",), use_container_width=True)
 
                         elif blk["type"] == "Titolo H2":
-                            pending_key = f"pending_h2_{i}"
-                            if pending_key in st.session_state:
-                                blk["content"] = st.session_state[pending_key]
-                                st.session_state[f"h2_{i}"] = st.session_state[pending_key]
-                                del st.session_state[pending_key]
-                            else:
-                                blk["content"] = st.session_state.get(f"h2_{i}", blk["content"])
-
-                            blk["content"] = st.text_input("", blk["content"], key=f"h2_{i}")
+                            blk["content"] = st.text_input("", blk["content"], key=f"h2_{blk.id}")
                             # Pulsanti in linea, tutti uguali
-                            st.markdown("""
-                            <style>
-                            .editor-btn-row {
-                                display: flex;
-                                gap: 8px;
-                                margin-bottom: 8px;
-                            }
-                            .editor-btn {
-                                width: 38px;
-                                height: 38px;
-                                display: flex;
-                                align-items: center;
-                                justify-content: center;
-                                font-size: 1.25em;
-                                background: #f7f7fa;
-                                color: #1976d2;
-                                border: 1.5px solid #1976d2;
-                                border-radius: 7px;
-                                cursor: pointer;
-                                transition: background 0.18s, color 0.18s, border-color 0.18s;
-                                font-weight: bold;
-                                padding: 0;
-                            }
-                            .editor-btn:hover, .editor-btn:active, .editor-btn:focus {
-                                background: #e3f0fc !important;
-                                color: #1251a3 !important;
-                                border-color: #1251a3 !important;
-                            }
-                            </style>
-                            """, unsafe_allow_html=True)
                             btn_cols = st.columns(6, gap="small")
                             with btn_cols[0]:
-                                st.button("💻", key=f"code_h2_{i}", help="Inserisci <code>", on_click=insert_tag_in_text, args=("<code>", "</code>", f"h2_{i}"), use_container_width=True)
+                                st.button("💻", key=f"code_h2_{blk.id}", help="Inserisci <code>", on_click=insert_tag_in_text, args=("<code>", "</code>", f"h2_{blk.id}"), use_container_width=True)
                             with btn_cols[1]:
-                                st.button("𝐁", key=f"strong_h2_{i}", help="Inserisci <strong>", on_click=insert_tag_in_text, args=("<strong>", "</strong>", f"h2_{i}"), use_container_width=True)
+                                st.button("𝐁", key=f"strong_h2_{blk.id}", help="Inserisci <strong>", on_click=insert_tag_in_text, args=("<strong>", "</strong>", f"h2_{blk.id}"), use_container_width=True)
                             with btn_cols[2]:
-                                st.button("🗒️", key=f"ul_h2_{i}", help="Inserisci elenco puntato", on_click=insert_tag_in_text, args=("<ul><li>", "</li></ul>", f"h2_{i}"), use_container_width=True)
+                                st.button("🗒️", key=f"ul_h2_{blk.id}", help="Inserisci elenco puntato", on_click=insert_tag_in_text, args=("<ul><li>", "</li></ul>", f"h2_{blk.id}"), use_container_width=True)
                             with btn_cols[3]:
-                                st.button("🔗", key=f"dofollow_h2_{i}", help="Inserisci link DoFollow", on_click=insert_dofollow_link, args=(f"h2_{i}",), use_container_width=True)
+                                st.button("🔗", key=f"dofollow_h2_{blk.id}", help="Inserisci link DoFollow", on_click=insert_dofollow_link, args=(f"h2_{blk.id}",), use_container_width=True)
                             with btn_cols[4]:
-                                st.button("🚫", key=f"nofollow_h2_{i}", help="Inserisci link NoFollow", on_click=insert_nofollow_link, args=(f"h2_{i}",), use_container_width=True)
+                                st.button("🚫", key=f"nofollow_h2_{blk.id}", help="Inserisci link NoFollow", on_click=insert_nofollow_link, args=(f"h2_{blk.id}",), use_container_width=True)
                             with btn_cols[5]:
-                                st.button("🏠", key=f"internal_h2_{i}", help="Inserisci link interno", on_click=insert_internal_link, args=(f"h2_{i}",), use_container_width=True)
-                        else:  # Immagine
-                            st.markdown("""
-                            <style>
-                            .img-info-wrap {
-                                display: inline-flex;
-                                align-items: center;
-                                margin-left: 6px;
-                                position: relative;
-                            }
-                            .img-info-icon {
-                                display: inline-block;
-                                width: 18px;
-                                height: 18px;
-                                line-height: 18px;
-                                text-align: center;
-                                border-radius: 50%;
-                                background: #e0e0e0;
-                                font-size: 0.95em;
-                                cursor: help;
-                                margin-left: 2px;
-                                color: #1976d2;
-                                font-weight: bold;
-                            }
-                            .img-info-wrap .img-tooltip {
-                                visibility: hidden;
-                                opacity: 0;
-                                width: 220px;
-                                background-color: #333;
-                                color: #fff;
-                                text-align: left;
-                                padding: 8px;
-                                border-radius: 4px;
-                                position: absolute;
-                                z-index: 1;
-                                bottom: 125%;
-                                left: 50%;
-                                transform: translateX(-50%);
-                                transition: opacity 0.2s;
-                                font-size: 0.98em;
-                            }
-                            .img-info-wrap:hover .img-tooltip {
-                                visibility: visible;
-                                opacity: 1;
-                            }
-                            </style>
-                            """, unsafe_allow_html=True)
-                            url = st.text_input("", blk.get("url", ""), key=f"img_url_{i}", placeholder="https://...")
-                            alt = st.text_input("", blk.get("alt", ""), key=f"img_alt_{i}", placeholder="Alt text")
+                                st.button("🏠", key=f"internal_h2_{blk.id}", help="Inserisci link interno", on_click=insert_internal_link, args=(f"h2_{blk.id}",), use_container_width=True)
+                        elif blk["type"] == "Immagine":
+                            url = st.text_input("", blk.get("url", ""), key=f"img_url_{blk.id}", placeholder="https://...")
+                            alt = st.text_input("", blk.get("alt", ""), key=f"img_alt_{blk.id}", placeholder="Alt text")
                             blk["url"], blk["alt"] = url, alt
+                        # Tipi che arrivano dall'import HTML
+                        elif blk["type"] == "Titolo H3":
+                            blk["content"] = st.text_input("", blk["content"], key=f"h3_{blk.id}")
+                        elif blk["type"] == "Elenco":
+                            blk["content"] = st.text_area("", blk["content"], key=f"list_{blk.id}", height=80)
+                        elif blk["type"] == "Video":
+                            blk["url"] = st.text_input("", blk.get("url", ""), key=f"video_url_{blk.id}", placeholder="https://www.youtube.com/embed/...")
                 st.session_state.content_blocks = blocks
 
                 # Aggiorna l'HTML solo se non è stato modificato manualmente
@@ -1437,11 +2147,13 @@ def main():
                 if st.button("Importa blocchi da HTML", key="import_blocks_btn"):
                     imported_blocks = import_blocks_from_html(import_html, st.session_state.content_blocks)
                     if imported_blocks:
+                        first_new = len(st.session_state.content_blocks)
                         for b in imported_blocks:
-                            st.session_state.content_blocks.append(b)
+                            st.session_state.content_blocks.append(Block.from_dict(b))
+                        show_editor_block(first_new)
                         st.session_state["import_html_box_reset"] = True  # segnala reset per il prossimo rerun
                         st.success(f"{len(imported_blocks)} nuovi blocchi importati!")
-                        st.rerun()
+                        rerun_fragment()
                     else:
                         st.warning("Nessun nuovo blocco trovato nell'HTML!")
 
@@ -1452,7 +2164,9 @@ def main():
                 st.session_state.scroll_to_top_pending = True
                 st.rerun()
 
-    # Continua con il resto del tuo main (preview articolo, regole, modal save article, ecc.)…
+    # Anche i rerun del solo fragment aggiornano la bozza salvata in automatico
+    autosave_draft()
+
 def insert_tag_in_text(tag_open, tag_close, key):
     text = st.session_state.get(key, "")
     new_text = text + tag_open + tag_close
@@ -1487,184 +2201,160 @@ def insert_selected_link(key, link_type):
     st.session_state[f"pending_{key}"] = new_text
 
 def count_words_no_html(text):
-    # Rimuovi tutti i tag HTML
-    text = re.sub(r'<[^>]+>', '', text)
-    # Rimuovi spazi multipli
-    text = re.sub(r'\s+', ' ', text).strip()
-    return len(re.findall(r"\w+", text))
-
-def import_blocks_from_html(html, existing_blocks):
-    # Trova tutti i blocchi <h2>, <p>, <img ...>
-    pattern = r'(<h2[^>]*>.*?</h2>)|(<p[^>]*>.*?</p>)|(<img [^>]+>)'
-    matches = re.findall(pattern, html, re.DOTALL | re.IGNORECASE)
-    new_blocks = []
-    for h2, p, img in matches:
-        if h2:
-            content = re.sub(r'<\/?h2[^>]*>', '', h2).strip()
-            # Evita duplicati: cerca Titolo H2 con stesso contenuto
-            if not any(b["type"] == "Titolo H2" and b.get("content", "").strip() == content for b in existing_blocks):
-                new_blocks.append({"type": "Titolo H2", "content": content, "imported": True})
-        elif p:
-            content = re.sub(r'<\/?p[^>]*>', '', p).strip()
-    new_blocks = []
-    for h2, p, img in matches:
-        if h2:
-            content = re.sub(r'<\/?h2[^>]*>', '', h2).strip()
-            # Evita duplicati: cerca Titolo H2 con stesso contenuto
-            if not any(b["type"] == "Titolo H2" and b.get("content", "").strip() == content for b in existing_blocks):
-                new_blocks.append({"type": "Titolo H2", "content": content, "imported": True})
-        elif p:
-            content = re.sub(r'<\/?p[^>]*>', '', p).strip()
-            # Evita duplicati: cerca Paragrafo con stesso contenuto
-
-            if not any(b["type"] == "Paragrafo" and b.get("content", "").strip() == content for b in existing_blocks):
-                new_blocks.append({"type": "Paragrafo", "content": content, "imported": True})
-        elif img:
-            url_match = re.search(r'src=["\']([^"\']+)["\']', img)
-            alt_match = re.search(r'alt=["\']([^"\']*)["\']', img)
-            url = url_match.group(1) if url_match else ""
-            alt = alt_match.group(1) if alt_match else ""
-            # Evita duplicati: cerca Immagine con stesso url e alt
-            if not any(b["type"] == "Immagine" and b.get("url", "") == url and b.get("alt", "") == alt for b in existing_blocks):
-                new_blocks.append({"type": "Immagine", "url": url, "alt": alt, "imported": True})
-    return new_blocks
-
-def save_draft(filename="bozza_articolo.json"):
+    # Parole del testo senza tag HTML
+    return len(ArticleAnalysis(content=text).words)
+
+# Client JSONBin condiviso da tutte le sessioni (connessioni riusate, timeout,
+# retry e circuit breaker: vedi jsonbin_client.py). TI_AIUTO_JSONBIN_URL permette
+# di usare un server locale al posto di api.jsonbin.io.
+JSONBIN_MASTER_KEY = os.environ.get("JSONBIN_MASTER_KEY", "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi")
+JSONBIN_URL = os.environ.get("TI_AIUTO_JSONBIN_URL", "https://api.jsonbin.io/v3")
+# Bin con la lista delle bozze ([{"id", "name"}, ...])
+DRAFT_LIST_BIN_ID = "689dbe6943b1c97be91e1d2b"
+
+def jsonbin_client():
+    return shared("jsonbin_client", lambda: JsonBinClient(JSONBIN_MASTER_KEY, base_url=JSONBIN_URL, timer=profiled))
+
+# Archivio delle bozze (vedi archivio_bozze.py): JSONBin.io di default, oppure
+# un database SQLite locale con TI_AIUTO_BOZZE=sqlite (funziona anche offline).
+DRAFT_BACKEND = os.environ.get("TI_AIUTO_BOZZE", "jsonbin")
+DRAFT_DB_PATH = os.environ.get("TI_AIUTO_BOZZE_DB", os.path.join(os.getcwd(), "output", "bozze.sqlite3"))
+
+def draft_storage():
+    def create():
+        if DRAFT_BACKEND == "sqlite":
+            return SqliteStorage(DRAFT_DB_PATH)
+        return JsonBinStorage(jsonbin_client(), DRAFT_LIST_BIN_ID)
+    return shared("draft_storage", create)
+
+# Lista bozze in cache: la sidebar la legge a ogni rerun, ma cambia solo quando
+# si salva o si elimina una bozza (che la invalidano) o da un'altra istanza
+# dell'app (scade dopo DRAFT_LIST_TTL secondi, o con il pulsante "Aggiorna").
+DRAFT_LIST_TTL = 5 * 60  # secondi
+_draft_list_cache = shared("draft_list_cache", lambda: TTLCache(maxsize=1, ttl=DRAFT_LIST_TTL))
+_draft_list_lock = shared("draft_list_lock", threading.Lock)
+
+def invalidate_draft_list():
+    with _draft_list_lock:
+        _draft_list_cache.clear()
+
+# Salvataggio automatico (vedi DraftAutosaver): le modifiche finiscono subito nel
+# journal locale e vengono scritte sull'archivio in background. Ogni sessione
+# lavora su una sola bozza: cambiando nome la si rinomina, e per crearne
+# un'altra (o una copia) c'è "Salva come nuova".
+DRAFT_JOURNAL_PATH = os.environ.get("TI_AIUTO_BOZZE_JOURNAL", os.path.join(os.getcwd(), "output", "bozze_journal.jsonl"))
+
+def draft_autosaver():
+    return shared(
+        "draft_autosaver",
+        lambda: DraftAutosaver(draft_storage(), DRAFT_JOURNAL_PATH, on_saved=lambda key, draft_id: invalidate_draft_list(),
+                               timer=profiled)
+    )
+
+def current_draft():
     draft_name = st.session_state.get("draft_name", "").strip() or "bozza_articolo"
     draft = {
-        "content_blocks": st.session_state.get("content_blocks", []),
+        "content_blocks": [b.to_dict() if isinstance(b, Block) else b for b in st.session_state.get("content_blocks", [])],
         "Titolo SEO": st.session_state.get("Titolo SEO", ""),
         "Meta Description (max 160 caratteri)": st.session_state.get("Meta Description (max 160 caratteri)", ""),
         "URL Slug (senza dominio)": st.session_state.get("URL Slug (senza dominio)", ""),
         "Keyword principale": st.session_state.get("Keyword principale", ""),
+        "Keyword secondarie": st.session_state.get("Keyword secondarie", ""),
         "nome_bozza": draft_name
     }
-    url = "https://api.jsonbin.io/v3/b"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi",
-        "X-Bin-Name": draft_name
-    }
-    response = requests.post(url, headers=headers, json={
-        "record": draft
-    })
-    if response.ok:
-        bin_id = response.json()["metadata"]["id"]
-        st.session_state["last_draft_path"] = f"Bozza salvata su JSONBin.io con nome '{draft_name}' e ID: {bin_id}"
-        # Aggiorna la lista bozze remota
-        update_jsonbin_draft_list(bin_id, draft_name)
-    else:
-        st.session_state["last_draft_path"] = f"Errore salvataggio su JSONBin.io: {response.text}"
-
-def load_draft(filename="bozza_articolo.json"):
-    # Se filename è un ID JSONBin (solo cifre/lettere, tipico id bin), carica da JSONBin.io
-    if filename and (filename.startswith("bin") or len(filename) == 24):
-        url = f"https://api.jsonbin.io/v3/b/{filename}/latest"
-        headers = {
-            "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi",
-            # "X-Access-Key": "<ACCESS_KEY>",  # aggiungi se serve
-            "X-Bin-Meta": "false"
-        }
-        try:
-            response = requests.get(url, headers=headers)
-            if response.ok:
-                draft = response.json()["record"]
-                for k, v in draft.items():
-                    st.session_state[k] = v
-                st.sidebar.success(f"Bozza importata da JSONBin.io (ID: {filename})!")  # <-- MODIFICA QUI
-                st.rerun()
-            else:
-                st.sidebar.error(f"Errore nel caricamento da JSONBin.io: {response.text}")
-        except Exception as e:
-            st.sidebar.error(f"Errore nel caricamento da JSONBin.io: {e}")
-    else:
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                draft = json.load(f)
-            for k, v in draft.items():
-                st.session_state[k] = v
-            st.sidebar.success("Bozza caricata!")  # <-- MODIFICA QUI
-            st.rerun()
-        except Exception as e:
-            st.sidebar.error(f"Errore nel caricamento bozza: {e}")
-
-def get_jsonbin_drafts():
-    bin_id = "689dbe6943b1c97be91e1d2b"
-    url = f"https://api.jsonbin.io/v3/b/{bin_id}/latest"
-    headers = {
-        "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi",
-        "X-Bin-Meta": "false"
-    }
+    return draft_name, draft
+
+def autosave_key(new_session=False):
+    # Una bozza in lavorazione per sessione: cambiarle nome la rinomina, non ne crea un'altra
+    if new_session or "autosave_session" not in st.session_state:
+        st.session_state["autosave_session"] = uuid.uuid4().hex
+    return st.session_state["autosave_session"]
+
+@profiled_function("bozze save_draft (journal)")
+def save_draft(as_new=False):
+    # Non aspetta la rete: la bozza è già al sicuro nel journal locale.
+    # as_new salva una nuova bozza, che da qui in poi è quella della sessione.
+    draft_name, draft = current_draft()
+    draft_autosaver().submit(autosave_key(new_session=as_new), draft_name, draft, delay=0)
+    st.session_state["last_draft_path"] = f"Bozza '{draft_name}' salvata nel journal locale"
+    st.session_state["draft_message"] = ("success", f"Bozza '{draft_name}' salvata!")
+
+def autosave_draft():
+    # Chiamata a fine rerun: mette in coda la bozza solo se è cambiata
+    if not st.session_state.get("autosave_enabled", True):
+        return
+    draft_name, draft = current_draft()
+    if not (draft["Titolo SEO"] or draft["Keyword principale"] or draft["content_blocks"]):
+        return
+    key = autosave_key()
+    if not st.session_state.get("draft_name", "").strip():
+        # Senza nome si salva solo una bozza già salvata o caricata in questa sessione:
+        # una sessione anonima non crea bozze (tutte "bozza_articolo")
+        status = draft_autosaver().status(key)
+        if not (status["draft_id"] or status["pending"]):
+            return
+    draft_autosaver().submit(key, draft_name, draft)
+
+def render_autosave_status():
+    status = draft_autosaver().status(autosave_key())
+    if status["error"]:
+        st.caption(f"⚠️ Salvataggio non riuscito, nuovo tentativo a breve: {status['error']}")
+    elif status["pending"]:
+        st.caption("⏳ Modifiche in salvataggio…")
+    elif status["saved_at"]:
+        st.caption(f"✅ Salvata alle {status['saved_at'][11:]}")
+
+@profiled_function("bozze load_draft", lambda draft_id: f"bozza {draft_id}")
+def load_draft(draft_id):
+    # Da chiamare PRIMA di creare i widget: i valori della bozza diventano i loro valori
+    storage = draft_storage()
     try:
-        response = requests.get(url, headers=headers)
-        if response.ok:
-            bozze_remoti = response.json()["record"]
-            if isinstance(bozze_remoti, list):
-                return [(b["id"], b["name"]) for b in bozze_remoti if "id" in b and "name" in b]
-            else:
-                st.sidebar.error("Il bin delle bozze non è una lista. Correggi il contenuto su JSONBin.io.")
-                return []
-        else:
-            st.sidebar.error(f"Errore nel recupero bozze remote: {response.text}")
-            return []
-    except Exception as e:
-        st.sidebar.error(f"Errore nel recupero bozze remote: {e}")
-        return []
+        draft = storage.load(draft_id)
+    except DraftStorageError as e:
+        st.session_state["draft_message"] = ("error", f"Errore nel caricamento bozza ({storage.label}): {e}")
+        return False
+    for k, v in draft.items():
+        st.session_state[k] = v
+    draft_name = draft.get("nome_bozza") or "bozza_articolo"
+    st.session_state["draft_name"] = draft_name
+    # Da qui in poi il salvataggio automatico aggiorna la bozza caricata
+    _, loaded = current_draft()
+    draft_autosaver().bind(autosave_key(new_session=True), draft_id, loaded)
+    st.session_state["draft_message"] = ("success", f"Bozza '{draft_name}' caricata ({storage.label})!")
+    return True
 
-def update_jsonbin_draft_list(new_id, new_name):
-    bin_id = "689dbe6943b1c97be91e1d2b"
-    url = f"https://api.jsonbin.io/v3/b/{bin_id}"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi"
-    }
-    # Scarica la lista attuale
-    current = []
-    try:
-        r = requests.get(f"{url}/latest", headers={"X-Master-Key": headers["X-Master-Key"], "X-Bin-Meta": "false"})
-        if r.ok:
-            current = r.json()["record"]
-    except:
-        pass
-    # Aggiorna la lista se serve
-    if not any(b["id"] == new_id for b in current):
-        current.append({"id": new_id, "name": new_name})
-        requests.put(url, headers=headers, json={"record": current})
-
-def delete_jsonbin_draft(bin_id_to_delete):
-    # Elimina la bozza dal server JSONBin.io
-    url = f"https://api.jsonbin.io/v3/b/{bin_id_to_delete}"
-    headers = {
-        "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi"
-    }
+def get_drafts():
+    with _draft_list_lock:
+        drafts = _draft_list_cache.get("drafts")
+    if drafts is None:
+        drafts = fetch_drafts()
+        if drafts is not None:
+            with _draft_list_lock:
+                _draft_list_cache["drafts"] = drafts
+    return list(drafts or [])
+
+@profiled_function("bozze fetch_drafts")
+def fetch_drafts():
+    # None se la lista non è disponibile: gli errori non vanno in cache
     try:
-        response = requests.delete(url, headers=headers)
-        if response.ok:
-            st.sidebar.success("Bozza eliminata dal server!")
-        else:
-            st.sidebar.error(f"Errore nell'eliminazione bozza: {response.text}")
-    except Exception as e:
-        st.sidebar.error(f"Errore nell'eliminazione bozza: {e}")
-
-def remove_draft_from_list(bin_id_to_delete):
-    # Rimuove la bozza dalla lista remota
-    bin_id = "689dbe6943b1c97be91e1d2b"
-    url = f"https://api.jsonbin.io/v3/b/{bin_id}"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Master-Key": "$2a$10$CSwqB1KJyJtKegCq8iGctel1f7oCunIvlBghn3y1Fpzho3DkiLkqi"
-    }
-    # Scarica la lista attuale
-    current = []
+        return [tuple(d) for d in draft_storage().list()]
+    except DraftStorageError as e:
+        st.error(f"Errore nel recupero bozze: {e}")
+        return None
+
+@profiled_function("bozze delete_draft", lambda draft_id: f"bozza {draft_id}")
+def delete_draft(draft_id):
     try:
-        r = requests.get(f"{url}/latest", headers={"X-Master-Key": headers["X-Master-Key"], "X-Bin-Meta": "false"})
-        if r.ok:
-            current = r.json()["record"]
-    except:
-        pass
-    # Rimuovi la bozza dalla lista
-    new_list = [b for b in current if b.get("id") != bin_id_to_delete]
-    requests.put(url, headers=headers, json={"record": new_list})
+        draft_storage().delete(draft_id)
+        st.session_state["draft_message"] = ("success", "Bozza eliminata!")
+        _, draft = current_draft()
+        if draft_autosaver().status(autosave_key())["draft_id"] == draft_id:
+            # Il salvataggio automatico non deve ricreare la bozza appena eliminata
+            draft_autosaver().bind(autosave_key(new_session=True), None, draft)
+    except DraftStorageError as e:
+        st.session_state["draft_message"] = ("error", f"Errore nell'eliminazione bozza: {e}")
+    finally:
+        invalidate_draft_list()
 
 if __name__ == "__main__":
     main()
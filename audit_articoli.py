@@ -0,0 +1,301 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
+
+from article_generator import RULES, evaluate_article, wp_article_parts
+from formato_bozze import decode_draft
+from importa_html import import_blocks_from_html
+from wxr_wordpress import RANK_MATH_DESCRIPTION, focus_keywords, iter_wxr_posts, wpautop
+
+# Audit da riga di comando: applica le regole Rank Math a una cartella di
+# articoli HTML (come quelli scritti da create_html_file) e di bozze JSON.
+#
+#   python audit_articoli.py output/articoli bozze/ -o report.jsonl
+#   python audit_articoli.py output/articoli -o report.csv --keyword-map keyword.json
+#   python audit_articoli.py --jsonl export.jsonl -o report.jsonl
+#   cat export.jsonl | python audit_articoli.py --jsonl - > report.jsonl
+#   python audit_articoli.py --jsonl export.jsonl -o corpus.parquet  (vedi statistiche_corpus.py)
+#   python audit_articoli.py --wxr wordpress.xml -o report.csv  (export di WordPress, vedi wxr_wordpress.py)
+#
+# Gli input vengono letti, analizzati e scritti in streaming: in ogni momento
+# ci sono al massimo --max-in-flight articoli in memoria.
+
+ARTICLE_EXTENSIONS = (".html", ".htm")
+DRAFT_EXTENSIONS = (".json",)
+
+# Colonne numeriche del report (valori misurati da article_metrics)
+METRIC_FIELDS = ["word_count", "keyword_count", "density", "url_length", "max_paragraph_words"]
+
+
+def rule_key(rule):
+    # Nome breve e stabile della regola, usato come colonna del report
+    return rule["func"].__name__.removeprefix("rule_")
+
+
+RULE_KEYS = [rule_key(rule) for rule in RULES]
+
+
+def find_inputs(paths):
+    # Espande cartelle (ricorsivamente) in file HTML/JSON, in ordine stabile
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(ARTICLE_EXTENSIONS + DRAFT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def parse_article_html(html, fallback_slug=""):
+    # Estrae i campi da un file prodotto da generate_html (con fallback per HTML generici)
+    title = re.search(r'<title>(.*?)</title>', html, re.DOTALL | re.IGNORECASE)
+    meta = re.search(r'<meta\s+name=["\']description["\']\s+content=["\']([^"\']*)["\']', html, re.IGNORECASE)
+    keywords = re.search(r'<meta\s+name=["\']keywords["\']\s+content=["\']([^"\']*)["\']', html, re.IGNORECASE)
+    canonical = re.search(r'<link\s+rel=["\']canonical["\']\s+href=["\']https?://[^/"\']+/([^"\']*)["\']', html, re.IGNORECASE)
+    body = re.search(r'<body[^>]*>(.*)</body>', html, re.DOTALL | re.IGNORECASE)
+    return {
+        "title": title.group(1).strip() if title else "",
+        "meta_desc": meta.group(1) if meta else "",
+        "url_slug": canonical.group(1).strip("/") if canonical else fallback_slug,
+        "content": body.group(1) if body else html,
+        # Prima keyword del meta "keywords", se presente
+        "keyword": keywords.group(1).split(",")[0].strip() if keywords else "",
+    }
+
+
+def parse_draft(draft):
+    # Bozza salvata da save_draft (anche avvolta in {"record": ...} come su JSONBin),
+    # in qualunque versione del formato (vedi formato_bozze.py)
+    if "record" in draft and isinstance(draft["record"], dict):
+        draft = draft["record"]
+    draft = decode_draft(draft)
+    title = draft.get("Titolo SEO", "")
+    meta_desc = draft.get("Meta Description (max 160 caratteri)", "")
+    parts = wp_article_parts(title, meta_desc, draft.get("content_blocks", []))
+    return {
+        "title": title,
+        "meta_desc": meta_desc,
+        "url_slug": draft.get("URL Slug (senza dominio)", ""),
+        "content": "\n".join(parts),
+        "keyword": draft.get("Keyword principale", ""),
+        "parts": parts,
+    }
+
+
+def parse_record(record):
+    # Riga JSONL: {"title", "meta", "slug", "keyword", "content" oppure "blocks"}
+    # (accetta anche i nomi lunghi e il formato delle bozze salvate)
+    if "record" in record or "Titolo SEO" in record or "v" in record:
+        return parse_draft(record)
+    title = record.get("title", "")
+    meta_desc = record.get("meta_desc", record.get("meta", ""))
+    blocks = record.get("blocks", record.get("content_blocks"))
+    parts = None
+    if blocks is not None and "content" not in record:
+        parts = wp_article_parts(title, meta_desc, blocks)
+    return {
+        "title": title,
+        "meta_desc": meta_desc,
+        "url_slug": record.get("url_slug", record.get("slug", "")),
+        "content": "\n".join(parts) if parts is not None else record.get("content", ""),
+        "keyword": record.get("keyword", ""),
+        "parts": parts,
+    }
+
+
+def load_article(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(DRAFT_EXTENSIONS):
+            return parse_draft(json.load(f))
+        slug = os.path.splitext(os.path.basename(path))[0]
+        return parse_article_html(f.read(), fallback_slug=slug)
+
+
+def audit_article(article, source=""):
+    evaluation = evaluate_article(
+        article["title"], article["meta_desc"], article["url_slug"],
+        article["content"], article["keyword"], parts=article.get("parts"),
+    )
+    rules = {key: r["ok"] for key, r in zip(RULE_KEYS, evaluation["results"])}
+    return {
+        "source": source,
+        "title": article["title"],
+        "url_slug": article["url_slug"],
+        "keyword": article["keyword"],
+        "respected": sum(rules.values()),
+        "total": len(rules),
+        **evaluation["metrics"],
+        "rules": rules,
+    }
+
+
+def audit_file(path, keyword="", keyword_map=None):
+    # Eseguita nei processi del pool: un errore su un file non ferma il batch
+    try:
+        article = load_article(path)
+        # Priorità: mappa slug -> keyword, poi keyword del file, poi --keyword
+        article["keyword"] = (keyword_map or {}).get(article["url_slug"]) or article["keyword"] or keyword
+        return audit_article(article, source=path)
+    except Exception as e:
+        return {"source": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def audit_line(item, keyword="", keyword_map=None):
+    # item = (sorgente, riga JSONL): il parsing avviene nel processo del pool
+    source, line = item
+    try:
+        article = parse_record(json.loads(line))
+        article["keyword"] = (keyword_map or {}).get(article["url_slug"]) or article["keyword"] or keyword
+        return audit_article(article, source=source)
+    except Exception as e:
+        return {"source": source, "error": f"{type(e).__name__}: {e}"}
+
+
+def parse_wxr_post(post):
+    # Articolo di un export WordPress: il contenuto passa dall'import dell'editor
+    # (gli stessi blocchi che si otterrebbero incollandolo) e la keyword da Rank Math
+    keywords = focus_keywords(post["meta"])
+    return parse_record({
+        "title": post["title"],
+        "meta_desc": post["meta"].get(RANK_MATH_DESCRIPTION) or post["excerpt"],
+        "url_slug": post["slug"],
+        "keyword": keywords[0] if keywords else "",
+        "blocks": import_blocks_from_html(wpautop(post["content"]), ()),
+    })
+
+
+def audit_post(item, keyword="", keyword_map=None):
+    # item = (sorgente, articolo letto da iter_wxr_posts)
+    source, post = item
+    try:
+        article = parse_wxr_post(post)
+        article["keyword"] = (keyword_map or {}).get(article["url_slug"]) or article["keyword"] or keyword
+        return audit_article(article, source=source)
+    except Exception as e:
+        return {"source": source, "error": f"{type(e).__name__}: {e}"}
+
+
+def iter_wxr(path, post_types):
+    name = "stdin" if path == "-" else path
+    for post in iter_wxr_posts(path, post_types=post_types):
+        yield f"{name}#{post['id']}", post
+
+
+def iter_jsonl(path):
+    # (sorgente, riga) per ogni riga non vuota, letta una alla volta
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    name = "stdin" if path == "-" else path
+    try:
+        for lineno, line in enumerate(f, 1):
+            if line.strip():
+                yield f"{name}:{lineno}", line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def imap_bounded(pool, func, items, max_in_flight):
+    # Come pool.map, ma consuma l'input a poco a poco: al massimo max_in_flight
+    # lavori in coda, risultati restituiti in ordine appena pronti.
+    items = iter(items)
+    in_flight = deque(pool.submit(func, item) for item in islice(items, max_in_flight))
+    while in_flight:
+        result = in_flight.popleft().result()
+        for item in islice(items, 1):
+            in_flight.append(pool.submit(func, item))
+        yield result
+
+
+def write_jsonl(results, out):
+    count = 0
+    for row in results:
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
+def write_csv(results, out):
+    fields = ["source", "title", "url_slug", "keyword", "respected", "total"] + METRIC_FIELDS + RULE_KEYS + ["error"]
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    count = 0
+    for row in results:
+        flat = {k: v for k, v in row.items() if k != "rules"}
+        flat.update(row.get("rules", {}))
+        writer.writerow(flat)
+        out.flush()
+        count += 1
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Audit Rank Math di articoli HTML e bozze JSON.")
+    parser.add_argument("paths", nargs="*", help="File o cartelle (es. output/articoli)")
+    parser.add_argument("--jsonl", action="append", default=[], help="File JSONL di articoli ('-' per stdin), ripetibile")
+    parser.add_argument("--wxr", action="append", default=[], help="Export XML di WordPress ('-' per stdin), ripetibile")
+    parser.add_argument("--post-type", action="append", help="Tipi di contenuto da leggere dal WXR (default: post), ripetibile")
+    parser.add_argument("-o", "--output", default="-", help="File del report (.jsonl, .csv o .parquet), '-' per stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"], help="Formato del report (default: dall'estensione)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Processi paralleli (default: numero di core)")
+    parser.add_argument("--keyword", default="", help="Keyword da usare se il file non ne indica una")
+    parser.add_argument("--keyword-map", help="File JSON {slug: keyword}")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Articoli in lavorazione contemporaneamente (default: 4 per processo)")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.jsonl and not args.wxr:
+        parser.error("indica almeno una cartella/file oppure --jsonl/--wxr")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or next(
+        (f for f in ("csv", "parquet") if args.output.lower().endswith("." + f)), "jsonl"
+    )
+    if fmt == "parquet" and args.output == "-":
+        sys.exit("Il formato parquet richiede un file di output (-o report.parquet).")
+    keyword_map = {}
+    if args.keyword_map:
+        with open(args.keyword_map, "r", encoding="utf-8") as f:
+            keyword_map = json.load(f)
+
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = args.max_in_flight or workers * 4
+    audit_path = partial(audit_file, keyword=args.keyword, keyword_map=keyword_map)
+    audit_jsonl = partial(audit_line, keyword=args.keyword, keyword_map=keyword_map)
+    audit_wxr = partial(audit_post, keyword=args.keyword, keyword_map=keyword_map)
+    post_types = tuple(args.post_type or ("post",))
+    if fmt == "parquet":
+        # pandas/pyarrow servono solo per questo formato
+        from statistiche_corpus import write_parquet_stream
+        out = args.output
+        write = write_parquet_stream
+    else:
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+        write = write_csv if fmt == "csv" else write_jsonl
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Pipeline di generatori: input -> pool (a finestra limitata) -> report
+            rows = chain(
+                imap_bounded(pool, audit_path, find_inputs(args.paths), max_in_flight),
+                *(imap_bounded(pool, audit_jsonl, iter_jsonl(path), max_in_flight) for path in args.jsonl),
+                *(imap_bounded(pool, audit_wxr, iter_wxr(path, post_types), max_in_flight) for path in args.wxr),
+            )
+            count = write(rows, out)
+    finally:
+        if fmt != "parquet" and out is not sys.stdout:
+            out.close()
+    print(f"{count} articoli analizzati.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
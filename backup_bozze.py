@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from archivio_bozze import DraftStorageError, JsonBinStorage, SqliteStorage
+from article_generator import DRAFT_BACKEND, DRAFT_DB_PATH, DRAFT_LIST_BIN_ID, JSONBIN_MASTER_KEY, JSONBIN_URL
+from audit_articoli import imap_bounded
+from formato_bozze import DraftFormatError, decode_draft, encode_draft
+from jsonbin_client import POOL_SIZE, JsonBinClient
+
+# Backup e ripristino di tutte le bozze in un unico file locale.
+#
+#   python backup_bozze.py esporta bozze.jsonl
+#   python backup_bozze.py importa bozze.jsonl --backend sqlite
+#   python backup_bozze.py esporta bozze.jsonl -j 16   (16 richieste in parallelo)
+#
+# L'archivio è un file JSONL con una riga per bozza: {"id", "name", "record"},
+# dove record è la bozza nel formato di formato_bozze.py. Le righe sono lette
+# anche da audit_articoli.py --jsonl.
+# Le bozze vengono lette e scritte in parallelo da un pool di thread (le
+# operazioni aspettano la rete, non la CPU). Al massimo --max-in-flight bozze
+# sono in memoria in ogni momento, quindi anche migliaia di bozze vanno bene.
+
+WORKERS = 8
+
+
+def make_storage(backend=DRAFT_BACKEND, db_path=DRAFT_DB_PATH, workers=WORKERS):
+    # Come draft_storage() dell'app, ma con abbastanza connessioni per il pool
+    if backend == "sqlite":
+        return SqliteStorage(db_path)
+    client = JsonBinClient(JSONBIN_MASTER_KEY, base_url=JSONBIN_URL, pool_size=max(workers, POOL_SIZE))
+    return JsonBinStorage(client, DRAFT_LIST_BIN_ID)
+
+
+def _fetch(storage, entry):
+    draft_id, name = entry
+    try:
+        return {"id": draft_id, "name": name, "record": encode_draft(storage.load(draft_id))}
+    except DraftStorageError as e:
+        return {"id": draft_id, "name": name, "error": str(e)}
+
+
+def export_drafts(storage, path, workers=WORKERS, max_in_flight=None, progress=None):
+    # Scrive tutte le bozze della lista in `path` (prima in un file temporaneo,
+    # così un export interrotto non sostituisce il backup precedente).
+    # Restituisce {"exported": n, "errors": [(id, nome, messaggio), ...]}
+    entries = storage.list()
+    exported = 0
+    errors = []
+    tmp_path = path + ".tmp"
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        rows = imap_bounded(pool, lambda entry: _fetch(storage, entry), entries, max_in_flight or workers * 4)
+        for done, row in enumerate(rows, 1):
+            if "error" in row:
+                errors.append((row["id"], row["name"], row["error"]))
+            else:
+                f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+                exported += 1
+            if progress:
+                progress(done, len(entries))
+    os.replace(tmp_path, path)
+    return {"exported": exported, "errors": errors}
+
+
+def iter_archive(path):
+    # {"line", "id", "name", "draft"} per ogni riga dell'archivio, oppure
+    # {"line", "error"} per le righe illeggibili
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                draft = decode_draft(row["record"])
+            except (ValueError, KeyError, TypeError, DraftFormatError) as e:
+                yield {"line": lineno, "error": f"riga non valida: {e}"}
+                continue
+            name = row.get("name") or draft.get("nome_bozza") or f"bozza_{lineno}"
+            yield {"line": lineno, "id": row.get("id"), "name": name, "draft": draft}
+
+
+def _restore(storage, item, existing):
+    if "error" in item:
+        return item
+    try:
+        if item["id"] and item["id"] not in existing:
+            storage.restore(item["id"], item["name"], item["draft"])
+        else:
+            # Senza id, o con l'id di una bozza già presente: copia con un id nuovo
+            storage.save(item["name"], item["draft"])
+    except DraftStorageError as e:
+        return {"line": item["line"], "name": item["name"], "error": str(e)}
+    return {"line": item["line"], "name": item["name"]}
+
+
+def import_drafts(storage, path, workers=WORKERS, max_in_flight=None, skip_existing=True, progress=None):
+    # Salva nell'archivio tutte le bozze del file, con il loro id (su JSONBin
+    # gli id li assegna il servizio). Con skip_existing salta le bozze il cui id
+    # è già presente, così un import interrotto su SQLite si può rilanciare;
+    # senza, le importa come copie con un id nuovo. Più bozze con lo stesso nome
+    # restano bozze distinte. Un id già usato da un'altra bozza è un errore.
+    # Restituisce {"imported": n, "skipped": n, "errors": [("riga n", nome, messaggio), ...]}
+    existing = {draft_id for draft_id, _ in storage.list()}
+    skipped = 0
+
+    def pending():
+        nonlocal skipped
+        for item in iter_archive(path):
+            if skip_existing and item.get("id") in existing:
+                skipped += 1
+                continue
+            yield item
+
+    imported = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = imap_bounded(pool, lambda item: _restore(storage, item, existing), pending(), max_in_flight or workers * 4)
+        for done, row in enumerate(results, 1):
+            if "error" in row:
+                errors.append((f"riga {row['line']}", row.get("name", ""), row["error"]))
+            else:
+                imported += 1
+            if progress:
+                progress(done, None)
+    return {"imported": imported, "skipped": skipped, "errors": errors}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Esporta o importa tutte le bozze in un file JSONL.")
+    parser.add_argument("command", choices=["esporta", "importa"])
+    parser.add_argument("path", help="File dell'archivio (.jsonl)")
+    parser.add_argument("--backend", choices=["jsonbin", "sqlite"], default=DRAFT_BACKEND,
+                        help="Archivio delle bozze (default: TI_AIUTO_BOZZE)")
+    parser.add_argument("--db", default=DRAFT_DB_PATH, help="Database SQLite (default: TI_AIUTO_BOZZE_DB)")
+    parser.add_argument("-j", "--workers", type=int, default=WORKERS, help="Richieste in parallelo")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Bozze in memoria contemporaneamente (default: 4 per thread)")
+    parser.add_argument("--include-existing", action="store_true",
+                        help="Importa come copie anche le bozze con un id già presente")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    storage = make_storage(args.backend, args.db, args.workers)
+    start = time.perf_counter()
+
+    def progress(done, total):
+        if done % 100 == 0:
+            print(f"{done}/{total}" if total else str(done), file=sys.stderr)
+
+    if args.command == "esporta":
+        result = export_drafts(storage, args.path, args.workers, args.max_in_flight, progress)
+        summary = f"{result['exported']} bozze esportate in {args.path}"
+    else:
+        result = import_drafts(storage, args.path, args.workers, args.max_in_flight,
+                               skip_existing=not args.include_existing, progress=progress)
+        summary = f"{result['imported']} bozze importate, {result['skipped']} già presenti"
+    if args.backend == "sqlite":
+        storage.close()
+    for ref, name, error in result["errors"]:
+        print(f"Errore ({ref} {name}): {error}", file=sys.stderr)
+    print(f"{summary}, {len(result['errors'])} errori ({time.perf_counter() - start:.1f} s).", file=sys.stderr)
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
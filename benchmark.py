@@ -0,0 +1,236 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from article_generator import (
+    assemble_blocks,
+    check_all_rules,
+    clear_rules_cache,
+    generate_html,
+    get_rules_html,
+    import_blocks_from_html,
+    wp_article_parts,
+)
+
+# Benchmark del motore regole e della generazione HTML su articoli sintetici
+# in italiano. Confronta tempi e memoria di picco con una baseline salvata.
+#
+#   python benchmark.py                    # esegue e confronta con la baseline
+#   python benchmark.py --save-baseline    # aggiorna la baseline
+#   python benchmark.py --only 600 5k      # solo alcuni casi
+#
+# Una regressione deve superare sia la tolleranza in percentuale sia una
+# differenza minima assoluta (--min-delta-ms, --min-delta-kb): sui casi da
+# pochi microsecondi o pochi KiB il 25% è rumore. I casi segnalati vengono
+# misurati di nuovo (--reruns) e contano solo se peggiorano ogni volta.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+KEYWORD = "installare windows"
+TITLE = "Installare Windows 11: Guida Completa in 7 Passi"
+META_DESC = "Come installare Windows 11 passo dopo passo, dai requisiti alla prima configurazione."
+SLUG = "installare-windows-11-guida"
+
+VOCABOLARIO = (
+    "il la lo gli le un una di da in con su per tra fra e o ma che non come quando dove "
+    "sistema computer installazione aggiornamento file cartella disco partizione avvio "
+    "driver scheda rete utente account impostazioni sicurezza privacy backup ripristino "
+    "velocemente facilmente sempre spesso prima dopo durante ogni nuovo vecchio grande "
+    "piccolo semplice importante necessario possibile veloce sicuro pratico completo "
+    "configurare scaricare aprire chiudere selezionare premere attendere controllare "
+    "verificare creare salvare copiare spostare eliminare riavviare aggiornare"
+).split()
+
+# Casi: articoli per numero di parole e per numero di blocchi
+CASES = {
+    "600": {"words": 600},
+    "5k": {"words": 5_000},
+    "50k": {"words": 50_000},
+    "200k": {"words": 200_000},
+    "10 blocchi": {"blocks": 10},
+    "100 blocchi": {"blocks": 100},
+    "1000 blocchi": {"blocks": 1000},
+}
+WORDS_PER_PARAGRAPH = 60
+
+
+def synthetic_blocks(words=None, blocks=None, seed=42):
+    # Articolo deterministico: H2 ogni 6 blocchi, un'immagine ogni 10,
+    # link misti nei paragrafi e keyword intorno all'1% delle parole
+    rnd = random.Random(seed)
+    n_blocks = blocks if blocks is not None else max(1, words // WORDS_PER_PARAGRAPH)
+    per_paragraph = WORDS_PER_PARAGRAPH if words is None else max(1, words // n_blocks)
+    result = []
+    for i in range(n_blocks):
+        if i % 10 == 9:
+            alt = KEYWORD if i % 20 == 9 else "schermata di configurazione"
+            result.append({"type": "Immagine", "url": f"https://ti-aiuto.io/img/{i}.png", "alt": alt})
+        elif i % 6 == 0:
+            heading = " ".join(rnd.choice(VOCABOLARIO) for _ in range(5))
+            result.append({"type": "Titolo H2", "content": f"{heading} {KEYWORD}" if i % 12 == 0 else heading})
+        else:
+            words_list = [rnd.choice(VOCABOLARIO) for _ in range(per_paragraph)]
+            if i % 2 == 1:
+                words_list[rnd.randrange(len(words_list))] = KEYWORD
+            if i % 5 == 1:
+                words_list.append('<a href="https://learn.microsoft.com" rel="nofollow">guida ufficiale</a>')
+            if i % 7 == 3:
+                words_list.append('<a href="/windows-10">articolo correlato</a>')
+            result.append({"type": "Paragrafo", "content": " ".join(words_list)})
+    return result
+
+
+def benchmark_functions(blocks):
+    # Funzioni misurate, ognuna con input già pronti (solo la chiamata viene misurata)
+    content = assemble_blocks(blocks)
+    parts = wp_article_parts(TITLE, META_DESC, blocks)
+    final_html = "\n".join(parts)
+    existing = blocks[: len(blocks) // 2]
+    return {
+        "check_all_rules": lambda: check_all_rules(TITLE, META_DESC, SLUG, final_html, KEYWORD, parts=parts),
+        "get_rules_html": lambda: get_rules_html(TITLE, META_DESC, SLUG, final_html, KEYWORD, parts=parts),
+        "assemble_blocks": lambda: assemble_blocks(blocks),
+        "generate_html": lambda: generate_html(TITLE, META_DESC, SLUG, content),
+        "import_blocks_from_html": lambda: import_blocks_from_html(content, existing),
+    }
+
+
+def measure(func, min_time=0.5, max_repeat=200):
+    # Miglior tempo su più ripetizioni, a cache fredde (ogni chiamata rianalizza tutto)
+    # e con il garbage collector fermo, come fa timeit
+    best = float("inf")
+    total = 0.0
+    repeat = 0
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while repeat < 3 or (total < min_time and repeat < max_repeat):
+            clear_rules_cache()
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = min(best, elapsed)
+            total += elapsed
+            repeat += 1
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    # Memoria di picco su una chiamata separata (tracemalloc rallenta i tempi)
+    clear_rules_cache()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_kb": peak / 1024, "repeat": repeat}
+
+
+def run(case_names, only_funcs=None):
+    # only_funcs: {caso: {funzioni}} per misurare di nuovo solo alcune funzioni
+    results = {}
+    for name in case_names:
+        blocks = synthetic_blocks(**CASES[name])
+        results[name] = {}
+        for func_name, func in benchmark_functions(blocks).items():
+            if only_funcs is not None and func_name not in only_funcs.get(name, ()):
+                continue
+            results[name][func_name] = measure(func)
+            r = results[name][func_name]
+            print(f"{name:<13} {func_name:<24} {r['seconds'] * 1000:10.2f} ms {r['peak_kb']:12.0f} KiB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms=0.5, min_delta_kb=64):
+    # Righe di confronto e regressioni [(caso, funzione), ...] (tempo o memoria oltre
+    # la tolleranza). Sotto min_delta_ms / min_delta_kb di differenza assoluta è rumore.
+    lines = []
+    regressions = []
+    for case, funcs in results.items():
+        for func_name, r in funcs.items():
+            base = baseline.get("results", {}).get(case, {}).get(func_name)
+            if not base:
+                lines.append(f"{case:<13} {func_name:<24} {r['seconds'] * 1000:10.2f} ms   (nessuna baseline)")
+                continue
+            time_ratio = r["seconds"] / base["seconds"] if base["seconds"] else 1.0
+            mem_ratio = r["peak_kb"] / base["peak_kb"] if base["peak_kb"] else 1.0
+            flag = ""
+            slower = time_ratio > 1 + tolerance and (r["seconds"] - base["seconds"]) * 1000 > min_delta_ms
+            bigger = mem_ratio > 1 + tolerance and r["peak_kb"] - base["peak_kb"] > min_delta_kb
+            if slower or bigger:
+                flag = "  REGRESSIONE"
+                regressions.append((case, func_name))
+            lines.append(
+                f"{case:<13} {func_name:<24} {r['seconds'] * 1000:10.2f} ms ({time_ratio:5.2f}x)"
+                f" {r['peak_kb']:10.0f} KiB ({mem_ratio:5.2f}x){flag}"
+            )
+    return lines, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del motore regole e della generazione HTML.")
+    parser.add_argument("--only", nargs="+", choices=list(CASES), help="Esegue solo questi casi")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="File JSON della baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Salva i risultati come nuova baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Peggioramento tollerato (0.25 = +25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Differenza minima (ms) per segnalare un rallentamento")
+    parser.add_argument("--min-delta-kb", type=float, default=64, help="Differenza minima (KiB) per segnalare più memoria")
+    parser.add_argument("--reruns", type=int, default=2, help="Nuove misure dei casi segnalati prima di dare la regressione")
+    parser.add_argument("--json", help="Salva anche i risultati grezzi in questo file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args.only or list(CASES))
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # Aggiorna solo i casi eseguiti, mantenendo gli altri
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in report.items() if k != "results"})
+        baseline["results"].update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline salvata in {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("Nessuna baseline: esegui con --save-baseline per crearla.")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    lines, regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.min_delta_kb)
+    for _ in range(args.reruns):
+        if not regressions:
+            break
+        # Si tiene la misura migliore: un picco di rumore non basta per una regressione
+        only_funcs = {}
+        for case, func_name in regressions:
+            only_funcs.setdefault(case, set()).add(func_name)
+        print(f"Nuova misura di {len(regressions)} casi segnalati...", file=sys.stderr)
+        for case, funcs in run(list(only_funcs), only_funcs).items():
+            for func_name, r in funcs.items():
+                old = results[case][func_name]
+                old["seconds"] = min(old["seconds"], r["seconds"])
+                old["peak_kb"] = min(old["peak_kb"], r["peak_kb"])
+        lines, regressions = compare(results, baseline, args.tolerance, args.min_delta_ms, args.min_delta_kb)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regressioni oltre il {args.tolerance:.0%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import uuid
+
+from formato_bozze import BLOCK_TYPES
+
+# Blocchi di contenuto dell'editor.
+#
+# Nelle bozze (e in tutto ciò che le legge) un blocco è un dict come
+# {"type": "Paragrafo", "content": "..."}. Nella sessione dell'editor è un Block:
+# ha un id stabile, che fa da chiave ai widget (txt_<id>, up_<id>, ...), così
+# spostare o eliminare un blocco non sposta lo stato dei widget degli altri, e
+# tiene in cache il proprio HTML finché un campo non cambia.
+# Block si legge e si scrive come il dict (blk["content"], blk.get("alt")).
+
+# Campi con uno slot proprio; quelli di altri tipi di blocco finiscono in extra
+BLOCK_FIELDS = ("content", "url", "alt")
+_ITEM_KEYS = ("type", "imported") + BLOCK_FIELDS
+
+
+def new_block_id():
+    return uuid.uuid4().hex[:12]
+
+
+def _block_html(block):
+    t = block["type"]
+    if t == "Paragrafo":
+        return f"<p>{block['content']}</p>"
+    if t == "Titolo H2":
+        return f"<h2>{block['content']}</h2>"
+    if t == "Titolo H3":
+        return f"<h3>{block['content']}</h3>"
+    if t == "Elenco":
+        # L'elenco intero (<ul>/<ol>), com'è stato scritto o importato
+        return block["content"]
+    if t == "Immagine":
+        url = block.get("url", "")
+        alt = block.get("alt", "")
+        img = f'<img src="{url}" loading="lazy" alt="{alt}" />'
+        caption = block.get("caption")
+        return f"<figure>{img}<figcaption>{caption}</figcaption></figure>" if caption else img
+    if t == "Video":
+        url = block.get("url", "")
+        if block.get("player") == "video":
+            return f'<video src="{url}" controls></video>'
+        return f'<iframe src="{url}" loading="lazy" allowfullscreen></iframe>'
+    return ""
+
+
+def block_to_html(block):
+    if isinstance(block, Block):
+        return block.html
+    return _block_html(block)
+
+
+class Block:
+    __slots__ = ("id", "type", "content", "url", "alt", "imported", "extra", "_html")
+
+    def __init__(self, type, content="", url="", alt="", imported=False, extra=None, id=None):
+        self.id = id or new_block_id()
+        self.type = type
+        self.content = content
+        self.url = url
+        self.alt = alt
+        self.imported = imported
+        self.extra = extra or None
+
+    def __setattr__(self, name, value):
+        # Ogni modifica invalida l'HTML in cache
+        object.__setattr__(self, name, value)
+        if name != "_html":
+            object.__setattr__(self, "_html", None)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        block_type = data.pop("type", "")
+        if block_type not in BLOCK_TYPES:
+            # Tipo sconosciuto: tutto in extra, restituito com'è da to_dict
+            return cls(block_type, extra=data)
+        fields = {field: data.pop(field) for field in BLOCK_FIELDS if field in data}
+        imported = data.pop("imported", None) is True
+        return cls(block_type, imported=imported, extra=data, **fields)
+
+    def to_dict(self):
+        # Il dict delle bozze, senza id (vale solo per la sessione)
+        block = {"type": self.type}
+        if self.type in BLOCK_TYPES:
+            for field in BLOCK_TYPES[self.type][1]:
+                if field in BLOCK_FIELDS:
+                    block[field] = getattr(self, field)
+            if self.imported:
+                block["imported"] = True
+        if self.extra:
+            block.update(self.extra)
+        return block
+
+    @property
+    def html(self):
+        if self._html is None:
+            self._html = _block_html(self)
+        return self._html
+
+    def __getitem__(self, key):
+        if key in _ITEM_KEYS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _ITEM_KEYS:
+            setattr(self, key, value)
+        else:
+            self.extra = {**(self.extra or {}), key: value}
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Block({self.type!r}, id={self.id!r})"
+
+
+def as_blocks(blocks):
+    # Converte in Block (sul posto) i dict della lista, es. appena caricati da una bozza
+    for i, block in enumerate(blocks):
+        if not isinstance(block, Block):
+            blocks[i] = Block.from_dict(block)
+    return blocks
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from archivio_bozze import JsonBinStorage, SqliteStorage
+from jsonbin_client import JsonBinClient, JsonBinError
+from jsonbin_locale import DEFAULT_BINS, start_in_thread
+
+# Load test degli archivi delle bozze: N sessioni simulate in parallelo
+# salvano, elencano, caricano ed eliminano bozze e alla fine si stampano
+# throughput e latenze (p50/p95/p99/max) per operazione.
+#
+#   python carico_bozze.py --sessions 20 --duration 30 --latency 80 --jitter 40
+#   python carico_bozze.py --backend sqlite
+#   python carico_bozze.py --url http://127.0.0.1:8765/v3 --master-key chiave
+#
+# Senza --url avvia al volo il server di jsonbin_locale.py.
+
+LIST_BIN_ID = next(iter(DEFAULT_BINS))
+# Peso di ogni operazione nel mix di una sessione
+OPERATION_WEIGHTS = {"save": 3, "list": 4, "load": 4, "delete": 1}
+
+
+def make_draft(session, n, blocks):
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    content = []
+    for i in range(blocks):
+        if i % 5 == 0:
+            content.append({"type": "Titolo H2", "content": f"Sezione {i // 5 + 1}"})
+        else:
+            content.append({"type": "Paragrafo", "content": " ".join(random.choices(words, k=60))})
+    return {
+        "Titolo SEO": f"Bozza {session}-{n}",
+        "Meta Description (max 160 caratteri)": "Descrizione di prova per il load test",
+        "URL Slug (senza dominio)": f"bozza-{session}-{n}",
+        "Keyword principale": "lorem ipsum",
+        "Keyword secondarie": "dolor, tempor",
+        "content_blocks": content,
+        "nome_bozza": f"Carico {session}-{n}",
+    }
+
+
+def percentile(values, p):
+    # values già ordinati
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, round(p / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # operazione -> [secondi]
+        self.errors = defaultdict(int)
+        self.last_error = {}  # operazione -> messaggio dell'ultimo errore
+        self.lock = threading.Lock()
+
+    def record(self, operation, elapsed, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[operation].append(elapsed)
+            else:
+                self.errors[operation] += 1
+                self.last_error[operation] = f"{type(error).__name__}: {error}"
+
+    def report(self, wall_time):
+        rows = {}
+        for operation in OPERATION_WEIGHTS:
+            values = sorted(self.latencies.get(operation, []))
+            rows[operation] = {
+                "ok": len(values),
+                "errori": self.errors.get(operation, 0),
+                "ops_s": round(len(values) / wall_time, 1) if wall_time else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+            }
+            if operation in self.last_error:
+                rows[operation]["ultimo_errore"] = self.last_error[operation][:200]
+        total = sum(row["ok"] for row in rows.values())
+        return {
+            "durata_s": round(wall_time, 2),
+            "operazioni": total,
+            "errori": sum(row["errori"] for row in rows.values()),
+            "ops_s": round(total / wall_time, 1) if wall_time else 0.0,
+            "per_operazione": rows,
+        }
+
+
+def run_session(storage, session, args, stats, deadline):
+    rng = random.Random(session)
+    operations = list(OPERATION_WEIGHTS)
+    weights = list(OPERATION_WEIGHTS.values())
+    own = []  # bozze salvate da questa sessione
+    known = []  # ultimi id visti nella lista
+    n = 0
+    while time.monotonic() < deadline and (not args.iterations or n < args.iterations):
+        operation = rng.choices(operations, weights)[0]
+        if operation == "delete" and not own:
+            operation = "save"
+        if operation == "load" and not (known or own):
+            operation = "list"
+        start = time.perf_counter()
+        error = None
+        try:
+            if operation == "save":
+                draft = make_draft(session, n, args.blocks)
+                draft_id = own[-1] if own and rng.random() < 0.5 else None
+                own.append(storage.save(draft["nome_bozza"], draft, draft_id=draft_id))
+                if draft_id:
+                    own.remove(draft_id)
+            elif operation == "list":
+                known = [draft_id for draft_id, _name in storage.list()[-50:]]
+            elif operation == "load":
+                storage.load(rng.choice(known or own))
+            else:
+                storage.delete(own.pop(rng.randrange(len(own))))
+        except Exception as e:
+            # Anche una bozza eliminata da un'altra sessione conta come errore:
+            # con molte sessioni capita, ma resta poco frequente
+            error = e
+        stats.record(operation, time.perf_counter() - start, error)
+        n += 1
+
+
+def make_storage(args, url):
+    if args.backend == "sqlite":
+        return SqliteStorage(args.db or os.path.join(tempfile.mkdtemp(prefix="carico_bozze_"), "bozze.db"))
+    # Un client (e una Session) condiviso fra le sessioni, come nell'app
+    client = JsonBinClient(args.master_key or "", base_url=url, pool_size=max(args.sessions, 10))
+    return JsonBinStorage(client, LIST_BIN_ID)
+
+
+def run_load(args):
+    stop = None
+    store = None
+    url = args.url
+    if args.backend == "jsonbin" and not url:
+        url, store, _config, stop = start_in_thread(
+            master_key=args.master_key,
+            latency_ms=args.latency,
+            jitter_ms=args.jitter,
+            error_rate=args.error_rate,
+            etag=not args.no_etag,
+        )
+    storage = make_storage(args, url)
+    stats = LoadStats()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=run_session, args=(storage, i, args, stats, deadline), name=f"sessione-{i}")
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = stats.report(time.perf_counter() - start)
+    report["backend"] = args.backend
+    report["sessioni"] = args.sessions
+    if store is not None:
+        report["richieste_http"] = store.requests
+        report["errori_iniettati"] = store.injected_errors
+    if args.backend == "sqlite":
+        storage.close()
+    if stop:
+        stop()
+    return report
+
+
+def print_report(report):
+    print(f"{report['backend']}: {report['sessioni']} sessioni, {report['durata_s']} s, "
+          f"{report['operazioni']} operazioni ({report['ops_s']} op/s), {report['errori']} errori")
+    if "richieste_http" in report:
+        print(f"richieste HTTP: {report['richieste_http']}, errori iniettati: {report['errori_iniettati']}")
+    print(f"{'operazione':<10} {'ok':>7} {'errori':>7} {'op/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation, row in report["per_operazione"].items():
+        print(f"{operation:<10} {row['ok']:>7} {row['errori']:>7} {row['ops_s']:>8} {row['p50_ms']:>8} "
+              f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    for operation, row in report["per_operazione"].items():
+        if "ultimo_errore" in row:
+            print(f"ultimo errore {operation}: {row['ultimo_errore']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test di salvataggio, lista, caricamento ed eliminazione bozze.")
+    parser.add_argument("--backend", choices=("jsonbin", "sqlite"), default="jsonbin")
+    parser.add_argument("--url", help="API JSONBin da usare (default: server locale avviato al volo)")
+    parser.add_argument("--master-key", default=None)
+    parser.add_argument("--db", help="Database SQLite (default: file temporaneo)")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessioni simulate in parallelo")
+    parser.add_argument("--duration", type=float, default=10, help="Durata massima (s)")
+    parser.add_argument("--iterations", type=int, default=0, help="Operazioni per sessione (0 = fino a --duration)")
+    parser.add_argument("--blocks", type=int, default=20, help="Blocchi di contenuto per bozza")
+    parser.add_argument("--latency", type=float, default=0, help="Latenza media del server locale (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Variazione della latenza del server locale (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Quota di errori del server locale (0-1)")
+    parser.add_argument("--no-etag", action="store_true", help="Server locale senza ETag/If-Match")
+    parser.add_argument("--json", action="store_true", help="Stampa il risultato in JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_load(args)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import base64
+import json
+import zlib
+
+# Formato delle bozze salvate (JSONBin, SQLite, file esportati).
+#
+# Versione 1 (quella storica): il dict di save_draft così com'è, con i nomi
+# lunghi dei campi e content_blocks come lista di dict.
+# Versione 2: {"v": 2, "f": {campi con chiavi brevi}, "b": [blocchi compatti]},
+# oppure {"v": 2, "z": "<base64>"} con lo stesso contenuto compresso con zlib.
+# Un blocco compatto è [tipo, valori dei campi del tipo..., flag, extra]:
+# flag ed extra compaiono solo se servono, così i blocchi comuni restano
+# liste di due o tre stringhe.
+#
+# decode_draft legge entrambe le versioni e restituisce sempre il dict v1.
+
+FORMAT_VERSION = 2
+COMPRESS_MIN_BYTES = 1024  # sotto questa dimensione la compressione non conviene
+COMPRESS_LEVEL = 6
+
+# Campi della bozza -> chiavi brevi
+DRAFT_FIELDS = {
+    "Titolo SEO": "t",
+    "Meta Description (max 160 caratteri)": "m",
+    "URL Slug (senza dominio)": "u",
+    "Keyword principale": "k",
+    "Keyword secondarie": "k2",
+    "nome_bozza": "n",
+}
+SHORT_FIELDS = {short: name for name, short in DRAFT_FIELDS.items()}
+
+# Tipo di blocco -> (codice, campi in ordine)
+BLOCK_TYPES = {
+    "Paragrafo": ("p", ("content",)),
+    "Titolo H2": ("h2", ("content",)),
+    "Immagine": ("img", ("url", "alt")),
+    "Titolo H3": ("h3", ("content",)),
+    "Elenco": ("ul", ("content",)),
+    "Video": ("video", ("url",)),
+}
+BLOCK_CODES = {code: (block_type, fields) for block_type, (code, fields) in BLOCK_TYPES.items()}
+# Chiavi booleane dei blocchi salvate come bit del flag
+BLOCK_FLAGS = ("imported",)
+
+
+class DraftFormatError(ValueError):
+    pass
+
+
+def encode_block(block):
+    block_type = block.get("type")
+    if block_type not in BLOCK_TYPES:
+        # Tipo sconosciuto: salvato com'è
+        return ["?", block]
+    code, fields = BLOCK_TYPES[block_type]
+    encoded = [code] + [block.get(field, "") for field in fields]
+    flags = 0
+    for bit, flag in enumerate(BLOCK_FLAGS):
+        if block.get(flag) is True:
+            flags |= 1 << bit
+    known = {"type", *fields, *(flag for flag in BLOCK_FLAGS if block.get(flag) is True)}
+    extra = {k: v for k, v in block.items() if k not in known}
+    if flags or extra:
+        encoded.append(flags)
+    if extra:
+        encoded.append(extra)
+    return encoded
+
+
+def decode_block(encoded):
+    code = encoded[0]
+    if code == "?":
+        return dict(encoded[1])
+    if code not in BLOCK_CODES:
+        raise DraftFormatError(f"Tipo di blocco sconosciuto: {code!r}")
+    block_type, fields = BLOCK_CODES[code]
+    block = {"type": block_type}
+    block.update(zip(fields, encoded[1:1 + len(fields)]))
+    rest = encoded[1 + len(fields):]
+    if rest:
+        for bit, flag in enumerate(BLOCK_FLAGS):
+            if rest[0] & (1 << bit):
+                block[flag] = True
+    if len(rest) > 1:
+        block.update(rest[1])
+    return block
+
+
+def encode_draft(draft, compress=True):
+    fields = {}
+    extra = {}
+    for key, value in draft.items():
+        if key == "content_blocks":
+            continue
+        if key in DRAFT_FIELDS:
+            fields[DRAFT_FIELDS[key]] = value
+        else:
+            extra[key] = value
+    record = {"v": FORMAT_VERSION, "f": fields, "b": [encode_block(b) for b in draft.get("content_blocks", [])]}
+    if extra:
+        record["x"] = extra
+    if not compress:
+        return record
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) < COMPRESS_MIN_BYTES:
+        return record
+    packed = zlib.compress(payload, COMPRESS_LEVEL)
+    if len(packed) * 4 // 3 >= len(payload):
+        # Con il base64 non ci sarebbe guadagno
+        return record
+    return {"v": FORMAT_VERSION, "z": base64.b64encode(packed).decode("ascii")}
+
+
+def decode_draft(record):
+    # Qualunque versione -> dict della bozza (formato di save_draft)
+    if not isinstance(record, dict):
+        raise DraftFormatError("La bozza non è un oggetto JSON")
+    version = record.get("v", 1)
+    if version == 1:
+        return record
+    if version != FORMAT_VERSION:
+        raise DraftFormatError(f"Versione del formato bozza non supportata: {version!r}")
+    if "z" in record:
+        try:
+            record = json.loads(zlib.decompress(base64.b64decode(record["z"])).decode("utf-8"))
+        except (ValueError, zlib.error) as e:
+            raise DraftFormatError(f"Bozza compressa non leggibile: {e}") from e
+    draft = {SHORT_FIELDS.get(k, k): v for k, v in record.get("f", {}).items()}
+    draft.update(record.get("x", {}))
+    draft["content_blocks"] = [decode_block(b) for b in record.get("b", [])]
+    return draft
+
+
+def dumps_draft(draft, compress=True):
+    # Testo JSON compatto (per SQLite e per i file)
+    return json.dumps(encode_draft(draft, compress=compress), ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_draft(text):
+    return decode_draft(json.loads(text))
@@ -0,0 +1,192 @@
+import re
+
+from formato_bozze import BLOCK_TYPES
+
+# Import di HTML incollato (o letto da un export) in blocchi dell'editor.
+#
+# Il parser lavora in streaming: feed() accetta l'HTML a pezzi e i blocchi
+# completati si ritirano con pop_blocks(); in memoria resta solo il blocco in
+# corso. Non tokenizza tutto l'HTML: un'unica regex trova i tag che delimitano
+# i blocchi, e l'HTML interno di un blocco (<strong>, <a>, entità...) viene
+# copiato com'è. Mappatura:
+#   <p>, <h2>, <h3>           -> Paragrafo, Titolo H2, Titolo H3
+#   <ul>, <ol>                -> Elenco (l'elenco intero, annidamenti compresi)
+#   <img>                     -> Immagine
+#   <figure>                  -> Immagine con didascalia, o Video se contiene un embed
+#   <iframe>, <video>         -> Video
+# Un <img> o un <iframe> dentro un paragrafo resta nel paragrafo.
+# I blocchi già presenti nell'editor vengono saltati: il confronto usa un set
+# delle chiavi dei blocchi (tipo + campi), non una scansione per ogni blocco.
+
+TEXT_TAGS = {"p": "Paragrafo", "h2": "Titolo H2", "h3": "Titolo H3"}
+LIST_TAGS = ("ul", "ol")
+MEDIA_TAGS = ("img", "iframe", "video")
+# Tag che chiudono un <p> lasciato aperto (come fa il browser)
+CLOSES_PARAGRAPH = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "figure", "div",
+    "table", "blockquote", "pre", "section", "article", "hr",
+}
+BLOCK_TAGS = CLOSES_PARAGRAPH | {"figcaption", "source", *MEDIA_TAGS}
+
+TAG_RE = re.compile(
+    r"<!--.*?(?:-->|\Z)|<(/?)(" + "|".join(sorted(BLOCK_TAGS, key=len, reverse=True)) + r")(?=[\s/>])"
+    r"""((?:[^>"']|"[^"]*"|'[^']*')*)>""",
+    re.DOTALL | re.IGNORECASE,
+)
+ATTR_RE = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+
+
+def block_key(block):
+    fields = BLOCK_TYPES.get(block["type"], (None, ("content",)))[1]
+    return (block["type"],) + tuple(str(block.get(field, "")).strip() for field in fields)
+
+
+def parse_attrs(text):
+    return {m.group(1).lower(): m.group(2) or m.group(3) or m.group(4) or "" for m in ATTR_RE.finditer(text)}
+
+
+class BlockImporter:
+    def __init__(self, existing_blocks=()):
+        self.existing = {block_key(b) for b in existing_blocks}
+        self.blocks = []
+        self.buffer = ""
+        self.pos = 0  # da dove riprendere la ricerca dei tag nel buffer
+        self.capture = None  # [tipo, tag, inizio nel buffer, annidamento] del blocco di testo aperto
+        self.figure = None  # dati del <figure> aperto
+        self.video = None  # <video> aperto in attesa di <source>
+
+    def emit(self, block):
+        if block_key(block) not in self.existing:
+            block["imported"] = True
+            self.blocks.append(block)
+
+    def pop_blocks(self):
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+    def close_capture(self, end):
+        block_type, tag, start, _ = self.capture
+        self.capture = None
+        content = self.buffer[start:end]
+        if block_type != "Elenco":
+            content = content.strip()
+        if tag == "figcaption":
+            self.figure["caption"] = content
+        else:
+            self.emit({"type": block_type, "content": content})
+
+    def media(self, tag, attrs):
+        # img/iframe/video fuori da un blocco di testo
+        attrs = parse_attrs(attrs)
+        if tag == "img":
+            block = {"type": "Immagine", "url": attrs.get("src", ""), "alt": attrs.get("alt", "")}
+        else:
+            block = {"type": "Video", "url": attrs.get("src", "")}
+            if tag == "video":
+                block["player"] = "video"
+        if self.figure is not None:
+            self.figure.setdefault("block", block)
+        elif tag == "video":
+            # Chiuso da </video>, l'URL può arrivare da <source>
+            self.video = block
+        else:
+            self.emit(block)
+
+    def start_tag(self, tag, attrs, match):
+        capture = self.capture
+        if capture is not None:
+            if capture[1] == "p" and tag in CLOSES_PARAGRAPH:
+                self.close_capture(match.start())
+            else:
+                if tag == capture[1]:
+                    capture[3] += 1
+                return
+        if tag in TEXT_TAGS:
+            self.capture = [TEXT_TAGS[tag], tag, match.end(), 0]
+        elif tag in LIST_TAGS:
+            self.capture = ["Elenco", tag, match.start(), 0]
+        elif tag == "figcaption" and self.figure is not None:
+            self.capture = ["Paragrafo", tag, match.end(), 0]
+        elif tag == "figure":
+            self.figure = {}
+        elif tag == "source":
+            if self.video is not None and not self.video["url"]:
+                self.video["url"] = parse_attrs(attrs).get("src", "")
+        elif tag in MEDIA_TAGS:
+            self.media(tag, attrs)
+
+    def end_tag(self, tag, match):
+        capture = self.capture
+        if capture is not None:
+            if tag == capture[1]:
+                if capture[3] == 0:
+                    self.close_capture(match.end() if capture[0] == "Elenco" else match.start())
+                else:
+                    capture[3] -= 1
+            return
+        if tag == "video" and self.video is not None:
+            block, self.video = self.video, None
+            if self.figure is not None:
+                self.figure.setdefault("block", block)
+            else:
+                self.emit(block)
+        elif tag == "figure" and self.figure is not None:
+            figure, self.figure = self.figure, None
+            block = figure.get("block")
+            if block:
+                if figure.get("caption"):
+                    block["caption"] = figure["caption"]
+                self.emit(block)
+
+    def feed(self, data):
+        self.buffer += data
+        for match in TAG_RE.finditer(self.buffer, self.pos):
+            tag = match.group(2)
+            if tag is None and not match.group(0).endswith("-->", 4):
+                # Commento non ancora chiuso: si riparte dal suo "<!--" col prossimo pezzo
+                self.pos = match.start()
+                break
+            self.pos = match.end()
+            if tag is None:  # commento
+                continue
+            tag = tag.lower()
+            if match.group(1):
+                self.end_tag(tag, match)
+            else:
+                self.start_tag(tag, match.group(3), match)
+        else:
+            # Un tag rimasto a metà si completa col prossimo pezzo: si riparte dall'ultimo "<"
+            tail = self.buffer.rfind("<", self.pos)
+            if tail != -1:
+                self.pos = tail
+            else:
+                self.pos = len(self.buffer)
+        # Del buffer serve solo il blocco di testo aperto (se c'è) e il tag a metà
+        keep = self.pos if self.capture is None else min(self.pos, self.capture[2])
+        if keep:
+            self.buffer = self.buffer[keep:]
+            self.pos -= keep
+            if self.capture is not None:
+                self.capture[2] -= keep
+
+    def close(self):
+        if self.capture is not None:
+            # Blocco non chiuso a fine HTML: lo si tiene com'è
+            self.close_capture(len(self.buffer))
+        self.buffer = ""
+        self.pos = 0
+
+
+def iter_blocks_from_html(chunks, existing_blocks=()):
+    # chunks: pezzi di HTML (es. un file letto a blocchi)
+    importer = BlockImporter(existing_blocks)
+    for chunk in chunks:
+        importer.feed(chunk)
+        yield from importer.pop_blocks()
+    importer.close()
+    yield from importer.pop_blocks()
+
+
+def import_blocks_from_html(html, existing_blocks):
+    # Nuovi blocchi trovati nell'HTML (senza quelli già presenti in existing_blocks)
+    return list(iter_blocks_from_html([html], existing_blocks))
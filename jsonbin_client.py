@@ -0,0 +1,196 @@
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential_jitter,
+)
+
+# Client JSONBin.io condiviso: una Session con connessioni keep-alive riusate,
+# timeout rigidi, retry con backoff (tenacity) e circuit breaker, così un
+# backend lento o giù non blocca il rerun di Streamlit.
+# base_url può puntare a un server locale che imita le API v3 (per i test).
+# timer(nome, dettaglio) è un context manager che misura ogni richiesta, retry
+# compresi (l'app passa il suo profiled): così si vedono anche le richieste
+# fatte dai thread di salvataggio in background.
+
+JSONBIN_URL = "https://api.jsonbin.io/v3"
+CONNECT_TIMEOUT = 3.05  # secondi
+READ_TIMEOUT = 5
+MAX_ATTEMPTS = 3
+MAX_RETRY_TIME = 12  # secondi complessivi per richiesta, retry compresi
+POOL_SIZE = 10
+BREAKER_THRESHOLD = 5  # richieste fallite consecutive (retry compresi) prima di aprire il circuito
+BREAKER_RESET = 30  # secondi con il circuito aperto prima di riprovare
+
+# Stati HTTP temporanei per cui ha senso riprovare
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Metodi che si possono ripetere senza effetti doppi
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+class JsonBinError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(JsonBinError):
+    pass
+
+
+class JsonBinConflict(JsonBinError):
+    # 412: il bin è cambiato dopo la lettura (If-Match non più valido)
+    pass
+
+
+class _RetryableStatus(JsonBinError):
+    pass
+
+
+class CircuitBreaker:
+    # Chiuso: le richieste passano. Dopo `threshold` richieste fallite di fila
+    # (ognuna conta una volta, anche se è stata ripetuta dai retry) si apre
+    # e le richieste falliscono subito; dopo `reset_timeout` secondi lascia
+    # passare UNA richiesta di prova (semi-aperto): se va bene si richiude.
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._probe:
+                raise CircuitOpenError(
+                    f"JSONBin non raggiungibile, nuovo tentativo tra {max(remaining, 0):.0f} s"
+                )
+            self._probe = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class JsonBinClient:
+    def __init__(self, master_key, base_url=JSONBIN_URL, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_attempts=MAX_ATTEMPTS, max_retry_time=MAX_RETRY_TIME, pool_size=POOL_SIZE,
+                 breaker=None, timer=None):
+        self.base_url = base_url.rstrip("/")
+        self.timer = timer or (lambda name, detail="": nullcontext())
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_retry_time = max_retry_time
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers.update({"X-Master-Key": master_key})
+        # I retry li gestisce tenacity, non urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _should_retry(self, method):
+        def check(exc):
+            if isinstance(exc, _RetryableStatus):
+                return method in IDEMPOTENT_METHODS or exc.status in (429, 503)
+            if isinstance(exc, requests.ConnectTimeout):
+                # La richiesta non è partita: si può ripetere anche un POST
+                return True
+            if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+                return method in IDEMPOTENT_METHODS
+            return False
+        return check
+
+    def _send(self, method, path, **kwargs):
+        response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            raise _RetryableStatus(f"HTTP {response.status_code}: {response.text}", response.status_code)
+        return response
+
+    def request(self, method, path, **kwargs):
+        with self.timer(f"jsonbin {method}", path):
+            return self._request(method, path, **kwargs)
+
+    def _request(self, method, path, **kwargs):
+        # Il circuit breaker vede la richiesta intera: un successo o un fallimento
+        # solo dopo i retry, non uno per tentativo
+        self.breaker.before_request()
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_attempts) | stop_after_delay(self.max_retry_time),
+            wait=wait_exponential_jitter(initial=0.2, max=2),
+            retry=retry_if_exception(self._should_retry(method)),
+            reraise=True,
+        )
+        try:
+            response = retrying(self._send, method, path, **kwargs)
+        except _RetryableStatus as e:
+            self.breaker.record_failure()
+            raise JsonBinError(str(e), e.status) from e
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise JsonBinError(f"{type(e).__name__}: {e}") from e
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        # Un 4xx è un errore della richiesta, non del backend
+        self.breaker.record_success()
+        if response.status_code == 412:
+            raise JsonBinConflict(f"HTTP 412: {response.text}", 412)
+        if not response.ok:
+            raise JsonBinError(f"HTTP {response.status_code}: {response.text}", response.status_code)
+        return response
+
+    def create_bin(self, record, name=None):
+        headers = {"X-Bin-Name": name} if name else {}
+        response = self.request("POST", "/b", json={"record": record}, headers=headers)
+        return response.json()["metadata"]["id"]
+
+    def read_bin(self, bin_id):
+        return self.read_bin_versioned(bin_id)[0]
+
+    def read_bin_versioned(self, bin_id):
+        # (record, versione): la versione è l'ETag, None se il server non lo invia
+        response = self.request("GET", f"/b/{bin_id}/latest", headers={"X-Bin-Meta": "false"})
+        return response.json()["record"], response.headers.get("ETag")
+
+    def update_bin(self, bin_id, record, if_match=None):
+        # Con if_match la scrittura riesce solo se il bin è ancora a quella versione
+        # (altrimenti JsonBinConflict). Restituisce la nuova versione, se nota.
+        headers = {"If-Match": if_match} if if_match else {}
+        response = self.request("PUT", f"/b/{bin_id}", json={"record": record}, headers=headers)
+        return response.headers.get("ETag")
+
+    def delete_bin(self, bin_id):
+        self.request("DELETE", f"/b/{bin_id}")
+
+    def close(self):
+        self.session.close()
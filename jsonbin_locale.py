@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+# Server locale che imita la parte delle API JSONBin.io v3 usata dall'app
+# (crea, leggi l'ultima versione, aggiorna ed elimina un bin), con latenza ed
+# errori iniettabili. Le bozze restano in memoria.
+#
+#   python jsonbin_locale.py --port 8765 --latency 80 --error-rate 0.05
+#   TI_AIUTO_JSONBIN_URL=http://127.0.0.1:8765/v3 streamlit run article_generator.py
+#
+# A differenza del servizio vero invia un ETag per bin e rispetta If-Match
+# (412 se il bin è cambiato); --no-etag lo disattiva.
+
+DEFAULT_CONFIG = {
+    "master_key": None,  # se impostata, X-Master-Key deve coincidere
+    "latency_ms": 0,  # latenza media aggiunta a ogni richiesta
+    "jitter_ms": 0,  # variazione casuale (+/-) della latenza
+    "error_rate": 0.0,  # quota di richieste che falliscono con ERROR_STATUSES
+    "hang_rate": 0.0,  # quota di richieste che non rispondono per hang_seconds
+    "hang_seconds": 30,
+    "etag": True,
+}
+ERROR_STATUSES = (500, 502, 503, 429)
+# Bin creati all'avvio: la lista delle bozze usata dall'app. Come su JSONBin il
+# bin contiene il corpo inviato dal client, che avvolge i dati in {"record": ...}
+DEFAULT_BINS = {"689dbe6943b1c97be91e1d2b": {"record": []}}
+
+
+class BinStore:
+    def __init__(self, bins=None):
+        self.bins = {}  # id -> {"record", "version", "name", "createdAt"}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.injected_errors = 0
+        for bin_id, record in (bins or {}).items():
+            self.create(record, bin_id=bin_id)
+
+    def create(self, record, name=None, bin_id=None):
+        bin_id = bin_id or uuid.uuid4().hex[:24]
+        with self.lock:
+            self.bins[bin_id] = {
+                "record": record,
+                "version": 1,
+                "name": name,
+                "createdAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            }
+        return bin_id
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+class BinHandler(tornado.web.RequestHandler):
+    def initialize(self, store, config):
+        self.store = store
+        self.config = config
+
+    async def prepare(self):
+        self.store.requests += 1
+        config = self.config
+        delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config["hang_rate"] and random.random() < config["hang_rate"]:
+            await asyncio.sleep(config["hang_seconds"])
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            self.store.injected_errors += 1
+            return self.reply(random.choice(ERROR_STATUSES), {"message": "Errore simulato"})
+        key = config["master_key"]
+        if key and self.request.headers.get("X-Master-Key") != key:
+            return self.reply(401, {"message": "X-Master-Key is invalid or the bin doesn't belong to your account"})
+
+    def reply(self, status, body, version=None):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        if version is not None and self.config["etag"]:
+            self.set_header("ETag", etag(version))
+        self.finish(json.dumps(body, ensure_ascii=False))
+
+    def write_error(self, status_code, **kwargs):
+        self.reply(status_code, {"message": self._reason})
+
+    def body(self):
+        try:
+            return json.loads(self.request.body or b"null")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Invalid JSON")
+
+    def not_found(self):
+        self.reply(404, {"message": "Bin not found or it doesn't belong to your account"})
+
+    def post(self, bin_id=None):
+        if bin_id:
+            return self.reply(405, {"message": "Method not allowed"})
+        record = self.body()
+        name = self.request.headers.get("X-Bin-Name")
+        bin_id = self.store.create(record, name=name)
+        self.reply(200, {"record": record, "metadata": {"id": bin_id, "name": name, "private": True,
+                                                        "createdAt": self.store.bins[bin_id]["createdAt"]}}, 1)
+
+    def get(self, bin_id=None, latest=None):
+        with self.store.lock:
+            entry = self.store.bins.get(bin_id)
+            entry = dict(entry) if entry else None
+        if entry is None:
+            return self.not_found()
+        if self.request.headers.get("X-Bin-Meta", "true").lower() == "false":
+            return self.reply(200, entry["record"], entry["version"])
+        metadata = {"id": bin_id, "name": entry["name"], "private": True, "createdAt": entry["createdAt"]}
+        self.reply(200, {"record": entry["record"], "metadata": metadata}, entry["version"])
+
+    def put(self, bin_id=None, latest=None):
+        record = self.body()
+        if_match = self.request.headers.get("If-Match")
+        with self.store.lock:
+            entry = self.store.bins.get(bin_id)
+            if entry is None:
+                return self.not_found()
+            if self.config["etag"] and if_match and if_match != etag(entry["version"]):
+                return self.reply(412, {"message": "Il bin è stato modificato (If-Match)"}, entry["version"])
+            entry["record"] = record
+            entry["version"] += 1
+            version = entry["version"]
+        self.reply(200, {"record": record, "metadata": {"parentId": bin_id, "private": True}}, version)
+
+    def delete(self, bin_id=None, latest=None):
+        with self.store.lock:
+            entry = self.store.bins.pop(bin_id, None)
+        if entry is None:
+            return self.not_found()
+        self.reply(200, {"metadata": {"id": bin_id, "versionsDeleted": entry["version"] - 1},
+                         "message": "Bin deleted successfully"})
+
+
+def make_app(store, config):
+    return tornado.web.Application([
+        (r"/v3/b/?", BinHandler, {"store": store, "config": config}),
+        (r"/v3/b/([^/]+)(/latest)?", BinHandler, {"store": store, "config": config}),
+    ])
+
+
+def start_in_thread(host="127.0.0.1", port=0, bins=None, **config):
+    # Avvia il server in un thread (per test e load test).
+    # Restituisce (url base da usare come TI_AIUTO_JSONBIN_URL, store, config, stop)
+    config = {**DEFAULT_CONFIG, **config}
+    store = BinStore(DEFAULT_BINS if bins is None else bins)
+    sockets = tornado.netutil.bind_sockets(port, host)
+    actual_port = sockets[0].getsockname()[1]
+    ready = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = tornado.httpserver.HTTPServer(make_app(store, config))
+        server.add_sockets(sockets)
+        state.update(loop=loop, server=server)
+        ready.set()
+        loop.run_forever()
+        server.stop()
+        loop.close()
+
+    thread = threading.Thread(target=run, name="jsonbin-locale", daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        state["loop"].call_soon_threadsafe(state["loop"].stop)
+        thread.join(timeout=5)
+
+    return f"http://{host}:{actual_port}/v3", store, config, stop
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Server locale compatibile con le API JSONBin v3 usate dall'app.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--master-key", help="Se indicata, X-Master-Key deve coincidere")
+    parser.add_argument("--latency", type=float, default=0, help="Latenza media aggiunta (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Variazione casuale della latenza (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Quota di richieste con errore 5xx/429 (0-1)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Quota di richieste che non rispondono (0-1)")
+    parser.add_argument("--hang-seconds", type=float, default=30, help="Durata delle richieste bloccate (s)")
+    parser.add_argument("--no-etag", action="store_true", help="Niente ETag/If-Match, come il servizio vero")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {
+        **DEFAULT_CONFIG,
+        "master_key": args.master_key,
+        "latency_ms": args.latency,
+        "jitter_ms": args.jitter,
+        "error_rate": args.error_rate,
+        "hang_rate": args.hang_rate,
+        "hang_seconds": args.hang_seconds,
+        "etag": not args.no_etag,
+    }
+    store = BinStore(DEFAULT_BINS)
+
+    async def serve():
+        make_app(store, config).listen(args.port, args.host)
+        print(f"JSONBin locale su http://{args.host}:{args.port}/v3")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
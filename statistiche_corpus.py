@@ -0,0 +1,185 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from article_generator import rule_pack
+from audit_articoli import METRIC_FIELDS, RULE_KEYS
+
+# Statistiche su tutto il sito a partire dai report di audit_articoli.py.
+# Le misure dei singoli articoli (parole, densità, lunghezza URL...) le calcola
+# l'audit, un articolo alla volta; qui le righe del report vengono caricate in
+# un DataFrame colonnare e aggregate (fasce di densità, quote di regole rispettate).
+#
+#   python audit_articoli.py output/articoli -o corpus.parquet
+#   python statistiche_corpus.py corpus.parquet --summary riepilogo.parquet
+
+TEXT_FIELDS = ["source", "title", "url_slug", "keyword"]
+# Righe per row group quando il report Parquet viene scritto in streaming
+PARQUET_BATCH_ROWS = 5000
+
+
+def rows_to_frame(rows):
+    # Righe del report (dict con "rules" annidato) -> DataFrame con una colonna per regola
+    columns = {field: [] for field in TEXT_FIELDS + METRIC_FIELDS + RULE_KEYS + ["error"]}
+    for row in rows:
+        rules = row.get("rules") or {}
+        for field in TEXT_FIELDS + METRIC_FIELDS + ["error"]:
+            columns[field].append(row.get(field))
+        for key in RULE_KEYS:
+            columns[key].append(rules.get(key))
+    return normalize_frame(pd.DataFrame(columns))
+
+
+def normalize_frame(df):
+    # Tipi colonnari stabili, qualunque sia la sorgente (JSONL, CSV, Parquet)
+    for field in TEXT_FIELDS + ["error"]:
+        if field not in df:
+            df[field] = None
+        df[field] = df[field].astype("string")
+    for field in METRIC_FIELDS:
+        df[field] = pd.to_numeric(df.get(field), errors="coerce")
+    for key in RULE_KEYS:
+        col = df.get(key)
+        if col is not None and col.dtype == object:
+            # Dal CSV arrivano come testo "True"/"False"
+            col = col.map({True: True, False: False, "True": True, "False": False})
+        df[key] = col.astype("boolean") if col is not None else pd.array([pd.NA] * len(df), dtype="boolean")
+    return df[TEXT_FIELDS + METRIC_FIELDS + RULE_KEYS + ["error"]]
+
+
+def density_bands(pack=None):
+    # Fasce di densità della keyword attorno a quella chiesta dal pacchetto regole
+    # (con 1%-1.5%: <0.5%, 0.5-1%, 1-1.5%, 1.5-2%, >=2%). Restituisce (bins, etichette).
+    labels = (pack or rule_pack())["labels"]
+    low, high = labels["density_min"], labels["density_max"]
+    edges = [low / 2, low, high, 2 * high - low]  # in %
+    names = [f"<{edges[0]:g}%"]
+    names += [f"{a:g}-{b:g}%" for a, b in zip(edges, edges[1:])]
+    names.append(f">={edges[-1]:g}%")
+    # La fascia giusta include il massimo, come la regola (density_min <= d <= density_max)
+    bins = [0, edges[0] / 100, low / 100, np.nextafter(high / 100, np.inf), edges[3] / 100, np.inf]
+    return bins, names
+
+
+def add_derived_columns(df):
+    # Colonne ricavate da quelle del report (density e url_length arrivano già dall'audit)
+    bins, names = density_bands()
+    df["density_band"] = pd.cut(df["density"], bins=bins, labels=names, right=False)
+    df["respected"] = df[RULE_KEYS].sum(axis=1, skipna=True)
+    df["rules_failed"] = df[RULE_KEYS].eq(False).sum(axis=1)
+    return df
+
+
+def read_report(path):
+    if path.endswith(".parquet"):
+        return normalize_frame(pd.read_parquet(path))
+    if path.endswith(".csv"):
+        return normalize_frame(pd.read_csv(path, dtype={field: "string" for field in TEXT_FIELDS + ["error"]}))
+    # JSONL (anche "-" per stdin): letto riga per riga, senza oggetti intermedi per riga
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return rows_to_frame(json.loads(line) for line in f if line.strip())
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def load_corpus(paths):
+    frames = [read_report(path) for path in paths]
+    df = pd.concat(frames, ignore_index=True) if frames else rows_to_frame([])
+    return add_derived_columns(df)
+
+
+def rule_pass_rates(df):
+    # Per ogni regola: quota di articoli che la rispettano / non la rispettano
+    ok = df.loc[df["error"].isna(), RULE_KEYS]
+    passed = ok.mean(skipna=True)
+    return pd.DataFrame({
+        "rule": RULE_KEYS,
+        "articles": ok.notna().sum().to_numpy(),
+        "pass_rate": passed.to_numpy(dtype="float64", na_value=np.nan),
+        "fail_rate": 1 - passed.to_numpy(dtype="float64", na_value=np.nan),
+    })
+
+
+def metric_distribution(df):
+    ok = df.loc[df["error"].isna(), METRIC_FIELDS]
+    return ok.describe(percentiles=[0.1, 0.25, 0.5, 0.75, 0.9]).T
+
+
+def density_distribution(df):
+    return df.loc[df["error"].isna(), "density_band"].value_counts(normalize=True, sort=False)
+
+
+def write_parquet(df, path):
+    df.to_parquet(path, index=False)
+
+
+def write_parquet_stream(rows, path):
+    # Scrive il report in row group da PARQUET_BATCH_ROWS righe: la memoria non
+    # cresce con il numero di articoli (usato da audit_articoli.py --format parquet)
+    writer = None
+    count = 0
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pandas(rows_to_frame(batch), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+        batch.clear()
+
+    try:
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                flush()
+        if batch or writer is None:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def print_summary(df, out=sys.stdout):
+    errors = int(df["error"].notna().sum())
+    print(f"Articoli: {len(df) - errors} (errori: {errors})", file=out)
+    print("\nRegole (quota di articoli che NON le rispettano):", file=out)
+    rates = rule_pass_rates(df).sort_values("fail_rate", ascending=False)
+    for rule, fail_rate in zip(rates["rule"], rates["fail_rate"]):
+        print(f"  {rule:<28} {fail_rate:7.1%}", file=out)
+    print("\nDensità keyword:", file=out)
+    for band, share in density_distribution(df).items():
+        print(f"  {band:<8} {share:7.1%}", file=out)
+    print("\nDistribuzioni:", file=out)
+    print(metric_distribution(df).to_string(float_format=lambda v: f"{v:.4g}"), file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Statistiche di corpus dai report di audit_articoli.py.")
+    parser.add_argument("reports", nargs="+", help="Report .jsonl, .csv o .parquet ('-' per JSONL da stdin)")
+    parser.add_argument("--parquet", help="Salva la tabella degli articoli (con colonne calcolate) in Parquet")
+    parser.add_argument("--summary", help="Salva le percentuali per regola in Parquet")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    df = load_corpus(args.reports)
+    if args.parquet:
+        write_parquet(df, args.parquet)
+    if args.summary:
+        write_parquet(rule_pass_rates(df), args.summary)
+    print_summary(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+# Lettura in streaming di un export WordPress (WXR, Strumenti > Esporta).
+#
+# L'export di un sito intero può pesare centinaia di MB: iter_wxr_posts lo
+# legge con iterparse e svuota ogni <item> appena letto, così in memoria c'è
+# un solo articolo alla volta, qualunque sia la dimensione del file.
+# Dai postmeta di Rank Math si prendono la focus keyword e la meta description.
+
+CONTENT_NS = "http://purl.org/rss/1.0/modules/content/"
+# Stati degli articoli che non ha senso analizzare
+SKIP_STATUSES = {"trash", "auto-draft"}
+RANK_MATH_KEYWORD = "rank_math_focus_keyword"
+RANK_MATH_DESCRIPTION = "rank_math_description"
+
+# Tag di blocco di wpautop (come in WordPress), più iframe e video perché
+# l'importer li tenga come blocchi a sé e non dentro un paragrafo
+AUTOP_BLOCKS = (
+    r"(?:table|thead|tfoot|caption|col|colgroup|tbody|tr|td|th|div|dl|dd|dt|ul|ol|li|pre|form|map|area"
+    r"|blockquote|address|math|style|p|h[1-6]|hr|fieldset|legend|section|article|aside|hgroup|header"
+    r"|footer|nav|figure|figcaption|details|menu|summary|iframe|video)"
+)
+# Contenitori: il testo subito dentro (es. <div>testo</div>) diventa un paragrafo
+AUTOP_CONTAINERS = (
+    r"(?:div|section|article|aside|header|footer|nav|blockquote|figure|details|fieldset|form|address)"
+)
+AUTOP_CONTAINER_RE = re.compile(r"(</?" + AUTOP_CONTAINERS + r"(?:[\s/][^>]*)?>)", re.IGNORECASE)
+AUTOP_OPEN_RE = re.compile(r"(<" + AUTOP_BLOCKS + r"[\s/>])", re.IGNORECASE)
+AUTOP_CLOSE_RE = re.compile(r"(</" + AUTOP_BLOCKS + r">)", re.IGNORECASE)
+AUTOP_UNWRAP_RE = re.compile(r"<p>\s*(</?" + AUTOP_BLOCKS + r"(?:[\s/][^>]*)?>)", re.IGNORECASE)
+AUTOP_UNWRAP_END_RE = re.compile(r"(</?" + AUTOP_BLOCKS + r"(?:[\s/][^>]*)?>)\s*</p>", re.IGNORECASE)
+# <pre> e commenti (anche quelli dell'editor a blocchi) si lasciano intatti
+AUTOP_KEEP_RE = re.compile(r"<pre[\s>].*?</pre>|<!--.*?-->", re.DOTALL | re.IGNORECASE)
+AUTOP_PLACEHOLDER_RE = re.compile(r"<!--autop(\d+)-->")
+# Un'immagine da sola (anche con link) non va in un <p>: l'importer ne fa un blocco Immagine
+AUTOP_IMAGE_RE = re.compile(r"(?:<a\s[^>]*>\s*)?<img[\s/][^>]*>(?:\s*</a>)?", re.IGNORECASE)
+
+
+def local_name(tag):
+    # "{namespace}nome" -> ("namespace", "nome")
+    if tag.startswith("{"):
+        namespace, _, name = tag[1:].partition("}")
+        return namespace, name
+    return "", tag
+
+
+def is_wp(namespace):
+    # Il namespace wp: cambia con la versione del formato (export/1.0, 1.1, 1.2)
+    return namespace.startswith("http://wordpress.org/export/") and not namespace.endswith("/excerpt/")
+
+
+def read_item(item):
+    post = {"meta": {}}
+    for child in item:
+        namespace, name = local_name(child.tag)
+        text = child.text or ""
+        if namespace == "" and name in ("title", "link"):
+            post[name] = text
+        elif namespace == CONTENT_NS and name == "encoded":
+            post["content"] = text
+        elif namespace.endswith("/excerpt/") and name == "encoded":
+            post["excerpt"] = text
+        elif is_wp(namespace):
+            if name == "postmeta":
+                key = value = ""
+                for meta in child:
+                    meta_name = local_name(meta.tag)[1]
+                    if meta_name == "meta_key":
+                        key = meta.text or ""
+                    elif meta_name == "meta_value":
+                        value = meta.text or ""
+                post["meta"][key] = value
+            elif name in ("post_id", "post_name", "post_type", "status"):
+                post[name] = text
+    return post
+
+
+def iter_wxr_posts(path, post_types=("post",)):
+    # Un dict per articolo: id, title, slug, link, status, type, content, excerpt, meta
+    source = sys.stdin.buffer if path == "-" else path
+    channel = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        name = local_name(elem.tag)[1]
+        if event == "start":
+            if name == "channel":
+                channel = elem
+            continue
+        if name != "item" or channel is None:
+            continue
+        post = read_item(elem)
+        # L'item letto non serve più: via dal documento (e dalla memoria)
+        elem.clear()
+        channel.clear()
+        if post.get("post_type", "post") not in post_types or post.get("status") in SKIP_STATUSES:
+            continue
+        yield {
+            "id": post.get("post_id", ""),
+            "title": post.get("title", ""),
+            "slug": post.get("post_name", ""),
+            "link": post.get("link", ""),
+            "status": post.get("status", ""),
+            "type": post.get("post_type", "post"),
+            "content": post.get("content", ""),
+            "excerpt": post.get("excerpt", ""),
+            "meta": post["meta"],
+        }
+
+
+def focus_keywords(meta):
+    # Rank Math salva le focus keyword separate da virgola, la prima è la principale
+    return [k.strip() for k in meta.get(RANK_MATH_KEYWORD, "").split(",") if k.strip()]
+
+
+def wpautop(content):
+    # Contenuto dell'editor classico: i paragrafi sono separati da righe vuote e
+    # WordPress aggiunge i <p> solo in pagina. Come wpautop di WordPress: ogni
+    # tag di blocco va su un paragrafo a sé, il testo tra un blocco e l'altro
+    # finisce in un <p> e i <p> attorno ai tag di blocco si tolgono. Così anche
+    # il testo accanto a un <h2> o a un <p> esplicito resta un paragrafo.
+    # Le singole andate a capo restano com'erano (WordPress le rende con <br />).
+    if not content.strip():
+        return ""
+    saved = []
+
+    def keep(match):
+        saved.append(match.group(0))
+        return f"\n\n<!--autop{len(saved) - 1}-->\n\n"
+
+    text = AUTOP_KEEP_RE.sub(keep, content.replace("\r\n", "\n").replace("\r", "\n"))
+    text = AUTOP_CONTAINER_RE.sub(r"\n\n\1\n\n", text)
+    text = AUTOP_OPEN_RE.sub(r"\n\n\1", text)
+    text = AUTOP_CLOSE_RE.sub(r"\1\n\n", text)
+    chunks = [chunk.strip() for chunk in re.split(r"\n\s*\n", text) if chunk.strip()]
+    text = "\n".join(
+        chunk if AUTOP_PLACEHOLDER_RE.fullmatch(chunk) or AUTOP_IMAGE_RE.fullmatch(chunk) else f"<p>{chunk}</p>"
+        for chunk in chunks
+    )
+    text = AUTOP_UNWRAP_RE.sub(r"\1", text)
+    text = AUTOP_UNWRAP_END_RE.sub(r"\1", text)
+    return AUTOP_PLACEHOLDER_RE.sub(lambda m: saved[int(m.group(1))], text)